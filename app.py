@@ -7,6 +7,16 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    # Behind Railway/Heroku's router request.remote_addr is the proxy; take the
+    # client address from X-Forwarded-For, set by that many trusted proxies
+    if app.config.get('TRUSTED_PROXY_COUNT'):
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'])
+
+    # Choose the bcrypt cost for new hashes (calibrated to BCRYPT_TARGET_MS)
+    from utils.password_hashing import init_password_hashing
+    init_password_hashing(app)
+
     # Initialize extensions
     db.init_app(app)
     bcrypt.init_app(app)
@@ -15,6 +25,40 @@ def create_app(config_class=Config):
     login_manager.init_app(app)
     migrate.init_app(app, db)
 
+    # Resolve the outbound mail provider once, not on every send
+    from utils.email_sender import init_mail_transport
+    init_mail_transport(app)
+
+    # Deliver queued email in the background (utils/outbox.py)
+    from utils.outbox import init_outbox
+    init_outbox(app)
+
+    from utils.identity_cache import init_identity_cache
+    init_identity_cache(app)
+
+    from utils.login_throttle import init_login_throttle
+    init_login_throttle(app)
+
+    from utils.skills import init_skill_registry
+    init_skill_registry(app)
+
+    from utils.skill_ranking import init_skill_ranking
+    init_skill_ranking(app)
+
+    from utils.eligibility import init_eligibility_snapshot
+    init_eligibility_snapshot(app)
+
+    from utils.pagination import init_list_counts
+    init_list_counts(app)
+
+    # Keeps the drive_eligibility table current (session event listeners)
+    import utils.eligibility_matrix  # noqa: F401
+    # ...and the student_skills index behind tech match
+    import utils.skill_index  # noqa: F401
+    import utils.recommendations  # noqa: F401
+    # Creates the admin student search index along with the students table
+    import utils.student_search  # noqa: F401
+
     # Register Blueprints
     from blueprints.auth import auth_bp
     from blueprints.student import student_bp
@@ -34,13 +78,9 @@ app = create_app()
 
 @login_manager.user_loader
 def load_user(user_id):
-    from models import Student, AdminUser
-    model, real_id = user_id.split('-', 1)
-    if model == 'S':
-        return Student.query.get(int(real_id))
-    if model == 'A':
-        return AdminUser.query.get(int(real_id))
-    return None
+    # Served from a short-lived cache; see utils/identity_cache.py
+    from utils.identity_cache import load_identity
+    return load_identity(user_id)
 
 if __name__ == '__main__':
     with app.app_context():
@@ -0,0 +1,34 @@
+"""
+One-shot backfill for the skill registry (utils/skills.py): seeds the
+common skills and aliases, rewrites existing Student.skills and
+Company.required_skills to canonical names in batches, and rebuilds the
+student skill index as it goes. Safe to re-run.
+
+    python backfill_skills.py                # batches of 500 rows
+    python backfill_skills.py --batch-size 2000
+"""
+import argparse
+from app import create_app, db
+from utils.skills import seed_skills, backfill_skills
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        created = seed_skills(db.session)
+        db.session.commit()
+        print(f"Seeded skill registry ({created} new skills).")
+
+        def progress(counts):
+            print(f"  {counts['students']} students, {counts['companies']} companies, {counts['changed']} rewritten")
+
+        counts = backfill_skills(db.session, batch_size=args.batch_size, on_progress=progress)
+        print(f"Done: {counts['changed']} rows canonicalized.")
+
+
+if __name__ == '__main__':
+    main()
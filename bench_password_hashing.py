@@ -0,0 +1,57 @@
+"""
+Benchmark: serial Flask-Bcrypt hashing vs. the process-pool hashing service
+used by bulk import.
+
+    python bench_password_hashing.py                      # 1k, 5k, 20k rows at BCRYPT_LOG_ROUNDS
+    python bench_password_hashing.py --rounds 8 --sizes 1000 5000
+"""
+import argparse
+import os
+import time
+from flask import Flask
+from config import Config
+from extensions import bcrypt
+from utils.password_hashing import hash_passwords, shutdown_pool
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--rounds', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if args.rounds:
+        app.config['BCRYPT_LOG_ROUNDS'] = args.rounds
+    bcrypt.init_app(app)
+
+    with app.app_context():
+        rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        workers = args.workers or app.config.get('PASSWORD_HASH_WORKERS') or os.cpu_count()
+        print(f"bcrypt rounds={rounds}, pool workers={workers}")
+        print(f"{'rows':>8} {'serial (s)':>12} {'pool (s)':>10} {'speedup':>8}")
+
+        # Warm up the pool so process start-up isn't billed to the first size
+        hash_passwords(['warmup'] * workers * 2, workers=workers)
+
+        for n in args.sizes:
+            passwords = [f"{i:06d}@password" for i in range(n)]
+
+            start = time.perf_counter()
+            for p in passwords:
+                bcrypt.generate_password_hash(p)
+            serial = time.perf_counter() - start
+
+            start = time.perf_counter()
+            hash_passwords(passwords, workers=workers)
+            pooled = time.perf_counter() - start
+
+            print(f"{n:>8} {serial:>12.2f} {pooled:>10.2f} {serial / pooled:>7.1f}x")
+
+    shutdown_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,11 +4,12 @@ from werkzeug.utils import secure_filename
 import pandas as pd
 import io
 import os
-from extensions import db, mail
-from models import Student, AdminUser, EmailLog
-from flask_mail import Message
+import time
+from extensions import db
+from models import Student, AdminUser
 from forms import AdminBulkImportForm
-from utils.email_sender import send_email
+from utils.outbox import enqueue_email, enqueue_emails, flush_outbox
+from utils.jobs import enqueue_job, job_handler
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -50,27 +51,55 @@ def download_sample():
     )
 
 
+def welcome_message(student_id, name, roll_no, email):
+    return {
+        'subject': "Welcome to the Training & Placement Portal",
+        'recipients': [email],
+        'body': (
+            f"Dear {name},\n\n"
+            f"Your registration has been approved.\n"
+            f"You can now log in using your Roll No. ({roll_no}) "
+            f"and your password.\n\n"
+            f"Regards,\nTraining & Placement Office"
+        ),
+        'email_type': 'Approval',
+        'student_id': student_id,
+    }
+
 def send_welcome_email(student):
-    subject = "Welcome to the Training & Placement Portal"
-    body = (
-        f"Dear {student.name},\n\n"
-        f"Your registration has been approved.\n"
-        f"You can now log in using your Roll No. ({student.roll_no}) "
-        f"and your password.\n\n"
-        f"Regards,\nTraining & Placement Office"
-    )
-    
-    # Use the unified send_email utility which handles Resend API/SMTP selection
-    if send_email(subject, [student.email], body):
-        log = EmailLog(student_id=student.id,
-                       email_type='Approval', status='Success')
-        db.session.add(log)
-    else:
-        log = EmailLog(student_id=student.id,
-                       email_type='Approval',
-                       status='Failed',
-                       error_message="Failed to send via send_email utility")
-        db.session.add(log)
+    # Queued in the caller's transaction; EmailLog is written once it is delivered
+    enqueue_email(**welcome_message(student.id, student.name, student.roll_no, student.email))
+
+def notify_eligible_students(drive):
+    """
+    Queue a personalised "new drive" email for every approved student who
+    meets the drive's criteria, in the caller's transaction. The outbox
+    sends them in provider batches. Returns the number queued.
+    """
+    from utils.eligibility import eligible_students
+    company = drive.company.name if drive.company else 'a recruiter'
+    deadline = drive.deadline.strftime('%d %b %Y') if drive.deadline else 'N/A'
+    link = url_for('student.list_drives', _external=True)
+    subject = f"New Placement Drive: {drive.job_title} at {company}"
+
+    messages = [
+        {
+            'subject': subject,
+            'recipients': [email],
+            'body': (
+                f"Dear {name},\n\n"
+                f"{company} is hiring for {drive.job_title} and you meet the eligibility criteria.\n"
+                f"Salary: {drive.salary or 'Not disclosed'}\n"
+                f"Apply before: {deadline}\n\n"
+                f"View and apply: {link}\n\n"
+                f"Regards,\nTraining & Placement Office"
+            ),
+            'email_type': 'DriveNotification',
+            'student_id': student_id,
+        }
+        for student_id, name, email in eligible_students(drive, Student.id, Student.name, Student.email)
+    ]
+    return enqueue_emails(messages)
 
 @admin_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
@@ -146,7 +175,8 @@ def pending():
         flash('Unauthorized', 'danger')
         return redirect(url_for('auth.admin_login'))
     students = Student.query.filter_by(status='Pending').all()
-    return render_template('admin_pending.html', students=students)
+    departments = sorted({s.department for s in students if s.department})
+    return render_template('admin_pending.html', students=students, departments=departments)
 
 @admin_bp.route('/student/<int:student_id>/status', methods=['POST'])
 @login_required
@@ -165,9 +195,123 @@ def update_status(student_id):
     if new_status == 'Approved':
         send_welcome_email(student)
     db.session.commit()
+    flush_outbox()
     flash(f'Student {student.roll_no} status updated to {new_status}', 'success')
     return redirect(url_for('admin.pending'))
 
+BULK_STATUSES = ('Approved', 'Rejected')
+
+def bulk_set_status(new_status, student_ids=None, department=None, semester=None):
+    """
+    Move pending students to Approved/Rejected with a single UPDATE.
+
+    Targets the given ids, or every pending student matching the
+    department/semester filter when no ids are given. Approvals queue
+    their welcome emails with one bulk insert into the outbox, which sends
+    them in provider batches and writes the EmailLog rows per batch.
+    The caller commits. Returns a summary dict.
+    """
+    from sqlalchemy import update, func
+
+    criteria = [Student.status == 'Pending']
+    if student_ids is not None:
+        criteria.append(Student.id.in_(student_ids))
+    else:
+        if department:
+            criteria.append(func.lower(Student.department) == department.strip().lower())
+        if semester:
+            criteria.append(Student.semester == semester)
+
+    targets = Student.query.with_entities(Student.id, Student.name, Student.roll_no, Student.email) \
+        .filter(*criteria).all()
+    ids = [t.id for t in targets]
+    updated = 0
+    if ids:
+        updated = db.session.execute(
+            update(Student)
+            .where(Student.id.in_(ids), Student.status == 'Pending')
+            .values(status=new_status)
+            .execution_options(synchronize_session='fetch')
+        ).rowcount
+
+    # The bulk UPDATE bypasses the ORM events that keep drive_eligibility current
+    from utils.eligibility_matrix import mark_students_stale
+    from utils.skill_ranking import mark_ranking_stale
+    from utils.recommendations import mark_recommendations_stale
+    mark_students_stale(ids)
+    mark_ranking_stale()
+    mark_recommendations_stale('student', ids)
+
+    emails = 0
+    if new_status == 'Approved' and targets:
+        emails = enqueue_emails([welcome_message(*t) for t in targets])
+
+    requested = len(student_ids) if student_ids is not None else len(ids)
+    return {
+        'status': new_status,
+        'requested': requested,
+        'updated': updated,
+        'skipped': requested - updated,
+        'emails_queued': emails,
+    }
+
+@admin_bp.route('/students/bulk-status', methods=['POST'])
+@login_required
+def bulk_update_status():
+    if not isinstance(current_user._get_current_object(), AdminUser):
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('auth.admin_login'))
+
+    from flask import jsonify
+    data = request.get_json(silent=True)
+    wants_json = data is not None
+    if data is None:
+        data = request.form
+        ids = data.getlist('student_ids')
+        scope = data.get('scope')
+    else:
+        ids = data.get('student_ids') or []
+        scope = data.get('scope')
+
+    new_status = data.get('status')
+    if new_status not in BULK_STATUSES:
+        if wants_json:
+            return jsonify({'error': 'status must be Approved or Rejected'}), 400
+        flash('Invalid status.', 'danger')
+        return redirect(url_for('admin.pending'))
+
+    # scope=all applies the (optional) department/semester filter instead of a selection
+    student_ids = None
+    if scope != 'all':
+        try:
+            student_ids = sorted({int(i) for i in ids})
+        except (TypeError, ValueError):
+            student_ids = []
+        if not student_ids:
+            if wants_json:
+                return jsonify({'error': 'Select students or use scope "all"'}), 400
+            flash('No students selected.', 'warning')
+            return redirect(url_for('admin.pending'))
+    try:
+        semester = int(data.get('semester')) if data.get('semester') else None
+    except (TypeError, ValueError):
+        semester = None
+
+    summary = bulk_set_status(new_status, student_ids=student_ids,
+                              department=data.get('department'), semester=semester)
+    db.session.commit()
+    flush_outbox()
+
+    if wants_json:
+        return jsonify(summary)
+    message = f"{summary['updated']} student(s) marked {new_status}."
+    if summary['skipped']:
+        message += f" {summary['skipped']} skipped (no longer pending)."
+    if summary['emails_queued']:
+        message += f" {summary['emails_queued']} welcome email(s) queued."
+    flash(message, 'success')
+    return redirect(url_for('admin.pending'))
+
 @admin_bp.route('/import', methods=['GET', 'POST'])
 @login_required
 def bulk_import():
@@ -176,158 +320,58 @@ def bulk_import():
         return redirect(url_for('auth.admin_login'))
 
     form = AdminBulkImportForm()
-    summary = None
     
     if form.validate_on_submit():
+        from datetime import datetime
         file = form.file.data
-        filename = secure_filename(file.filename)
+        # Timestamp prefix so a re-upload can't overwrite a file still queued for import
+        filename = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{secure_filename(file.filename)}"
         path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
         file.save(path)
 
-        if filename.endswith('.csv'):
-            df = pd.read_csv(path)
-        else:
-            df = pd.read_excel(path)
-
-        inserted, updated, errors = 0, 0, []
-
-        for index, row in df.iterrows():
-            row_num = index + 2 # Assuming header is row 1
-            try:
-                roll_no = str(row['roll_no']).strip()
-                if not roll_no:
-                    errors.append(f"Row {row_num}: Roll number missing.")
-                    continue
-                
-                # Basic email validation
-                email = str(row.get('email', '')).lower().strip()
-                if not email or '@' not in email:
-                     errors.append(f"Row {row_num} (Roll {roll_no}): Invalid email '{email}'.")
-                     continue
-
-                student = Student.query.filter_by(roll_no=roll_no).first()
-                if not student:
-                    # New Student Check: Check if email exists for another student
-                    existing_student = Student.query.filter_by(email=email).first()
-                    if existing_student:
-                        errors.append(f"Row {row_num} (Roll {roll_no}): Email '{email}' already registered to Roll {existing_student.roll_no}.")
-                        continue 
-
-                    cgpa_val = float(row.get('cgpa', row.get('aggregate_cpi', 0)) or 0)
-                    backlogs_val = int(row.get('backlogs', 0))
-                    if backlogs_val > 0:
-                        cgpa_val = 0.0
-
-                    student = Student(
-                        roll_no=roll_no,
-                        name=row.get('name', ''),
-                        email=email,
-                        mobile=str(row.get('mobile', '')),
-                        department=row.get('department', 'IT'),
-                        semester=int(row.get('semester', 1)),
-                        tenth_marks=float(row.get('tenth_marks', 0) or 0),
-                        twelfth_marks=float(row.get('twelfth_marks', 0) or 0),
-                        cgpa=cgpa_val,
-                        backlogs=backlogs_val,
-                        skills=row.get('skills', ''),
-                        projects_internship=row.get('projects', '')
-                    )
-                    # Default password: roll_no@password
-                    student.set_password(f"{roll_no}@password")
-                    student.is_password_changed = False
-                    student.is_email_verified = False
-                    db.session.add(student)
-                    try:
-                         db.session.flush()
-                         inserted += 1
-                    except Exception as e:
-                         db.session.rollback()
-                         errors.append(f"Row {row_num} (Roll {roll_no}): DB Error - {str(e)}")
-                         continue
-                else:
-                    # Update existing student
-                    # Check email uniqueness if email is changing
-                    existing_student = Student.query.filter_by(email=email).first()
-                    if student.email != email and existing_student:
-                        errors.append(f"Row {row_num} (Roll {roll_no}): Cannot update email to '{email}'. Already used by Roll {existing_student.roll_no}.")
-                        continue
-
-                    student.name = row.get('name', student.name)
-                    student.email = email
-                    student.mobile = str(row.get('mobile', student.mobile))
-                    student.department = row.get('department', student.department)
-                    student.semester = int(row.get('semester', student.semester))
-                    student.tenth_marks = float(row.get('tenth_marks',
-                                                        student.tenth_marks) or 0)
-                    student.twelfth_marks = float(row.get('twelfth_marks',
-                                                          student.twelfth_marks) or 0)
-                    
-                    # Mutual Exclusivity Logic for Updates
-                    raw_cgpa = row.get('cgpa')
-                    raw_backlogs = row.get('backlogs')
-                    
-                    has_new_cgpa = raw_cgpa is not None and str(raw_cgpa).strip() != '' and float(raw_cgpa) > 0
-                    
-                    if has_new_cgpa:
-                        student.cgpa = float(raw_cgpa)
-                        student.backlogs = 0
-                        # Clear existing backlogs from DB? Yes for consistency
-                        from models import Backlog
-                        Backlog.query.filter_by(student_id=student.id).delete()
-                    else:
-                        # If no new CGPA provided, check if backlogs provided
-                        if raw_backlogs:
-                             student.cgpa = None
-                             backlog_count = 0
-                             s_backlogs = str(raw_backlogs).strip()
-                             
-                             # Try JSON
-                             import json
-                             from models import Backlog
-                             
-                             if s_backlogs.startswith('[') and s_backlogs.endswith(']'):
-                                 try:
-                                     details = json.loads(s_backlogs)
-                                     if isinstance(details, list):
-                                         # Replace existing backlogs
-                                         Backlog.query.filter_by(student_id=student.id).delete()
-                                         
-                                         for entry in details:
-                                             if 'subject' in entry and 'semester' in entry:
-                                                 b = Backlog(
-                                                     student_id=student.id,
-                                                     subject_name=entry['subject'],
-                                                     semester=int(entry['semester'])
-                                                 )
-                                                 db.session.add(b)
-                                                 backlog_count += 1
-                                 except:
-                                     pass
-                             
-                             if backlog_count == 0 and s_backlogs.isdigit():
-                                 backlog_count = int(s_backlogs)
-                                 
-                             student.backlogs = backlog_count
-
-                    student.skills = row.get('skills', student.skills)
-                    student.projects_internship = row.get(
-                        'projects', student.projects_internship)
-                    
-                    try:
-                        db.session.flush()
-                        updated += 1
-                    except Exception as e:
-                        db.session.rollback()
-                        errors.append(f"Row {row_num} (Roll {roll_no}): Update Error - {str(e)}")
-                        continue
-            except Exception as e:
-                db.session.rollback()
-                errors.append(f"Row {row_num}: Unexpected Error - {str(e)}")
-
-        db.session.commit()
-        summary = {'inserted': inserted, 'updated': updated, 'errors': errors}
-
-    return render_template('admin_import.html', summary=summary, form=form)
+        if form.validate_only.data:
+            # Dry run: check every row and build an error sheet, write nothing
+            job = enqueue_job('student_import_validate', {'path': path}, created_by=current_user.id)
+            flash('Validation queued. No students will be changed.', 'info')
+            return redirect(url_for('admin.job_status', job_id=job.id))
+
+        job = enqueue_job('student_import', {'path': path}, created_by=current_user.id)
+        flash('Import queued. This page updates as rows are processed.', 'info')
+        return redirect(url_for('admin.job_status', job_id=job.id))
+
+    return render_template('admin_import.html', form=form)
+
+@job_handler('student_import')
+def run_student_import_job(job):
+    # Streams the file in fixed-size chunks; each chunk is validated,
+    # written and committed before the next one is read.
+    from utils.student_import import StudentImporter, run_import, count_import_rows
+    path = job.params['path']
+    batch_size = current_app.config['IMPORT_BATCH_SIZE']
+    total = count_import_rows(path)
+
+    def on_progress(entry):
+        if total:
+            job.set_progress(min(99.0, entry['rows'] * 100.0 / total))
+
+    importer = StudentImporter(batch_size=batch_size)
+    return run_import(path, importer, chunk_size=batch_size, on_progress=on_progress)
+
+@job_handler('student_import_validate')
+def run_student_import_validation_job(job):
+    from utils.student_import import validate_import
+    path = job.params['path']
+    summary, issues = validate_import(path)
+    if len(issues):
+        name = os.path.splitext(os.path.basename(path))[0]
+        job.save_artifact(generate_excel(issues.to_dict('records'), list(issues.columns)),
+                          f"{name}_errors.xlsx", EXCEL_MIMETYPE)
+    # The page lists the first few issues; the sheet has all of them.
+    summary['issues'] = [
+        {'row': int(i['Row']), 'severity': i['Severity'], 'issue': i['Issue']}
+        for i in issues.head(50).to_dict('records')
+    ]
+    return summary
 
 @admin_bp.route('/students')
 @login_required
@@ -336,21 +380,17 @@ def list_students():
         flash('Unauthorized', 'danger')
         return redirect(url_for('auth.admin_login'))
 
-    page = request.args.get('page', 1, type=int)
     search_query = request.args.get('q', '')
-    
-    query = Student.query
-    if search_query:
-        query = query.filter(
-            (Student.name.ilike(f'%{search_query}%')) | 
-            (Student.roll_no.ilike(f'%{search_query}%')) |
-            (Student.email.ilike(f'%{search_query}%'))
-        )
-    
-    # Order by status (Pending first), then created_at
-    students = query.order_by(Student.status.desc(), Student.created_at.desc())\
-                    .paginate(page=page, per_page=10)
-                    
+
+    # Full-text index (see utils/student_search.py): searches are ranked by relevance,
+    # the full list by status (Pending first), newest first
+    from utils.student_search import search_students, search_rank
+    from utils.pagination import keyset_paginate
+    query = search_students(Student.query, search_query)
+    rank = search_rank(search_query)
+    order = [rank, Student.id] if rank is not None else [Student.status.desc(), Student.id.desc()]
+    students = keyset_paginate(query, order, count_key=search_query.strip().lower() or None)
+
     return render_template('admin_students.html', students=students, search_query=search_query)
 
 @admin_bp.route('/student/<int:student_id>/edit', methods=['GET', 'POST'])
@@ -449,7 +489,10 @@ def list_requests():
         
     from models import ProfileUpdateRequest
     import json
-    requests = ProfileUpdateRequest.query.filter_by(status='Pending').order_by(ProfileUpdateRequest.created_at.desc()).all()
+    from utils.pagination import keyset_paginate
+    page = keyset_paginate(ProfileUpdateRequest.query.filter_by(status='Pending'),
+                           [ProfileUpdateRequest.id.desc()], count_key='Pending')
+    requests = page.items
     
     # Process requests for display
     # We want to show what changed.
@@ -463,7 +506,7 @@ def list_requests():
             'created_at': req.created_at
         })
         
-    return render_template('admin_requests.html', requests=processed_requests)
+    return render_template('admin_requests.html', requests=processed_requests, page=page)
 
 @admin_bp.route('/request/<int:req_id>/<action>', methods=['POST'])
 @login_required
@@ -569,7 +612,8 @@ def list_companies():
         flash('Company added successfully.', 'success')
         return redirect(url_for('admin.list_companies'))
         
-    companies = Company.query.order_by(Company.created_at.desc()).all()
+    from utils.pagination import keyset_paginate
+    companies = keyset_paginate(Company.query, [Company.id.desc()])
     return render_template('admin_companies.html', form=form, companies=companies)
 
 @admin_bp.route('/company/<int:company_id>/edit', methods=['GET', 'POST'])
@@ -606,8 +650,10 @@ def list_drives():
         return redirect(url_for('auth.admin_login'))
         
     from models import PlacementDrive
-    drives = PlacementDrive.query.order_by(PlacementDrive.created_at.desc()).all()
-    return render_template('admin_drives.html', drives=drives)
+    from utils.eligibility_matrix import eligible_counts
+    from utils.pagination import keyset_paginate
+    drives = keyset_paginate(PlacementDrive.query, [PlacementDrive.id.desc()])
+    return render_template('admin_drives.html', drives=drives, eligible_counts=eligible_counts(drives.items))
 
 @admin_bp.route('/drive/new', methods=['GET', 'POST'])
 @login_required
@@ -647,8 +693,11 @@ def create_drive():
         drive.drive_date = form.drive_date.data
         
         db.session.add(drive)
+        db.session.flush()
+        notified = notify_eligible_students(drive)
         db.session.commit()
-        flash('Placement Drive posted successfully.', 'success')
+        flush_outbox()
+        flash(f'Placement Drive posted successfully. Notifying {notified} eligible students.', 'success')
         return redirect(url_for('admin.list_drives'))
         
         db.session.add(drive)
@@ -685,6 +734,29 @@ def edit_drive(drive_id):
         
     return render_template('admin_drive_create.html', form=form, title='Edit Placement Drive', submit_text='Update Drive')
 
+@admin_bp.route('/drive/eligibility-preview')
+@login_required
+def drive_eligibility_preview():
+    if not isinstance(current_user._get_current_object(), AdminUser):
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('auth.admin_login'))
+
+    from flask import jsonify
+    from models import PlacementDrive
+    # Eligible counts by department for the criteria being typed into the drive
+    # form; the drive is never saved, only evaluated against the student snapshot
+    from utils.eligibility import department_counts
+    started = time.perf_counter()
+    drive = PlacementDrive(
+        criteria_10th=request.args.get('criteria_10th', 0, type=float),
+        criteria_12th=request.args.get('criteria_12th', 0, type=float),
+        criteria_cgpa=request.args.get('criteria_cgpa', 0, type=float),
+        allowed_branches=request.args.get('allowed_branches', ''),
+    )
+    result = department_counts(drive)
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(result)
+
 @admin_bp.route('/drive/<int:drive_id>/delete', methods=['POST'])
 @login_required
 def delete_drive(drive_id):
@@ -729,7 +801,11 @@ def list_applicants(drive_id):
         for attempt in attempts:
             results_map[(attempt.student_id, attempt.quiz_id)] = attempt
             
-    return render_template('admin_drive_applicants.html', drive=drive, applications=applications, quizzes=quizzes, results_map=results_map)
+    # How many approved students qualify, and which criteria rule the rest out
+    from utils.eligibility_matrix import drive_forecast
+    forecast = drive_forecast(drive)
+
+    return render_template('admin_drive_applicants.html', drive=drive, applications=applications, quizzes=quizzes, results_map=results_map, forecast=forecast)
 
 @admin_bp.route('/application/<int:app_id>/status/<string:status>', methods=['POST'])
 @login_required
@@ -757,7 +833,7 @@ def tech_match():
         flash('Unauthorized', 'danger')
         return redirect(url_for('auth.admin_login'))
         
-    from models import Student, Company
+    from models import Student, Company, PlacementDrive
     
     # Matching Logic
     match_type = request.args.get('type', 'students') # 'students' or 'companies'
@@ -765,35 +841,24 @@ def tech_match():
     location_query = request.args.get('location', '').strip()
     min_salary = request.args.get('salary', 0, type=float)
     
-    results = []
+    company_id = request.args.get('company_id', type=int)
+    drive_id = request.args.get('drive_id', type=int)
     
-    if match_type == 'students' and skills_query:
-        # Find students who have ANY of the skills
-        required_skills = [s.strip() for s in skills_query.split(',') if s.strip()]
-        
-        # Naive approach: Fetch all students and score them
-        all_students = Student.query.filter_by(status='Approved').all()
-        scored_students = []
-        
-        for student in all_students:
-            student_skills = [s.strip().lower() for s in (student.skills or '').split(',')]
-            score = 0
-            matches = []
-            for req in required_skills:
-                # substring match
-                if any(req.lower() in s for s in student_skills):
-                    score += 1
-                    matches.append(req)
-            
-            if score > 0:
-                scored_students.append({
-                    'student': student,
-                    'score': score,
-                    'matches': matches
-                })
-        
-        # Sort by score descending
-        results = sorted(scored_students, key=lambda x: x['score'], reverse=True)
+    results = []
+    ranked_for = None
+    
+    if match_type == 'students' and (skills_query or company_id or drive_id):
+        # Best-fit students by IDF-weighted skill similarity (utils/skill_ranking.py)
+        from utils.skill_ranking import query_skills, rank_students
+        if drive_id:
+            drive = PlacementDrive.query.get_or_404(drive_id)
+            wanted, ranked_for = query_skills(drive=drive), f"{drive.company.name} - {drive.job_title}"
+        elif company_id:
+            company = Company.query.get_or_404(company_id)
+            wanted, ranked_for = query_skills(company=company), company.name
+        else:
+            wanted = query_skills(skills=skills_query.split(','))
+        results = rank_students(wanted, k=current_app.config.get('TECH_MATCH_RESULTS', 50))
         
     elif match_type == 'companies':
         query = Company.query
@@ -806,31 +871,15 @@ def tech_match():
             
         companies = query.all()
         
-        # Skill filter
+        # Skill filter, comparing canonical skill ids
         if skills_query:
-            required_skills = [s.strip() for s in skills_query.split(',') if s.strip()]
-            scored_companies = []
-            for company in companies:
-                comp_skills = [s.strip().lower() for s in (company.required_skills or '').split(',')]
-                score = 0
-                matches = []
-                for req in required_skills:
-                    if any(req.lower() in s for s in comp_skills):
-                        score += 1
-                        matches.append(req)
-                
-                if score > 0:
-                    scored_companies.append({
-                        'company': company,
-                        'score': score,
-                        'matches': matches
-                    })
-            results = sorted(scored_companies, key=lambda x: x['score'], reverse=True)
+            from utils.skill_index import match_companies
+            results = match_companies(companies, skills_query.split(','))
         else:
             # If no skill filter, just return queried companies
             results = [{'company': c, 'score': 0, 'matches': []} for c in companies]
 
-    return render_template('admin_tech_match.html', results=results, match_type=match_type)
+    return render_template('admin_tech_match.html', results=results, match_type=match_type, ranked_for=ranked_for)
 
 @admin_bp.route('/invite/<int:company_id>', methods=['GET', 'POST'])
 @login_required
@@ -865,15 +914,15 @@ Training & Placement Office"""
             message=form.message.data
         )
         db.session.add(invitation)
-        db.session.commit()
         
-        # Send Email
+        # Send Email (queued with the invitation, delivered by the outbox workers)
         if company.email:
-            success, msg = send_email(form.subject.data, [company.email], form.message.data)
-            if success:
-                flash(f'Invitation sent to {company.name} ({company.email}).', 'success')
-            else:
-                flash(f'Invitation recorded but email failed to send. {msg}', 'warning')
+            enqueue_email(form.subject.data, [company.email], form.message.data, email_type='CompanyInvitation')
+        db.session.commit()
+        flush_outbox()
+
+        if company.email:
+            flash(f'Invitation sent to {company.name} ({company.email}).', 'success')
         else:
             flash(f'Invitation recorded. Note: Company has no email address.', 'info')
             
@@ -889,7 +938,8 @@ def list_invitations():
         return redirect(url_for('auth.admin_login'))
         
     from models import DriveInvitation
-    invitations = DriveInvitation.query.order_by(DriveInvitation.sent_at.desc()).all()
+    from utils.pagination import keyset_paginate
+    invitations = keyset_paginate(DriveInvitation.query, [DriveInvitation.id.desc()])
     return render_template('admin_invitations.html', invitations=invitations)
 
 # Quiz Management Routes
@@ -903,7 +953,8 @@ def list_quizzes():
     
     from models import Quiz
     from datetime import datetime
-    quizzes = Quiz.query.order_by(Quiz.created_at.desc()).all()
+    from utils.pagination import keyset_paginate
+    quizzes = keyset_paginate(Quiz.query, [Quiz.id.desc()])
     return render_template('admin_quizzes.html', quizzes=quizzes, datetime=datetime)
 
 @admin_bp.route('/quiz/new', methods=['GET', 'POST'])
@@ -1104,8 +1155,7 @@ def import_questions(quiz_id):
     if not isinstance(current_user._get_current_object(), AdminUser):
         return redirect(url_for('auth.admin_login'))
         
-    from models import Quiz, Question
-    import pandas as pd
+    from models import Quiz
     
     quiz = Quiz.query.get_or_404(quiz_id)
     
@@ -1121,44 +1171,21 @@ def import_questions(quiz_id):
     if not (file.filename.endswith('.xlsx') or file.filename.endswith('.xls')):
         flash('Only Excel files are allowed (.xlsx, .xls)', 'danger')
         return redirect(url_for('admin.view_quiz', quiz_id=quiz_id))
-        
-    try:
-        df = pd.read_excel(file)
-        
-        # Validate headers roughly
-        required_cols = ['Question Text', 'Option A', 'Option B', 'Option C', 'Option D', 'Correct Option', 'Marks']
-        if not all(col in df.columns for col in required_cols):
-             flash(f'Missing columns. Required: {", ".join(required_cols)}', 'danger')
-             return redirect(url_for('admin.view_quiz', quiz_id=quiz_id))
-        
-        count = 0
-        for index, row in df.iterrows():
-            if pd.isna(row['Question Text']):
-                 continue 
-                 
-            question = Question(
-                quiz_id=quiz.id,
-                question_text=str(row['Question Text']),
-                option_a=str(row['Option A']),
-                option_b=str(row['Option B']),
-                option_c=str(row['Option C']),
-                option_d=str(row['Option D']),
-                correct_option=str(row['Correct Option']).upper().strip(),
-                marks=float(row['Marks']) if not pd.isna(row['Marks']) else 1.0
-            )
-            db.session.add(question)
-            count += 1
-            
-        db.session.commit()
-        flash(f'Successfully imported {count} questions.', 'success')
-        
-    except Exception as e:
-        flash(f'Error importing file: {str(e)}', 'danger')
-        
-    return redirect(url_for('admin.view_quiz', quiz_id=quiz_id))
-    db.session.commit()
-    flash('Question deleted.', 'success')
-    return redirect(url_for('admin.view_quiz', quiz_id=quiz_id))
+
+    from datetime import datetime
+    filename = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{secure_filename(file.filename)}"
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    file.save(path)
+
+    job = enqueue_job('question_import', {'path': path, 'quiz_id': quiz.id}, created_by=current_user.id)
+    flash('Question import queued.', 'info')
+    return redirect(url_for('admin.job_status', job_id=job.id))
+
+@job_handler('question_import')
+def run_question_import_job(job):
+    from utils.question_import import import_question_file
+    result = import_question_file(job.params['quiz_id'], job.params['path'])
+    return dict(result, quiz_id=job.params['quiz_id'])
 
 @admin_bp.route('/quiz/<int:quiz_id>/results')
 @login_required
@@ -1341,17 +1368,14 @@ def generate_excel(data, columns):
     output.seek(0)
     return output
 
-@admin_bp.route('/reports/<string:report_type>/<string:file_format>')
-@login_required
-def download_report(report_type, file_format):
-    if not isinstance(current_user._get_current_object(), AdminUser):
-        flash('Unauthorized', 'danger')
-        return redirect(url_for('auth.admin_login'))
-        
-    if file_format not in ['pdf', 'excel']:
-        flash('Invalid format', 'danger')
-        return redirect(url_for('admin.dashboard'))
+EXCEL_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
+def build_report(report_type, file_format):
+    """
+    Build a report file. Returns (BytesIO, download_name, mimetype);
+    raises ValueError for an unknown report type and RuntimeError if the
+    PDF could not be rendered.
+    """
     from datetime import datetime
     from models import Student, Company, PlacementDrive, DriveInvitation
     download_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -1378,21 +1402,8 @@ def download_report(report_type, file_format):
                 'Skills': s.skills,
                 'Resume': url_for('static', filename=s.resume_path, _external=True) if s.resume_path else 'N/A'
             })
-            
-        if file_format == 'excel':
-            cols = ['Roll No', 'Name', "Father's Name", "College Name", 'Email', 'Mobile', 'Department', 'Semester', 'CGPA', '10th %', '12th %', 'Status', 'Skills', 'Resume']
-            pdf_out = generate_excel(data, cols) 
-            return send_file(pdf_out, as_attachment=True, download_name=f"{filename}.xlsx", mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            
-        else:
-            # PDF
-            html = render_template('reports/student_report.html', students=students, download_time=download_time)
-            pdf = generate_pdf(html)
-            if pdf:
-                return send_file(pdf, as_attachment=True, download_name=f"{filename}.pdf", mimetype='application/pdf')
-            else:
-                flash('Error generating PDF', 'danger')
-                return redirect(url_for('admin.list_students'))
+        cols = ['Roll No', 'Name', "Father's Name", "College Name", 'Email', 'Mobile', 'Department', 'Semester', 'CGPA', '10th %', '12th %', 'Status', 'Skills', 'Resume']
+        template, context = 'reports/student_report.html', {'students': students}
 
     elif report_type == 'companies':
         companies = Company.query.all()
@@ -1405,15 +1416,8 @@ def download_report(report_type, file_format):
                 'Location': c.location,
                 'Industry': c.industry
             })
-            
-        if file_format == 'excel':
-            cols = ['Company Name', 'Email', 'Website', 'Location', 'Industry']
-            excel_out = generate_excel(data, cols)
-            return send_file(excel_out, as_attachment=True, download_name=f"{filename}.xlsx", mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        else:
-            html = render_template('reports/company_report.html', companies=companies, download_time=download_time)
-            pdf = generate_pdf(html)
-            return send_file(pdf, as_attachment=True, download_name=f"{filename}.pdf", mimetype='application/pdf')
+        cols = ['Company Name', 'Email', 'Website', 'Location', 'Industry']
+        template, context = 'reports/company_report.html', {'companies': companies}
 
     elif report_type == 'drives':
         drives = PlacementDrive.query.all()
@@ -1432,18 +1436,10 @@ def download_report(report_type, file_format):
                 'Criteria CGPA': d.criteria_cgpa,
                 'Allowed Branches': d.allowed_branches
             })
-            
-        if file_format == 'excel':
-            cols = ['Job Title', 'Company', 'Drive Date', 'Venue', 'Mode', 'Deadline', 'Salary', 'Criteria 10th', 'Criteria 12th', 'Criteria CGPA', 'Allowed Branches']
-            excel_out = generate_excel(data, cols)
-            return send_file(excel_out, as_attachment=True, download_name=f"{filename}.xlsx", mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        else:
-            html = render_template('reports/drive_report.html', drives=drives, download_time=download_time)
-            pdf = generate_pdf(html)
-            return send_file(pdf, as_attachment=True, download_name=f"{filename}.pdf", mimetype='application/pdf')
-            
+        cols = ['Job Title', 'Company', 'Drive Date', 'Venue', 'Mode', 'Deadline', 'Salary', 'Criteria 10th', 'Criteria 12th', 'Criteria CGPA', 'Allowed Branches']
+        template, context = 'reports/drive_report.html', {'drives': drives}
+
     elif report_type == 'invitations':
-        from models import DriveInvitation
         invitations = DriveInvitation.query.all()
         data = []
         for i in invitations:
@@ -1454,20 +1450,129 @@ def download_report(report_type, file_format):
                 'Sent At': i.sent_at.strftime('%Y-%m-%d %H:%M'),
                 'Responded At': i.responded_at.strftime('%Y-%m-%d %H:%M') if i.responded_at else 'N/A'
             })
-            
-        if file_format == 'excel':
-            cols = ['Company', 'Subject', 'Status', 'Sent At', 'Responded At']
-            excel_out = generate_excel(data, cols)
-            return send_file(excel_out, as_attachment=True, download_name=f"{filename}.xlsx", mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        else:
-            html = render_template('reports/invitation_report.html', invitations=invitations, download_time=download_time)
-            pdf = generate_pdf(html)
-            return send_file(pdf, as_attachment=True, download_name=f"{filename}.pdf", mimetype='application/pdf')
+        cols = ['Company', 'Subject', 'Status', 'Sent At', 'Responded At']
+        template, context = 'reports/invitation_report.html', {'invitations': invitations}
 
     else:
+        raise ValueError('Unknown report type')
+
+    if file_format == 'excel':
+        return generate_excel(data, cols), f"{filename}.xlsx", EXCEL_MIMETYPE
+
+    html = render_template(template, download_time=download_time, **context)
+    pdf = generate_pdf(html)
+    if pdf is None:
+        raise RuntimeError('Error generating PDF')
+    return pdf, f"{filename}.pdf", 'application/pdf'
+
+@admin_bp.route('/reports/<string:report_type>/<string:file_format>')
+@login_required
+def download_report(report_type, file_format):
+    if not isinstance(current_user._get_current_object(), AdminUser):
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('auth.admin_login'))
+        
+    if file_format not in ['pdf', 'excel']:
+        flash('Invalid format', 'danger')
+        return redirect(url_for('admin.dashboard'))
+
+    if report_type not in ['students', 'companies', 'drives', 'invitations']:
         flash('Unknown report type', 'danger')
         return redirect(url_for('admin.dashboard'))
 
+    if file_format == 'excel':
+        output, download_name, mimetype = build_report(report_type, file_format)
+        return send_file(output, as_attachment=True, download_name=download_name, mimetype=mimetype)
+
+    # PDF rendering is slow for large tables; hand it to a job worker.
+    # base_url lets the worker build the same _external links as this request.
+    job = enqueue_job('report', {'report_type': report_type, 'file_format': file_format,
+                                 'base_url': request.host_url}, created_by=current_user.id)
+    flash('Report generation queued. The download link appears here when it is ready.', 'info')
+    return redirect(url_for('admin.job_status', job_id=job.id))
+
+@job_handler('report')
+def run_report_job(job):
+    params = job.params
+    with current_app.test_request_context(base_url=params['base_url']):
+        output, download_name, mimetype = build_report(params['report_type'], params['file_format'])
+    job.save_artifact(output, download_name, mimetype)
+    return {'report_type': params['report_type'], 'file_format': params['file_format']}
+
+@admin_bp.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    if not isinstance(current_user._get_current_object(), AdminUser):
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('auth.admin_login'))
+
+    from models import BackgroundJob
+    from flask import jsonify
+    from utils.jobs import start_workers
+
+    job = BackgroundJob.query.get_or_404(job_id)
+    if job.status == 'Queued':
+        # Make sure this process has workers, e.g. after a restart left jobs queued
+        start_workers(current_app._get_current_object())
+
+    if request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json':
+        return jsonify(job.to_dict())
+    return render_template('admin_job.html', job=job, info=job.to_dict())
+
+@admin_bp.route('/jobs/<int:job_id>/download')
+@login_required
+def download_job_artifact(job_id):
+    if not isinstance(current_user._get_current_object(), AdminUser):
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('auth.admin_login'))
+
+    from models import BackgroundJob
+    job = BackgroundJob.query.get_or_404(job_id)
+    if job.status != 'Completed' or not job.artifact_path or not os.path.exists(job.artifact_path):
+        flash('No file available for this job.', 'warning')
+        return redirect(url_for('admin.job_status', job_id=job.id))
+    return send_file(job.artifact_path, as_attachment=True, download_name=job.artifact_name, mimetype=job.artifact_mimetype)
+
+@admin_bp.route('/email/queue')
+@login_required
+def email_queue_status():
+    if not isinstance(current_user._get_current_object(), AdminUser):
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('auth.admin_login'))
+
+    from flask import jsonify
+    # Outbox depth and the sender's rate-limit state (tokens, quota, recent throttling)
+    from utils.outbox import queue_stats
+    from utils.mail_scheduler import get_scheduler
+    return jsonify({'queue': queue_stats(), 'scheduler': get_scheduler().stats()})
+
+
+@admin_bp.route('/security/password-hashing')
+@login_required
+def password_hashing_status():
+    if not isinstance(current_user._get_current_object(), AdminUser):
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('auth.admin_login'))
+
+    from flask import jsonify
+    # Current bcrypt cost and login verification latency per stored cost
+    from utils.password_hashing import hashing_stats
+    return jsonify(hashing_stats())
+
+
+@admin_bp.route('/security/login-throttle')
+@login_required
+def login_throttle_status():
+    if not isinstance(current_user._get_current_object(), AdminUser):
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('auth.admin_login'))
+
+    from flask import jsonify
+    # How many logins were refused before bcrypt, and the hashing time that saved
+    from utils.login_throttle import get_throttle
+    throttle = get_throttle()
+    return jsonify(throttle.stats() if throttle else {'backend': None})
+
 
 @admin_bp.route('/drive/<int:drive_id>/report/applicants/<string:file_format>')
 @login_required
@@ -3,28 +3,33 @@ from flask_login import login_user, logout_user, login_required, current_user
 from extensions import db
 from models import Student, AdminUser
 from forms import StudentRegistrationForm, StudentLoginForm, AdminLoginForm, ChangePasswordForm, PasswordResetRequestForm, PasswordResetForm
-from utils.email_sender import send_email
+from utils.outbox import enqueue_email, flush_outbox
+from utils.password_hashing import rehash_if_needed
+from utils.login_throttle import get_throttle
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired
 
 auth_bp = Blueprint('auth', __name__)
 
+# These queue the email in the current transaction (see utils/outbox.py);
+# callers commit and then call flush_outbox().
+
 def send_verification_email(student):
     s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
     token = s.dumps(student.email, salt='email-confirm')
     
     link = url_for('auth.verify_email', token=token, _external=True)
     
-    link = url_for('auth.verify_email', token=token, _external=True)
-    
     subject = "Verify your Email - TPO Portal"
     body = f"Dear {student.name},\n\nPlease verify your email by clicking the link below:\n{link}\n\nThis link expires in 1 hour."
     
-    if not send_email(subject, [student.email], body):
-        flash('Verification email could not be sent. Please check your email configuration or contact support.', 'warning')
-    else:
-        # We don't need double-flash if registration route also flashes success, 
-        # but let's leave success message to the route handler. 
-        pass
+    enqueue_email(subject, [student.email], body, email_type='Verification', student_id=student.id)
+
+def _display_name(user):
+    # Students have a name; admins may only have a username
+    return getattr(user, 'name', None) or getattr(user, 'username', None) or 'User'
+
+def _student_id(user):
+    return user.id if isinstance(user, Student) else None
 
 def send_password_reset_email(user, user_type):
     """Send password reset email to student or admin"""
@@ -34,18 +39,16 @@ def send_password_reset_email(user, user_type):
     link = url_for('auth.reset_password', token=token, _external=True)
     
     subject = "Password Reset Request - TPO Portal"
-    body = f"Dear {user_name},\n\nYou requested to reset your password. Click the link below to reset:\n{link}\n\nThis link expires in 1 hour.\n\nIf you did not request this, please ignore this email."
+    body = f"Dear {_display_name(user)},\n\nYou requested to reset your password. Click the link below to reset:\n{link}\n\nThis link expires in 1 hour.\n\nIf you did not request this, please ignore this email."
     
-    if not send_email(subject, [user.email], body):
-         print(f"Failed to send password reset email to {user.email}")
+    enqueue_email(subject, [user.email], body, email_type='PasswordReset', student_id=_student_id(user))
 
 def send_password_reset_confirmation(user):
     """Send confirmation email after password reset"""
     subject = "Password Reset Successful - TPO Portal"
-    body = f"Dear {user_name},\n\nYour password has been successfully reset.\n\nIf you did not make this change, please contact the administrator immediately."
+    body = f"Dear {_display_name(user)},\n\nYour password has been successfully reset.\n\nIf you did not make this change, please contact the administrator immediately."
     
-    if not send_email(subject, [user.email], body):
-        print(f"Failed to send password reset confirmation to {user.email}")
+    enqueue_email(subject, [user.email], body, email_type='PasswordResetConfirmation', student_id=_student_id(user))
 
 
 @auth_bp.route('/')
@@ -106,21 +109,50 @@ def student_register():
                 )
                 db.session.add(backlog)
         
-        db.session.commit()
-        
         send_verification_email(student)
+        db.session.commit()
+        flush_outbox()
         
         flash('Registration successful. Please verify your email sent to your registered address before logging in.', 'info')
         return redirect(url_for('auth.student_login'))
     
     return render_template('student_register.html', form=form)
 
+def _login_blocked(kind, identifier):
+    """
+    Throttle check that runs before the user is loaded or any hash is
+    verified (see utils/login_throttle.py). Returns a message if blocked.
+    """
+    throttle = get_throttle()
+    if throttle is None:
+        return None
+    wait = throttle.check(kind, identifier, request.remote_addr)
+    if wait is None:
+        return None
+    minutes = (wait + 59) // 60
+    return f'Too many failed login attempts. Please try again in {minutes} minute{"s" if minutes != 1 else ""}.'
+
+def _login_result(kind, identifier, ok):
+    throttle = get_throttle()
+    if throttle is not None:
+        if ok:
+            throttle.succeeded(kind, identifier, request.remote_addr)
+        else:
+            throttle.failed(kind, identifier, request.remote_addr)
+
 @auth_bp.route('/student/login', methods=['GET', 'POST'])
 def student_login():
     form = StudentLoginForm()
     if form.validate_on_submit():
+        blocked = _login_blocked('S', form.roll_no.data)
+        if blocked:
+            flash(blocked, 'danger')
+            return render_template('student_login.html', form=form), 429
         student = Student.query.filter_by(roll_no=form.roll_no.data).first()
         if student and student.check_password(form.password.data):
+            _login_result('S', form.roll_no.data, True)
+            if rehash_if_needed(student, form.password.data):
+                db.session.commit()
             login_user(student)
             
             # Check for forced password change
@@ -136,6 +168,7 @@ def student_login():
                 return redirect(url_for('auth.student_login'))
 
             return redirect(url_for('student.dashboard'))
+        _login_result('S', form.roll_no.data, False)
         flash('Invalid roll number or password', 'danger')
     return render_template('student_login.html', form=form)
 
@@ -154,9 +187,9 @@ def change_password():
         current_user.set_password(form.password.data)
         current_user.is_password_changed = True
         current_user.is_email_verified = False # Invalidate until verified
-        db.session.commit()
-        
         send_verification_email(current_user)
+        db.session.commit()
+        flush_outbox()
         logout_user()
         
         flash('Password changed successfully. A verification email has been sent to your registered email ID. Please verify to login.', 'info')
@@ -190,10 +223,18 @@ def verify_email(token):
 def admin_login():
     form = AdminLoginForm()
     if form.validate_on_submit():
+        blocked = _login_blocked('A', form.username.data)
+        if blocked:
+            flash(blocked, 'danger')
+            return render_template('admin_login.html', form=form), 429
         admin = AdminUser.query.filter_by(username=form.username.data).first()
         if admin and admin.check_password(form.password.data):
+            _login_result('A', form.username.data, True)
+            if rehash_if_needed(admin, form.password.data):
+                db.session.commit()
             login_user(admin)
             return redirect(url_for('admin.dashboard'))
+        _login_result('A', form.username.data, False)
         flash('Invalid credentials', 'danger')
     return render_template('admin_login.html', form=form)
 
@@ -206,6 +247,8 @@ def student_forgot_password():
         student = Student.query.filter_by(email=form.email.data.lower()).first()
         if student:
             send_password_reset_email(student, 'student')
+            db.session.commit()
+            flush_outbox()
             flash('Password reset link has been sent to your email.', 'info')
         else:
             # Don't reveal if email exists or not for security
@@ -220,6 +263,8 @@ def admin_forgot_password():
         admin = AdminUser.query.filter_by(email=form.email.data.lower()).first()
         if admin:
             send_password_reset_email(admin, 'admin')
+            db.session.commit()
+            flush_outbox()
             flash('Password reset link has been sent to your email.', 'info')
         else:
             # Don't reveal if email exists or not for security
@@ -253,9 +298,9 @@ def reset_password(token):
     form = PasswordResetForm()
     if form.validate_on_submit():
         user.set_password(form.password.data)
-        db.session.commit()
-        
         send_password_reset_confirmation(user)
+        db.session.commit()
+        flush_outbox()
         
         flash('Your password has been reset successfully. You can now login.', 'success')
         if user_type == 'student':
@@ -268,6 +313,8 @@ def reset_password(token):
 @auth_bp.route('/logout')
 @login_required
 def logout():
+    from utils.identity_cache import invalidate_identity
+    invalidate_identity(current_user._get_current_object())
     logout_user()
     flash('Logged out', 'info')
     return redirect(url_for('auth.student_login'))
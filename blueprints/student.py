@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, send_fil
 from flask_login import login_required, current_user
 from models import Student, Quiz, QuizAttempt, Question
 from extensions import db
+from utils.identity_cache import applied_drive_ids as applied_drive_ids_for, attempted_quiz_ids
 
 student_bp = Blueprint('student', __name__, url_prefix='/student')
 
@@ -20,7 +21,9 @@ def dashboard():
         flash('Please verify your email address.', 'warning')
         return redirect(url_for('auth.student_login'))
 
-    return render_template('student_dashboard.html', student=current_user)
+    from utils.recommendations import recommendations_for
+    return render_template('student_dashboard.html', student=current_user,
+                           recommendations=recommendations_for(current_user))
 
 @student_bp.route('/profile/edit', methods=['GET', 'POST'])
 @login_required
@@ -238,18 +241,30 @@ def list_drives():
         flash('Your account is pending approval. You cannot browse jobs yet.', 'warning')
         return redirect(url_for('student.dashboard'))
          
-    from models import PlacementDrive, JobApplication
+    from models import PlacementDrive
     from datetime import datetime
-    
-    # Get active drives (deadline not passed)
-    drives = PlacementDrive.query.filter(PlacementDrive.deadline >= datetime.utcnow().date()).order_by(PlacementDrive.created_at.desc()).all()
-    
-    # Get IDs of drives already applied to
-    applied_drive_ids = [app.drive_id for app in current_user.applications]
-    
-    return render_template('student_drives.html', drives=drives, applied_drive_ids=applied_drive_ids, student=current_user, datetime=datetime)
+    from flask import current_app
+    from sqlalchemy.orm import joinedload, selectinload
+    from utils.eligibility_matrix import student_eligibility
+
+    page = request.args.get('page', 1, type=int)
 
-    return render_template('student_drives.html', drives=drives, applied_drive_ids=applied_drive_ids, student=current_user)
+    # Get active drives (deadline not passed). Company and quizzes are loaded
+    # with the page (join + one IN query), not per card in the template.
+    drives = PlacementDrive.query \
+        .options(joinedload(PlacementDrive.company), selectinload(PlacementDrive.quizzes_list)) \
+        .filter(PlacementDrive.deadline >= datetime.utcnow().date()) \
+        .order_by(PlacementDrive.created_at.desc(), PlacementDrive.id.desc()) \
+        .paginate(page=page, per_page=current_app.config.get('STUDENT_DRIVES_PER_PAGE', 12), error_out=False)
+
+    # Set of drive ids already applied to (cached with the login, see utils/identity_cache.py)
+    applied_drive_ids = applied_drive_ids_for(current_user)
+
+    # Why the student can't apply to each drive on this page (empty list = eligible),
+    # read from the materialised eligibility table in one query
+    ineligible = student_eligibility(current_user, drives.items)
+
+    return render_template('student_drives.html', drives=drives, applied_drive_ids=applied_drive_ids, student=current_user, datetime=datetime, ineligible=ineligible)
 
 @student_bp.route('/resume/data', methods=['POST'])
 @login_required
@@ -380,19 +395,8 @@ def apply_drive(drive_id):
         return redirect(url_for('student.list_drives'))
         
     # Check Eligibility
-    reasons = []
-    if (current_user.tenth_marks or 0) < drive.criteria_10th:
-        reasons.append(f"10th Marks < {drive.criteria_10th}%")
-    if (current_user.twelfth_marks or 0) < drive.criteria_12th:
-        reasons.append(f"12th Marks < {drive.criteria_12th}%")
-    if (current_user.cgpa or 0) < drive.criteria_cgpa:
-        reasons.append(f"Diploma CGPA < {drive.criteria_cgpa}")
-    
-    if drive.allowed_branches:
-        allowed = [b.strip().lower() for b in drive.allowed_branches.split(',')]
-        if current_user.department.lower() not in allowed:
-             reasons.append(f"Department '{current_user.department}' not eligible.")
-             
+    from utils.eligibility import evaluate_student
+    reasons = evaluate_student(current_user, [drive])[drive.id]
     if reasons:
         flash(f'Not Eligible: {", ".join(reasons)}', 'danger')
         return redirect(url_for('student.list_drives'))
@@ -416,7 +420,8 @@ def list_quizzes():
     from datetime import datetime
     
     # Get IDs of drives applied to
-    applied_drive_ids = [app.drive_id for app in current_user.applications]
+    applied_drive_ids = applied_drive_ids_for(current_user)
+    attempted = attempted_quiz_ids(current_user)
     
     # Filter quizzes: 
     # 1. Linked to one of the applied drives
@@ -435,7 +440,9 @@ def list_quizzes():
     for quiz in all_quizzes:
         is_live_now = quiz.is_live or (quiz.live_at and quiz.live_at <= now)
         if is_live_now:
-            attempt = QuizAttempt.query.filter_by(student_id=current_user.id, quiz_id=quiz.id).first()
+            attempt = None
+            if quiz.id in attempted:
+                attempt = QuizAttempt.query.filter_by(student_id=current_user.id, quiz_id=quiz.id).first()
             available_quizzes.append({
                 'quiz': quiz,
                 'attempt': attempt
@@ -458,8 +465,7 @@ def take_quiz(quiz_id):
     
     # Access Control Check
     # 1. Check if applied to drive
-    applied_drive_ids = [app.drive_id for app in current_user.applications]
-    if quiz.drive_id not in applied_drive_ids:
+    if quiz.drive_id not in applied_drive_ids_for(current_user):
         flash('Access Denied. You must apply to the associated Placement Drive to take this quiz.', 'danger')
         return redirect(url_for('student.list_quizzes'))
         
@@ -468,14 +474,17 @@ def take_quiz(quiz_id):
          flash('This quiz is not live yet.', 'warning')
          return redirect(url_for('student.list_quizzes'))
     
-    # Check if already attempted
-    existing_attempt = QuizAttempt.query.filter_by(student_id=current_user.id, quiz_id=quiz.id).first()
-    if existing_attempt:
+    # Check if already attempted (re-checked against the database before grading)
+    if quiz.id in attempted_quiz_ids(current_user):
         flash('You have already taken this assessment.', 'info')
         return redirect(url_for('student.list_quizzes'))
         
     if request.method == 'POST':
         import json
+
+        if QuizAttempt.query.filter_by(student_id=current_user.id, quiz_id=quiz.id).first():
+            flash('You have already taken this assessment.', 'info')
+            return redirect(url_for('student.list_quizzes'))
         
         # Grade the quiz
         score = 0
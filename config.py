@@ -25,6 +25,44 @@ class Config:
     # Default URL can be set to Brevo: https://api.brevo.com/v3/smtp/email
     MAIL_API_TOKEN = os.getenv('MAIL_API_TOKEN')
     MAIL_API_URL = os.getenv('MAIL_API_URL', 'https://send.api.mailtrap.io/api/send')
+
+    # HTTP transport for the API providers: pooled keep-alive connections,
+    # timeouts (seconds) and retries with backoff on connection errors and 429
+    # responses (5xx are retried by the outbox)
+    MAIL_API_POOL_SIZE = int(os.getenv('MAIL_API_POOL_SIZE', 10))
+    MAIL_API_CONNECT_TIMEOUT = float(os.getenv('MAIL_API_CONNECT_TIMEOUT', 5))
+    MAIL_API_READ_TIMEOUT = float(os.getenv('MAIL_API_READ_TIMEOUT', 30))
+    MAIL_API_RETRIES = int(os.getenv('MAIL_API_RETRIES', 3))
+    MAIL_API_RETRY_BACKOFF = float(os.getenv('MAIL_API_RETRY_BACKOFF', 0.5))
+
+    # Messages per provider request when sending in bulk (capped by the provider: Resend 100, Brevo 1000)
+    MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', 100))
+
+    # Outbound rate limits per provider: token bucket on API requests
+    # (per_second, burst) and an optional daily message quota (per_day).
+    # MAIL_RATE_PER_SECOND / MAIL_DAILY_QUOTA override the active provider's values.
+    MAIL_RATE_LIMITS = {
+        'resend': {'per_second': 2, 'burst': 2, 'per_day': None},
+        'brevo': {'per_second': 10, 'burst': 10, 'per_day': None},
+        'other': {'per_second': 10, 'burst': 10, 'per_day': None},
+        'smtp': {'per_second': None, 'per_day': None},
+    }
+    MAIL_RATE_PER_SECOND = float(os.getenv('MAIL_RATE_PER_SECOND', 0)) or None
+    MAIL_DAILY_QUOTA = int(os.getenv('MAIL_DAILY_QUOTA', 0)) or None
+
+    # 'fake' swaps the real provider for an in-memory mailbox (offline development/tests)
+    MAIL_PROVIDER = os.getenv('MAIL_PROVIDER')
+
+    # Email outbox (utils/outbox.py). Delivery threads run inside the web
+    # process; set MAIL_OUTBOX_WORKER_THREADS = 0 and run job_worker.py to
+    # deliver from a separate process. MAIL_OUTBOX_INLINE delivers right after
+    # the request commits instead (None = only when TESTING).
+    MAIL_OUTBOX_WORKER_THREADS = int(os.getenv('MAIL_OUTBOX_WORKER_THREADS', 2))
+    MAIL_OUTBOX_INLINE = None
+    MAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('MAIL_OUTBOX_POLL_INTERVAL', 2))
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('MAIL_OUTBOX_MAX_ATTEMPTS', 5))
+    MAIL_OUTBOX_RETRY_BACKOFF = float(os.getenv('MAIL_OUTBOX_RETRY_BACKOFF', 30)) # seconds, doubled per attempt
+    MAIL_OUTBOX_STALE_SECONDS = int(os.getenv('MAIL_OUTBOX_STALE_SECONDS', 300))
     
     # Override Recipient (for testing in restricted environments like Resend Sandbox)
     # If set, ALL emails will be sent to this address instead of the actual recipient.
@@ -34,6 +72,85 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
     MAX_CONTENT_LENGTH = 64 * 1024 * 1024  # 64MB max limit
     ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
+    # Rows per streamed chunk / executemany statement during bulk student import.
+    # Each chunk is committed on its own, so memory stays bounded by this size.
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 500))
+
+    # Password hashing pool (defaults to one worker process per CPU)
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 0)) or None
+
+    # bcrypt cost: 12 unless BCRYPT_LOG_ROUNDS says otherwise. Setting
+    # BCRYPT_TARGET_MS (off by default) instead calibrates the cost once so one
+    # hash takes about that long, saved to BCRYPT_CALIBRATION_FILE for every
+    # other process (default: in the instance folder). The result may be below
+    # 12 to save CPU, but never below BCRYPT_MIN_ROUNDS (10, the usual minimum
+    # for bcrypt) or above BCRYPT_MAX_ROUNDS. Pin BCRYPT_LOG_ROUNDS when app
+    # hosts don't share the file. Hashes at any other cost are re-hashed on
+    # the user's next successful login.
+    BCRYPT_TARGET_MS = float(os.getenv('BCRYPT_TARGET_MS', 0))
+    BCRYPT_MIN_ROUNDS = int(os.getenv('BCRYPT_MIN_ROUNDS', 10))
+    BCRYPT_MAX_ROUNDS = int(os.getenv('BCRYPT_MAX_ROUNDS', 14))
+    BCRYPT_CALIBRATION_FILE = os.getenv('BCRYPT_CALIBRATION_FILE')
+    BCRYPT_REHASH_ON_LOGIN = os.getenv('BCRYPT_REHASH_ON_LOGIN', 'true').lower() in ['true', 'on', '1']
+    if os.getenv('BCRYPT_LOG_ROUNDS'):
+        BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS'))
+
+    # Background jobs (imports, PDF reports). The database is the queue.
+    # JOB_WORKER_THREADS = 0 disables in-process workers; run job_worker.py instead.
+    JOB_WORKER_THREADS = int(os.getenv('JOB_WORKER_THREADS', 2))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 2))
+    # Running jobs heartbeat every JOB_HEARTBEAT_INTERVAL seconds; one silent for
+    # JOB_STALE_SECONDS lost its worker and is failed. Report files are
+    # deleted JOB_ARTIFACT_TTL seconds after the job finished.
+    JOB_HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_INTERVAL', 30))
+    JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 300))
+    JOB_ARTIFACT_FOLDER = os.path.join(os.getcwd(), 'uploads', 'job_artifacts')
+    JOB_ARTIFACT_TTL = int(os.getenv('JOB_ARTIFACT_TTL', 7 * 24 * 3600))
+
+    # Drive cards per page on the student drive list
+    STUDENT_DRIVES_PER_PAGE = int(os.getenv('STUDENT_DRIVES_PER_PAGE', 12))
+
+    # Approved-student snapshot behind the drive form's eligibility preview
+    # (seconds). Dropped on commits that change a student's eligibility; the
+    # TTL only bounds staleness across worker processes.
+    ELIGIBILITY_SNAPSHOT_TTL = float(os.getenv('ELIGIBILITY_SNAPSHOT_TTL', 300))
+
+    # Tech match student ranking: best-fit results shown, and the lifetime
+    # (seconds) of the cached student x skill matrix (dropped on relevant commits)
+    TECH_MATCH_RESULTS = int(os.getenv('TECH_MATCH_RESULTS', 50))
+    SKILL_RANKING_TTL = float(os.getenv('SKILL_RANKING_TTL', 300))
+
+    # Admin lists: rows per page (keyset pagination, see utils/pagination.py)
+    # and lifetime (seconds) of the cached totals, dropped on writes to the table
+    ADMIN_LIST_PER_PAGE = int(os.getenv('ADMIN_LIST_PER_PAGE', 20))
+    LIST_COUNT_TTL = float(os.getenv('LIST_COUNT_TTL', 300))
+
+    # "Recommended for you" on the student dashboard: drives and companies
+    # kept per student, and whether commits queue the refresh job (unset:
+    # on unless testing; tests drain the queue with process_queue())
+    RECOMMENDATIONS_PER_KIND = int(os.getenv('RECOMMENDATIONS_PER_KIND', 5))
+    RECOMMENDATIONS_AUTO_REFRESH = None
+
+    # Logged-in user cache (seconds; 0 disables). Entries are invalidated on
+    # commit, the TTL only bounds staleness across worker processes.
+    IDENTITY_CACHE_TTL = float(os.getenv('IDENTITY_CACHE_TTL', 30))
+    IDENTITY_CACHE_SIZE = int(os.getenv('IDENTITY_CACHE_SIZE', 5000))
+
+    # Number of reverse proxies in front of the app (Railway/Heroku: 1) whose
+    # X-Forwarded-For is trusted for the client address. 0: use the socket address.
+    TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+
+    # Failed-login throttle, checked before any bcrypt work: at most N failures
+    # per account / per client address within the sliding window (seconds).
+    # Backend: 'memory' (per process, at most LOGIN_THROTTLE_MAX_KEYS keys),
+    # 'database' (shared) or 'none'. The per-address limit is off (0) by
+    # default: behind a proxy every client shares its address, so only turn it
+    # on with TRUSTED_PROXY_COUNT set.
+    LOGIN_THROTTLE_BACKEND = os.getenv('LOGIN_THROTTLE_BACKEND', 'memory')
+    LOGIN_THROTTLE_WINDOW = int(os.getenv('LOGIN_THROTTLE_WINDOW', 300))
+    LOGIN_THROTTLE_MAX_PER_ACCOUNT = int(os.getenv('LOGIN_THROTTLE_MAX_PER_ACCOUNT', 5))
+    LOGIN_THROTTLE_MAX_PER_ADDRESS = int(os.getenv('LOGIN_THROTTLE_MAX_PER_ADDRESS', 0))
+    LOGIN_THROTTLE_MAX_KEYS = int(os.getenv('LOGIN_THROTTLE_MAX_KEYS', 100000))
 
     # Admin Credentials
     ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'tpo')
@@ -109,6 +109,7 @@ class AdminBulkImportForm(FlaskForm):
         FileAllowed(['xlsx', 'xls', 'csv'], 'Excel or CSV files only!')
     ])
     submit = SubmitField('Import')
+    validate_only = SubmitField('Validate Only')
 
 class StudentEditForm(FlaskForm):
     roll_no = StringField('Roll Number', validators=[DataRequired(), Length(min=2, max=20), Regexp(r'^[A-Za-z0-9]+$', message="Roll number must be alphanumeric")])
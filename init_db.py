@@ -1,16 +1,34 @@
+"""
+Create or upgrade the schema and the default admin. Runs on every deploy
+(see Procfile), so the derived tables (eligibility, skill index,
+recommendations, SQLite search index) are only built when they are new or
+empty; they are kept current incrementally after that.
+
+    python init_db.py              # schema, missing indexes, default admin
+    python init_db.py --rebuild    # also rebuild every derived table from scratch
+"""
+import argparse
 from app import create_app, db
 import models
 from models import AdminUser, Student
 
 
-def init_db():
+def _is_empty(model):
+    return not db.session.query(model.query.exists()).scalar()
+
+
+def init_db(rebuild=False):
     app = create_app()
     with app.app_context():
+        from sqlalchemy import inspect, text
+        from utils.student_search import FTS_TABLE, ensure_student_search
+        # Checked before create_all, which would create it
+        search_index_new = not inspect(db.engine).has_table(FTS_TABLE)
+
         print("Creating database tables...")
         db.create_all()
         
         # Schema Migration: Add 'backlogs' column to 'students' if missing (for existing deployments)
-        from sqlalchemy import inspect, text
         inspector = inspect(db.engine)
         if inspector.has_table('students'):
             columns = [col['name'] for col in inspector.get_columns('students')]
@@ -40,6 +58,13 @@ def init_db():
                     conn.commit()
                 print("Migration: 'is_email_verified' column added.")
 
+            if 'import_fingerprint' not in columns:
+                print("Migrating: Adding 'import_fingerprint' column to 'students' table...")
+                with db.engine.connect() as conn:
+                    conn.execute(text("ALTER TABLE students ADD COLUMN import_fingerprint VARCHAR(40)"))
+                    conn.commit()
+                print("Migration: 'import_fingerprint' column added.")
+
         # Schema Migration: Add 'contact_number' column to 'companies'
         if inspector.has_table('companies'):
             columns = [col['name'] for col in inspector.get_columns('companies')]
@@ -52,6 +77,38 @@ def init_db():
             else:
                 print("Schema Check: 'contact_number' column already exists.")
 
+        # Search index for the admin student list (new databases get it with the students table)
+        ensure_student_search(db.engine, fill=rebuild or search_index_new)
+        print("Student search index ready.")
+
+        # Indexes behind the admin lists' keyset pagination (create_all skips existing tables)
+        for index in (*models.Student.__table__.indexes, *models.ProfileUpdateRequest.__table__.indexes):
+            index.create(db.engine, checkfirst=True)
+
+        # Derived tables are kept current incrementally; build them from scratch
+        # only when new or empty (or asked to), not on every deploy
+        from utils.eligibility_matrix import rebuild_eligibility
+        if rebuild or _is_empty(models.DriveEligibility):
+            rows = rebuild_eligibility(db.session)
+            db.session.commit()
+            print(f"Drive eligibility table rebuilt ({rows} rows).")
+
+        from utils.skills import seed_skills
+        seed_skills(db.session)
+        db.session.commit()
+
+        from utils.skill_index import rebuild_skill_index
+        if rebuild or _is_empty(models.StudentSkill):
+            rows = rebuild_skill_index(db.session)
+            db.session.commit()
+            print(f"Skill index rebuilt ({rows} rows).")
+
+        from utils.recommendations import rebuild_recommendations
+        if rebuild or _is_empty(models.Recommendation):
+            rows = rebuild_recommendations(db.session)
+            db.session.commit()
+            print(f"Student recommendations rebuilt ({rows} rows).")
+
         print("Checking for default admin user...")
         default_user = app.config['ADMIN_USERNAME']
         if not AdminUser.query.filter_by(username=default_user).first():
@@ -65,4 +122,6 @@ def init_db():
             print("Default admin already exists.")
             
 if __name__ == '__main__':
-    init_db()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rebuild', action='store_true', help='rebuild the derived tables from scratch')
+    init_db(rebuild=parser.parse_args().rebuild)
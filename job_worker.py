@@ -0,0 +1,16 @@
+"""
+Dedicated background job worker.
+
+Web processes run JOB_WORKER_THREADS job threads themselves; set it to 0
+and run this instead (e.g. `worker: python job_worker.py`) to keep imports
+and report generation off the web dynos entirely. The same process also
+delivers the email outbox (set MAIL_OUTBOX_WORKER_THREADS = 0 on the web
+side to move email delivery here too).
+"""
+from app import app
+from utils.jobs import run_worker
+from utils.outbox import start_delivery_workers
+
+if __name__ == '__main__':
+    start_delivery_workers(app, count=max(1, app.config['MAIL_OUTBOX_WORKER_THREADS']))
+    run_worker(app)
@@ -1,9 +1,12 @@
 from datetime import datetime
 from flask_login import UserMixin
-from extensions import db, bcrypt
+from sqlalchemy import event, inspect
+from extensions import db
+from utils.password_hashing import hash_password, verify_password
 
 class Student(UserMixin, db.Model):
     __tablename__ = 'students'
+    __table_args__ = (db.Index('ix_students_status_id', 'status', 'id'),) # Admin list order
 
     id = db.Column(db.Integer, primary_key=True)
     roll_no = db.Column(db.String(20), unique=True, nullable=False)
@@ -30,6 +33,7 @@ class Student(UserMixin, db.Model):
     status = db.Column(db.String(20), default='Pending')
     is_password_changed = db.Column(db.Boolean, default=False)
     is_email_verified = db.Column(db.Boolean, default=False)
+    import_fingerprint = db.Column(db.String(40), nullable=True) # Hash of the last bulk-imported row, see utils/student_import.py
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow,
                            onupdate=datetime.utcnow)
@@ -38,15 +42,31 @@ class Student(UserMixin, db.Model):
     backlogs_list = db.relationship('Backlog', backref='student', cascade='all, delete-orphan', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
     def get_id(self):
         return f"S-{self.id}"
 
 
+# Columns the bulk import writes. If any of them is changed some other way
+# (profile edit, admin edit, approved request) the stored import fingerprint
+# no longer describes the row, so drop it and let the next import rewrite it.
+IMPORTED_STUDENT_FIELDS = ('roll_no', 'name', 'email', 'mobile', 'department', 'semester',
+                           'tenth_marks', 'twelfth_marks', 'cgpa', 'backlogs', 'skills',
+                           'projects_internship')
+
+@event.listens_for(Student, 'before_update')
+def _clear_stale_import_fingerprint(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.import_fingerprint.history.has_changes():
+        return
+    if any(state.attrs[field].history.has_changes() for field in IMPORTED_STUDENT_FIELDS):
+        target.import_fingerprint = None
+
+
 class Backlog(db.Model):
     """Model to store individual backlog details"""
     __tablename__ = 'backlogs'
@@ -73,10 +93,10 @@ class AdminUser(UserMixin, db.Model):
     mobile = db.Column(db.String(15), nullable=True)
 
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
     def get_id(self):
         return f"A-{self.id}"
@@ -84,6 +104,7 @@ class AdminUser(UserMixin, db.Model):
 
 class ProfileUpdateRequest(db.Model):
     __tablename__ = 'profile_update_requests'
+    __table_args__ = (db.Index('ix_profile_update_requests_status_id', 'status', 'id'),)
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
     requested_changes = db.Column(db.Text, nullable=False) # JSON
@@ -103,6 +124,74 @@ class EmailLog(db.Model):
     error_message = db.Column(db.Text)
     sent_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class EmailOutbox(db.Model):
+    """Outgoing email, written in the same transaction as the change that triggers it"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (db.Index('ix_email_outbox_due', 'status', 'next_attempt_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    email_type = db.Column(db.String(50))
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id')) # For EmailLog, if the mail is about a student
+    recipients = db.Column(db.Text, nullable=False) # JSON list
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    html = db.Column(db.Text)
+
+    status = db.Column(db.String(20), default='Pending') # Pending, Sending, Sent, Dead
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    claim_token = db.Column(db.String(32)) # Identifies the worker pass that claimed a batch
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+class LoginAttempt(db.Model):
+    """Failed login, for the database-backed login throttle (utils/login_throttle.py)"""
+    __tablename__ = 'login_attempts'
+    __table_args__ = (db.Index('ix_login_attempts_key_time', 'key', 'created_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(200), nullable=False) # 'S:<roll_no>', 'A:<username>' or 'ip:<address>'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class BackgroundJob(db.Model):
+    """Long-running admin work (imports, reports) queued for the job workers"""
+    __tablename__ = 'background_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), default='Queued', index=True) # Queued, Running, Completed, Failed
+    progress = db.Column(db.Float, default=0.0) # 0 - 100
+    params = db.Column(db.Text) # JSON
+    result = db.Column(db.Text) # JSON
+    error_message = db.Column(db.Text)
+
+    # Result file (e.g. generated PDF), stored under JOB_ARTIFACT_FOLDER
+    artifact_path = db.Column(db.String(255))
+    artifact_name = db.Column(db.String(255))
+    artifact_mimetype = db.Column(db.String(100))
+
+    created_by = db.Column(db.Integer, db.ForeignKey('admin_users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        import json
+        return {
+            'id': self.id,
+            'type': self.job_type,
+            'status': self.status,
+            'progress': round(self.progress or 0, 1),
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error_message,
+            'has_artifact': bool(self.artifact_path),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
 class Company(db.Model):
     __tablename__ = 'companies'
     id = db.Column(db.Integer, primary_key=True)
@@ -145,6 +234,70 @@ class PlacementDrive(db.Model):
     
     applications = db.relationship('JobApplication', backref='drive', cascade='all, delete-orphan')
 
+class DriveEligibility(db.Model):
+    """
+    Materialised eligibility of each approved student for each open drive,
+    kept current by utils/eligibility_matrix.py.
+    """
+    __tablename__ = 'drive_eligibility'
+    __table_args__ = (db.Index('ix_drive_eligibility_drive', 'drive_id', 'eligible'),)
+
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='CASCADE'), primary_key=True)
+    drive_id = db.Column(db.Integer, db.ForeignKey('placement_drives.id', ondelete='CASCADE'), primary_key=True)
+    eligible = db.Column(db.Boolean, nullable=False)
+    reasons = db.Column(db.String(40)) # Failed criteria codes, e.g. "tenth,cgpa" (see utils/eligibility.CRITERIA)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Skill(db.Model):
+    """Canonical skill, e.g. React (see utils/skills.py)"""
+    __tablename__ = 'skills'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    aliases = db.relationship('SkillAlias', backref='skill', cascade='all, delete-orphan', lazy=True)
+
+class SkillAlias(db.Model):
+    """A spelling that resolves to a skill, e.g. 'reactjs' -> React. Keys come from utils.skills.skill_key()"""
+    __tablename__ = 'skill_aliases'
+
+    key = db.Column(db.String(100), primary_key=True)
+    skill_id = db.Column(db.Integer, db.ForeignKey('skills.id', ondelete='CASCADE'), nullable=False, index=True)
+
+class StudentSkill(db.Model):
+    """
+    Inverted skill index: one row per student per canonical skill, kept
+    current by utils/skill_index.py.
+    """
+    __tablename__ = 'student_skills'
+    __table_args__ = (db.Index('ix_student_skills_skill', 'skill_id', 'student_id'),)
+
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='CASCADE'), primary_key=True)
+    skill_id = db.Column(db.Integer, db.ForeignKey('skills.id', ondelete='CASCADE'), primary_key=True)
+
+class Recommendation(db.Model):
+    """A student's top-N drives and companies, precomputed by utils/recommendations.py"""
+    __tablename__ = 'recommendations'
+    __table_args__ = (db.Index('ix_recommendations_target', 'kind', 'target_id'),)
+
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='CASCADE'), primary_key=True)
+    kind = db.Column(db.String(10), primary_key=True) # 'drive' or 'company'
+    target_id = db.Column(db.Integer, primary_key=True) # placement_drives.id / companies.id
+    rank = db.Column(db.Integer, nullable=False) # 1 = best
+    score = db.Column(db.Float, nullable=False)
+    similarity = db.Column(db.Float, nullable=False) # skill cosine similarity, 0 - 1
+    eligible = db.Column(db.Boolean, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class RecommendationQueue(db.Model):
+    """Students, companies or drives whose recommendations are due a refresh"""
+    __tablename__ = 'recommendation_queue'
+
+    kind = db.Column(db.String(10), primary_key=True) # 'student', 'company' or 'drive'
+    target_id = db.Column(db.Integer, primary_key=True)
+    queued_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
 class JobApplication(db.Model):
     __tablename__ = 'job_applications'
     id = db.Column(db.Integer, primary_key=True)
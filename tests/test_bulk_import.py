@@ -0,0 +1,313 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+import pandas as pd
+from app import create_app, db
+from config import Config
+from models import Student, AdminUser, Backlog, BackgroundJob
+from utils.student_import import StudentImporter, run_import, validate_import
+from utils.jobs import run_next_job
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    JOB_WORKER_THREADS = 0
+
+HEADER = "roll_no,name,email,mobile,department,semester,tenth_marks,twelfth_marks,cgpa,backlogs,skills,projects\n"
+
+def read(csv_rows):
+    return pd.read_csv(io.StringIO(HEADER + csv_rows), dtype=str)
+
+class BulkImportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        existing = Student(roll_no='100', name='Old Name', email='old@e.com', mobile='1111111111',
+                           department='IT', semester=3, cgpa=7.0, password_hash='hash')
+        db.session.add(existing)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def run_import(self, csv_rows, batch_size=500):
+        importer = StudentImporter(batch_size=batch_size)
+        importer.import_frame(read(csv_rows))
+        db.session.commit()
+        return importer.summary()
+
+    def test_insert_and_update(self):
+        summary = self.run_import(
+            "100,New Name,old@e.com,2222222222,CS,5,80,81,8.1,0,Python,Proj\n"
+            "101,Fresh,fresh@e.com,3333333333,IT,4,70,71,0,2,SQL,\n"
+        )
+        self.assertEqual(summary['inserted'], 1)
+        self.assertEqual(summary['updated'], 1)
+        self.assertEqual(summary['errors'], [])
+
+        updated = Student.query.filter_by(roll_no='100').first()
+        self.assertEqual(updated.name, 'New Name')
+        self.assertEqual(updated.department, 'CS')
+        self.assertEqual(updated.cgpa, 8.1)
+
+        fresh = Student.query.filter_by(roll_no='101').first()
+        self.assertEqual(fresh.backlogs, 2)
+        self.assertEqual(fresh.cgpa, 0.0)
+        self.assertTrue(fresh.check_password('101@password'))
+        self.assertFalse(fresh.is_password_changed)
+
+    def test_row_errors(self):
+        summary = self.run_import(
+            ",No Roll,x@e.com,1,IT,1,1,1,1,0,,\n"
+            "102,Bad Mail,not-an-email,1,IT,1,1,1,1,0,,\n"
+            "103,Taken,old@e.com,1,IT,1,1,1,1,0,,\n"
+            "104,Bad Sem,b@e.com,1,IT,abc,1,1,1,0,,\n"
+        )
+        self.assertEqual(summary['inserted'], 0)
+        self.assertEqual(len(summary['errors']), 4)
+        self.assertIn('Row 2: Roll number missing.', summary['errors'])
+        self.assertIn("already registered to Roll 100", summary['errors'][2])
+        self.assertIn("semester", summary['errors'][3])
+
+    def test_unusable_numbers_are_row_errors(self):
+        summary = self.run_import(
+            '300,Sem Text,a@e.com,1,IT,1,1,1,,"[{""subject"": ""Maths"", ""semester"": ""x""}]",,\n'
+            "301,Inf Sem,b@e.com,1,IT,inf,1,1,7,0,,\n"
+            "302,Inf Backlogs,c@e.com,1,IT,1,1,1,,inf,,\n"
+            "303,Huge Sem,d@e.com,1,IT,99999999999999999999,1,1,7,0,,\n"
+            "304,Inf Marks,e@e.com,1,IT,1,inf,1,7,0,,\n"
+            "305,Fine,f@e.com,1,IT,1,1,1,7,0,,\n"
+        )
+        self.assertEqual(summary['inserted'], 1)
+        self.assertEqual([e.split(':')[0] for e in summary['errors']],
+                         ['Row 2 (Roll 300)', 'Row 3 (Roll 301)', 'Row 4 (Roll 302)', 'Row 5 (Roll 303)',
+                          'Row 6 (Roll 304)'])
+        self.assertIn('for backlogs', summary['errors'][0])
+        self.assertIn('for semester', summary['errors'][3])
+        self.assertEqual(Student.query.filter_by(roll_no='305').count(), 1)
+
+    def test_rejected_rows_do_not_fail_their_batch(self):
+        importer = StudentImporter()
+        # Written by someone else after the importer loaded its lookups
+        db.session.add_all([Student(roll_no='310', name='Taken', email='t310@e.com', mobile='1', department='IT',
+                                    semester=1, password_hash='x'),
+                            Student(roll_no='311', name='Other', email='clash@e.com', mobile='1', department='IT',
+                                    semester=1, password_hash='x')])
+        db.session.commit()
+        importer.import_frame(read(
+            "310,Dup Roll,new310@e.com,1,IT,1,1,1,7,0,,\n"
+            "312,Fine,f312@e.com,1,IT,1,1,1,7,0,,\n"
+            '100,Old Name,clash@e.com,1,IT,3,1,1,,"[{""subject"": ""Maths"", ""semester"": 2}]",,\n'
+        ))
+        db.session.commit()
+        summary = importer.summary()
+        self.assertEqual((summary['inserted'], summary['updated']), (1, 0))
+        self.assertEqual(len(summary['errors']), 2)
+        self.assertIn('Row 2 (Roll 310): DB Error', summary['errors'][0])
+        self.assertIn('Row 4 (Roll 100): Update Error', summary['errors'][1])
+        self.assertEqual(Student.query.filter_by(roll_no='312').count(), 1)
+        # The rejected update left the student, and its backlogs, alone
+        student = Student.query.filter_by(roll_no='100').one()
+        self.assertEqual((student.email, student.cgpa), ('old@e.com', 7.0))
+        self.assertEqual(Backlog.query.filter_by(student_id=student.id).count(), 0)
+
+    def test_duplicates_within_file(self):
+        # Same roll twice: insert then update. Same email on a new roll: rejected.
+        summary = self.run_import(
+            "105,First,dup@e.com,1,IT,1,1,1,6,0,,\n"
+            "105,Second,dup@e.com,1,IT,2,1,1,6,0,,\n"
+            "106,Other,dup@e.com,1,IT,1,1,1,6,0,,\n"
+        )
+        self.assertEqual(summary['inserted'], 1)
+        self.assertEqual(summary['updated'], 1)
+        self.assertEqual(len(summary['errors']), 1)
+        self.assertEqual(Student.query.filter_by(roll_no='105').first().name, 'Second')
+
+    def test_backlog_details_replace_cgpa(self):
+        summary = self.run_import(
+            '100,Old Name,old@e.com,1,IT,3,1,1,,"[{""subject"": ""Maths"", ""semester"": 2}]",,\n'
+        )
+        self.assertEqual(summary['updated'], 1)
+        student = Student.query.filter_by(roll_no='100').first()
+        self.assertIsNone(student.cgpa)
+        self.assertEqual(student.backlogs, 1)
+        self.assertEqual(Backlog.query.filter_by(student_id=student.id).count(), 1)
+
+    def test_batches(self):
+        rows = "".join(f"2{i:03d},S{i},s{i}@e.com,1,IT,1,1,1,7,0,,\n" for i in range(25))
+        summary = self.run_import(rows, batch_size=10)
+        self.assertEqual(summary['inserted'], 25)
+        self.assertEqual(Student.query.count(), 26)
+
+    def test_reimport_skips_unchanged_rows(self):
+        rows = ("500,Same,same@e.com,1,IT,1,60,70,7.5,0,Python,\n"
+                "501,Other,other@e.com,1,CS,2,61,71,8,0,SQL,\n")
+        self.assertEqual(self.run_import(rows)['inserted'], 2)
+        stamp = Student.query.filter_by(roll_no='500').first().updated_at
+
+        # Formatting differences in numbers must not count as a change.
+        summary = self.run_import(rows.replace(',7.5,', ',7.50,'))
+        self.assertEqual((summary['inserted'], summary['updated'], summary['unchanged']), (0, 0, 2))
+        self.assertEqual(Student.query.filter_by(roll_no='500').first().updated_at, stamp)
+
+        summary = self.run_import(rows.replace('Other', 'Renamed'))
+        self.assertEqual((summary['updated'], summary['unchanged']), (1, 1))
+        self.assertEqual(Student.query.filter_by(roll_no='501').first().name, 'Renamed')
+
+        # Only the first row of a roll is compared: an identical repeat in the same file still updates
+        repeated = "502,Twice,twice@e.com,1,IT,1,60,70,7.5,0,,\n"
+        summary = self.run_import(repeated * 2)
+        self.assertEqual((summary['inserted'], summary['updated'], summary['unchanged']), (1, 1, 0))
+        summary = self.run_import(repeated * 2)
+        self.assertEqual((summary['updated'], summary['unchanged']), (1, 1))
+
+    def test_manual_edit_clears_fingerprint(self):
+        rows = "510,Edit Me,edit@e.com,1,IT,1,1,1,7,0,,\n"
+        self.run_import(rows)
+        student = Student.query.filter_by(roll_no='510').first()
+        self.assertIsNotNone(student.import_fingerprint)
+
+        student.department = 'CS'
+        db.session.commit()
+        self.assertIsNone(student.import_fingerprint)
+
+        # The file still says IT, so the next import has to write it back.
+        summary = self.run_import(rows)
+        self.assertEqual(summary['updated'], 1)
+        self.assertEqual(Student.query.filter_by(roll_no='510').first().department, 'IT')
+
+    def test_streaming_csv_in_chunks(self):
+        rows = "".join(f"3{i:03d},S{i},c{i}@e.com,1,IT,1,1,1,7,0,,\n" for i in range(25))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'students.csv')
+            with open(path, 'w') as f:
+                f.write(HEADER + rows + "3000,Again,c0@e.com,1,IT,2,1,1,7,0,,\n")
+            seen = []
+            importer = StudentImporter(batch_size=10)
+            summary = run_import(path, importer, chunk_size=10, on_progress=seen.append)
+
+        self.assertEqual(summary['inserted'], 25)
+        self.assertEqual(summary['updated'], 1)  # duplicate roll in a later chunk
+        self.assertEqual(summary['chunks'], 3)
+        self.assertEqual([p['rows'] for p in seen], [10, 20, 26])
+        self.assertEqual(Student.query.filter_by(roll_no='3000').first().semester, 2)
+
+    def test_streaming_xlsx(self):
+        df = read("401,X One,x1@e.com,1,IT,1,1,1,7,0,,\n,,,,,,,,,,,\n402,X Two,x2@e.com,1,CS,1,1,1,7,0,,\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'students.xlsx')
+            df.to_excel(path, index=False)
+            summary = run_import(path, StudentImporter(), chunk_size=2)
+
+        self.assertEqual(summary['inserted'], 2)
+        self.assertEqual(summary['errors'], [])
+        self.assertEqual(Student.query.filter_by(roll_no='402').first().department, 'CS')
+
+    def test_validate_only_reports_all_issues(self):
+        rows = (",No Roll,x@e.com,1,IT,1,1,1,7,0,,\n"          # 2: missing roll
+                "600,Bad Mail,bad@mail,1,IT,1,1,1,7,0,,\n"     # 3: malformed email
+                "601,Taken,old@e.com,1,IT,1,1,1,7,0,,\n"       # 4: registered to roll 100
+                "602,First,dup@e.com,1,IT,1,1,1,7,0,,\n"
+                "603,Second,dup@e.com,1,IT,1,1,1,7,0,,\n"      # 6: repeated in file
+                "604,Both,both@e.com,1,IT,1,1,1,7,2,,\n"       # 7: cgpa and backlogs
+                "605,Fine,fine@e.com,1,IT,1,1,1,7,0,,\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'students.csv')
+            with open(path, 'w') as f:
+                f.write(HEADER + rows)
+            summary, issues = validate_import(path, chunk_size=3)
+
+        self.assertEqual(summary, {'rows': 7, 'valid': 3, 'errors': 4, 'warnings': 1})
+        self.assertEqual(issues['Row'].tolist(), [2, 3, 4, 6, 7])
+        self.assertIn('Roll 100', issues.loc[2, 'Issue'])
+        self.assertIn('Roll 602', issues.loc[3, 'Issue'])
+        self.assertEqual(issues.loc[4, 'Severity'], 'Warning')
+        # Nothing was written
+        self.assertEqual(Student.query.count(), 1)
+
+    def test_validate_only_agrees_with_import(self):
+        rows = ('620,Sem Text,a@e.com,1,IT,1,1,1,,"[{""subject"": ""Maths"", ""semester"": ""x""}]",,\n'
+                '621,Huge Backlog Sem,b@e.com,1,IT,1,1,1,,"[{""subject"": ""Maths"", ""semester"": 1e400}]",,\n'
+                "622,Inf Sem,c@e.com,1,IT,inf,1,1,7,0,,\n"
+                "623,Inf Backlogs,d@e.com,1,IT,1,1,1,,inf,,\n"
+                "624,Huge Sem,e@e.com,1,IT,99999999999999999999,1,1,7,0,,\n"
+                "625,Inf Marks,f@e.com,1,IT,1,-inf,1,7,0,,\n"
+                '626,Details,g@e.com,1,IT,1,1,1,,"[{""subject"": ""Maths"", ""semester"": 2}]",,\n'
+                "627,Fine,h@e.com,1,IT,1,1,1,7,0,,\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'students.csv')
+            with open(path, 'w') as f:
+                f.write(HEADER + rows)
+            summary, issues = validate_import(path)
+            imported = run_import(path, StudentImporter(), chunk_size=500)
+
+        self.assertEqual(summary, {'rows': 8, 'valid': 2, 'errors': 6, 'warnings': 0})
+        self.assertEqual(imported['inserted'], summary['valid'])
+        self.assertEqual([int(e.split(' ')[1]) for e in imported['errors']], issues['Row'].tolist())
+        self.assertEqual([e.split(': ', 1)[1] for e in imported['errors']], issues['Issue'].tolist())
+
+    def test_validate_only_route(self):
+        admin = AdminUser(username='admin', email='admin@example.com')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+
+        client = self.app.test_client()
+        with client:
+            client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+            csv_content = HEADER + "0108,Dry Run,old@e.com,1,IT,5,80,80,7,0,,\n"
+            data = {'file': (io.BytesIO(csv_content.encode('utf-8')), 'test.csv'),
+                    'validate_only': 'Validate Only'}
+            response = client.post('/admin/import', data=data, content_type='multipart/form-data')
+            self.assertTrue(run_next_job())
+            status = client.get(response.location, headers={'Accept': 'application/json'}).get_json()
+            sheet = client.get(response.location + '/download')
+
+            self.assertEqual(status['type'], 'student_import_validate')
+            self.assertEqual(status['result']['errors'], 1)
+            self.assertTrue(status['has_artifact'])
+            issues = pd.read_excel(io.BytesIO(sheet.data))
+            self.assertEqual(issues['Row'].tolist(), [2])
+
+        job = BackgroundJob.query.one()
+        self.assertFalse(os.path.exists(json.loads(job.params)['path']))  # the worker removes the upload
+        os.remove(job.artifact_path)
+        self.assertIsNone(Student.query.filter_by(roll_no='0108').first())
+
+    def test_import_route(self):
+        admin = AdminUser(username='admin', email='admin@example.com')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+
+        client = self.app.test_client()
+        with client:
+            client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+            csv_content = HEADER + "0107,Route Student,route@e.com,9876543210,IT,5,80,80,0,3,Python,None\n"
+            data = {'file': (io.BytesIO(csv_content.encode('utf-8')), 'test.csv')}
+            response = client.post('/admin/import', data=data, content_type='multipart/form-data')
+            # The upload is queued as a background job and we land on its status page
+            self.assertEqual(response.status_code, 302)
+            self.assertIn('/admin/jobs/', response.location)
+            self.assertIsNone(Student.query.filter_by(roll_no='0107').first())
+
+            self.assertTrue(run_next_job())
+            status = client.get(response.location, headers={'Accept': 'application/json'}).get_json()
+
+        self.assertEqual(status['status'], 'Completed')
+        self.assertEqual(status['result']['inserted'], 1)
+        self.assertFalse(os.path.exists(json.loads(BackgroundJob.query.one().params)['path']))
+        s = Student.query.filter_by(roll_no='0107').first()
+        self.assertIsNotNone(s)
+        self.assertEqual(s.backlogs, 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from config import Config
+from models import Student, AdminUser, EmailOutbox, EmailLog
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_PROVIDER = 'fake'
+    MAIL_OVERRIDE_RECIPIENT = None
+
+class BulkStatusTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.mailbox = self.app.extensions['mail_transport'].fake
+
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.set_password('admin')
+        db.session.add(admin)
+        for roll, dept, status in [('1', 'IT', 'Pending'), ('2', 'IT', 'Pending'), ('3', 'CS', 'Pending'),
+                                   ('4', 'IT', 'Approved')]:
+            db.session.add(Student(roll_no=roll, name=f'S{roll}', email=f'{roll}@e.com', mobile='1',
+                                   department=dept, semester=5, password_hash='hash', status=status))
+        db.session.commit()
+        self.ids = {s.roll_no: s.id for s in Student.query}
+
+        self.client = self.app.test_client()
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def statuses(self):
+        return {s.roll_no: s.status for s in Student.query.order_by(Student.roll_no)}
+
+    def test_bulk_approve_selected_uses_one_update(self):
+        updates = []
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('UPDATE students'):
+                updates.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            response = self.client.post('/admin/students/bulk-status', json={
+                'status': 'Approved', 'student_ids': [self.ids['1'], self.ids['2'], self.ids['4']]})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        self.assertEqual(response.get_json(), {'status': 'Approved', 'requested': 3, 'updated': 2,
+                                               'skipped': 1, 'emails_queued': 2})
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.statuses(), {'1': 'Approved', '2': 'Approved', '3': 'Pending', '4': 'Approved'})
+        self.assertEqual(sorted(m['to'][0] for m in self.mailbox.messages), ['1@e.com', '2@e.com'])
+        self.assertEqual(EmailLog.query.filter_by(email_type='Approval', status='Success').count(), 2)
+
+    def test_bulk_reject_sends_no_email(self):
+        response = self.client.post('/admin/students/bulk-status', data={
+            'status': 'Rejected', 'student_ids': [str(self.ids['3'])]}, follow_redirects=True)
+        self.assertIn('1 student(s) marked Rejected', response.get_data(as_text=True))
+        self.assertEqual(self.statuses()['3'], 'Rejected')
+        self.assertEqual(EmailOutbox.query.count(), 0)
+
+    def test_approve_all_by_filter(self):
+        response = self.client.post('/admin/students/bulk-status', data={
+            'status': 'Approved', 'scope': 'all', 'department': 'it'}, follow_redirects=True)
+        self.assertIn('2 welcome email(s) queued', response.get_data(as_text=True))
+        self.assertEqual(self.statuses(), {'1': 'Approved', '2': 'Approved', '3': 'Pending', '4': 'Approved'})
+
+    def test_rejects_bad_requests(self):
+        response = self.client.post('/admin/students/bulk-status', json={'status': 'Deleted', 'scope': 'all'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/admin/students/bulk-status', json={'status': 'Approved'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.statuses()['1'], 'Pending')
+
+if __name__ == '__main__':
+    unittest.main()
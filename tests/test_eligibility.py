@@ -0,0 +1,191 @@
+import io
+import time
+import unittest
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from app import create_app, db
+from config import Config
+from models import Student, AdminUser, Company, PlacementDrive, JobApplication, DriveEligibility
+from utils.eligibility import (evaluate_drives, evaluate_student, eligible_students, eligible_counts,
+                               department_counts, snapshot_cache, StudentSnapshot)
+from utils.eligibility_matrix import rebuild_eligibility, drive_forecast
+from utils.student_import import StudentImporter
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_PROVIDER = 'fake'
+
+class EligibilityTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        company = Company(name='Acme')
+        db.session.add(company)
+        self.students = {}
+        for roll, dept, tenth, twelfth, cgpa, status in [
+                ('1', 'IT', 80, 80, 8.0, 'Approved'),
+                ('2', 'CS', 90, 90, 9.0, 'Approved'),
+                ('3', 'IT', 50, 80, 6.0, 'Approved'),
+                ('4', 'IT', None, None, None, 'Approved'),
+                ('5', 'IT', 95, 95, 9.5, 'Pending')]:
+            student = Student(roll_no=roll, name=f'S{roll}', email=f'{roll}@e.com', mobile='1', department=dept,
+                              semester=5, tenth_marks=tenth, twelfth_marks=twelfth, cgpa=cgpa, status=status,
+                              is_password_changed=True, is_email_verified=True)
+            student.set_password('pw')
+            db.session.add(student)
+            self.students[roll] = student
+        db.session.commit()
+
+        deadline = datetime.utcnow() + timedelta(days=5)
+        self.it_drive = PlacementDrive(company_id=company.id, job_title='IT Dev', criteria_10th=60,
+                                       criteria_12th=60, criteria_cgpa=7, allowed_branches='it, ', deadline=deadline)
+        self.open_drive = PlacementDrive(company_id=company.id, job_title='Anyone', deadline=deadline)
+        db.session.add_all([self.it_drive, self.open_drive])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def ids(self, *rolls):
+        return {self.students[r].id for r in rolls}
+
+    def test_drive_against_all_students(self):
+        result = evaluate_drives([self.it_drive, self.open_drive])
+        it = result[self.it_drive.id]
+        self.assertEqual(it['total'], 4)  # pending students are not considered
+        self.assertEqual(it['eligible'], self.ids('1'))
+        self.assertEqual(it['failures']['tenth'], self.ids('3', '4'))
+        self.assertEqual(it['failures']['cgpa'], self.ids('3', '4'))
+        self.assertEqual(it['failures']['branch'], self.ids('2'))
+        self.assertEqual(result[self.open_drive.id]['eligible'], self.ids('1', '2', '3', '4'))
+        self.assertEqual(eligible_counts([self.it_drive]), {self.it_drive.id: 1})
+
+    def test_matches_sql_predicate(self):
+        for drive in (self.it_drive, self.open_drive):
+            sql = {sid for (sid,) in eligible_students(drive, Student.id)}
+            self.assertEqual(evaluate_drives([drive])[drive.id]['eligible'], sql)
+
+    def test_student_against_all_drives(self):
+        result = evaluate_student(self.students['3'], [self.it_drive, self.open_drive])
+        self.assertEqual(result[self.it_drive.id], ['10th Marks < 60.0%', 'Diploma CGPA < 7.0'])
+        self.assertEqual(result[self.open_drive.id], [])
+        self.assertEqual(evaluate_student(self.students['2'], [self.it_drive])[self.it_drive.id],
+                         ["Department 'CS' not eligible."])
+
+    def test_drive_screens_use_engine(self):
+        client = self.app.test_client()
+        client.post('/student/login', data={'roll_no': '2', 'password': 'pw'})
+        page = client.get('/student/drives').get_data(as_text=True)
+        self.assertIn("Department &#39;CS&#39; not eligible.", page)
+
+        response = client.post(f'/student/drive/{self.it_drive.id}/apply', follow_redirects=True)
+        self.assertIn('Not Eligible', response.get_data(as_text=True))
+        self.assertEqual(JobApplication.query.count(), 0)
+        client.get('/logout')
+
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+        page = client.get(f'/admin/drive/{self.it_drive.id}/applicants').get_data(as_text=True)
+        self.assertIn('1 of 4 approved students eligible', page)
+        self.assertIn('Eligible students', client.get('/admin/drives').get_data(as_text=True))
+
+    def test_department_counts_follow_commits(self):
+        counts = department_counts(self.it_drive)
+        self.assertEqual((counts['total'], counts['eligible']), (4, 1))
+        self.assertEqual(counts['departments'], [{'department': 'CS', 'total': 1, 'eligible': 0},
+                                                 {'department': 'IT', 'total': 3, 'eligible': 1}])
+        snapshot = snapshot_cache().get()
+        self.it_drive.job_title = 'Renamed'  # not a student change: snapshot kept
+        db.session.commit()
+        self.assertIs(snapshot_cache().get(), snapshot)
+
+        self.students['3'].tenth_marks, self.students['3'].cgpa = 70, 7.5
+        db.session.commit()
+        self.assertEqual(department_counts(self.it_drive)['eligible'], 2)
+
+    def test_preview_endpoint(self):
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+        client = self.app.test_client()
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+        data = client.get('/admin/drive/eligibility-preview?criteria_cgpa=7&allowed_branches=IT,cs').get_json()
+        self.assertEqual((data['total'], data['eligible']), (4, 2))
+        self.assertEqual(PlacementDrive.query.count(), 2)  # nothing saved
+        self.assertIn('eligibility-preview', client.get('/admin/drive/new').get_data(as_text=True))
+
+    def test_snapshot_counts_are_fast(self):
+        rng = np.random.default_rng(0)
+        n = 20000
+        departments = rng.choice(np.array(['it', 'cs', 'mech', 'civil'], dtype=object), n)
+        snapshot = StudentSnapshot(np.arange(n), rng.uniform(0, 100, (n, 3)), departments)
+        started = time.perf_counter()
+        counts = snapshot.counts(np.array([60.0, 60.0, 50.0]), ['it', 'cs'])
+        self.assertLess(time.perf_counter() - started, 0.05)
+        self.assertEqual(counts[snapshot.codes.index('mech')], 0)
+        self.assertGreater(counts.sum(), 0)
+
+class EligibilityMatrixTestCase(EligibilityTestCase):
+    def matrix(self, drive=None):
+        drive = drive or self.it_drive
+        return {row.student_id: (row.eligible, row.reasons)
+                for row in DriveEligibility.query.filter_by(drive_id=drive.id)}
+
+    def test_built_incrementally_and_matches_engine(self):
+        self.assertEqual(DriveEligibility.query.count(), 8)  # 4 approved students x 2 open drives
+        self.assertEqual(self.matrix()[self.students['3'].id], (False, 'tenth,cgpa'))
+        self.assertEqual(drive_forecast(self.it_drive), evaluate_drives([self.it_drive])[self.it_drive.id])
+        rebuilt = self.matrix()
+        rebuild_eligibility(db.session)
+        db.session.commit()
+        self.assertEqual(self.matrix(), rebuilt)
+
+    def test_student_change_refreshes_only_that_student(self):
+        stamp = {row.student_id: row.updated_at for row in DriveEligibility.query.filter_by(drive_id=self.it_drive.id)}
+        student = self.students['3']
+        student.tenth_marks, student.cgpa = 70, 7.5
+        db.session.commit()
+        self.assertEqual(self.matrix()[student.id], (True, None))
+        after = {row.student_id: row.updated_at for row in DriveEligibility.query.filter_by(drive_id=self.it_drive.id)}
+        self.assertEqual([sid for sid in stamp if stamp[sid] != after[sid]], [student.id])
+
+        student.status = 'Rejected'
+        db.session.commit()
+        self.assertNotIn(student.id, self.matrix())
+
+    def test_drive_change_and_delete(self):
+        self.it_drive.allowed_branches = 'IT,CS'
+        db.session.commit()
+        self.assertEqual(self.matrix()[self.students['2'].id], (True, None))
+
+        db.session.delete(self.open_drive)
+        db.session.commit()
+        self.assertEqual(DriveEligibility.query.filter_by(drive_id=self.open_drive.id).count(), 0)
+
+    def test_bulk_paths_refresh(self):
+        from blueprints.admin import bulk_set_status
+        bulk_set_status('Approved', student_ids=[self.students['5'].id])
+        db.session.commit()
+        self.assertEqual(self.matrix()[self.students['5'].id], (True, None))
+
+        header = 'roll_no,name,email,mobile,department,semester,tenth_marks,twelfth_marks,cgpa,backlogs,skills,projects\n'
+        importer = StudentImporter()
+        importer.import_frame(pd.read_csv(io.StringIO(header + '3,S3,3@e.com,1,IT,5,75,80,7.2,0,,\n'), dtype=str))
+        db.session.commit()
+        self.assertEqual(self.matrix()[self.students['3'].id], (True, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+from datetime import date, timedelta
+from unittest.mock import patch, MagicMock
+from sqlalchemy import event
+from app import create_app, db
+from config import Config
+from models import Student, AdminUser, Company, EmailOutbox, EmailLog
+from utils.email_sender import send_batch
+from utils.outbox import enqueue_emails, deliver_pending
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_PROVIDER = 'fake'
+    MAIL_API_TOKEN = None
+    MAIL_OVERRIDE_RECIPIENT = None
+    MAIL_BATCH_SIZE = 3
+
+def messages(n):
+    return [{'subject': f'Hi {i}', 'recipients': [f's{i}@e.com'], 'body': f'Dear S{i}'} for i in range(n)]
+
+def ok_response():
+    response = MagicMock()
+    response.status_code = 200
+    response.text = '{}'
+    return response
+
+class ProviderBatchTestCase(unittest.TestCase):
+    def make_app(self, **config):
+        cfg = type('Cfg', (TestConfig,), dict(MAIL_PROVIDER=None, **config))
+        app = create_app(cfg)
+        ctx = app.app_context()
+        ctx.push()
+        self.addCleanup(ctx.pop)
+        return app
+
+    @patch('utils.email_sender.requests.Session.post')
+    def test_resend_uses_batch_endpoint(self, mock_post):
+        mock_post.return_value = ok_response()
+        self.make_app(MAIL_API_TOKEN='re_test', MAIL_API_URL='https://api.resend.com/emails')
+
+        results = send_batch(messages(5))
+        self.assertEqual(results, [(True, 'Email sent successfully.')] * 5)
+        self.assertEqual(mock_post.call_count, 2)  # 3 + 2 with MAIL_BATCH_SIZE = 3
+        args, kwargs = mock_post.call_args_list[0]
+        self.assertEqual(args[0], 'https://api.resend.com/emails/batch')
+        self.assertEqual([m['to'] for m in kwargs['json']], [['s0@e.com'], ['s1@e.com'], ['s2@e.com']])
+
+    @patch('utils.email_sender.requests.Session.post')
+    def test_brevo_uses_message_versions(self, mock_post):
+        mock_post.return_value = ok_response()
+        self.make_app(MAIL_API_TOKEN='xkeysib-test', MAIL_BATCH_SIZE=100)
+
+        send_batch(messages(4))
+        mock_post.assert_called_once()
+        payload = mock_post.call_args.kwargs['json']
+        self.assertNotIn('to', payload)
+        self.assertEqual(len(payload['messageVersions']), 4)
+        self.assertEqual(payload['messageVersions'][2]['to'], [{'email': 's2@e.com'}])
+        self.assertEqual(payload['messageVersions'][2]['textContent'], 'Dear S2')
+
+    @patch('utils.email_sender.requests.Session.post')
+    def test_failed_batch_fails_every_message(self, mock_post):
+        response = ok_response()
+        response.status_code = 422
+        mock_post.return_value = response
+        self.make_app(MAIL_API_TOKEN='re_test', MAIL_API_URL='https://api.resend.com/emails')
+
+        results = send_batch(messages(2))
+        self.assertEqual([ok for ok, _ in results], [False, False])
+        self.assertIn('422', results[0][1])
+
+    def test_smtp_batch_shares_one_connection(self):
+        self.make_app(MAIL_SUPPRESS_SEND=True, MAIL_DEFAULT_SENDER='tpo@e.com')
+        from extensions import mail
+        with patch.object(mail, 'connect', wraps=mail.connect) as connect, mail.record_messages() as sent:
+            results = send_batch(messages(4))
+        self.assertTrue(all(ok for ok, _ in results))
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual([m.recipients for m in sent], [['s0@e.com'], ['s1@e.com'], ['s2@e.com'], ['s3@e.com']])
+
+class BatchDeliveryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.mailbox = self.app.extensions['mail_transport'].fake
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_one_email_log_insert_per_batch(self):
+        enqueue_emails(messages(7))
+        db.session.commit()
+
+        log_inserts = []
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('INSERT INTO email_logs'):
+                log_inserts.append(executemany)
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            self.assertEqual(deliver_pending(), 7)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        self.assertEqual(len(log_inserts), 3)  # batches of 3, 3 and 1
+        self.assertEqual(EmailLog.query.filter_by(status='Success').count(), 7)
+        self.assertEqual(EmailOutbox.query.filter_by(status='Sent').count(), 7)
+        self.assertEqual(len(self.mailbox.messages), 7)
+
+    def test_partial_failure_in_batch(self):
+        enqueue_emails(messages(3))
+        db.session.commit()
+        self.mailbox.fail(times=1)
+        deliver_pending(limit=3)
+        statuses = [m.status for m in EmailOutbox.query.order_by(EmailOutbox.id)]
+        self.assertEqual(statuses, ['Pending', 'Sent', 'Sent'])
+
+    def test_new_drive_notifies_eligible_students(self):
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.set_password('admin')
+        company = Company(name='Acme', email='hr@acme.com')
+        db.session.add_all([admin, company])
+        for roll, dept, cgpa, status in [('1', 'IT', 8.0, 'Approved'), ('2', 'CS', 9.0, 'Approved'),
+                                         ('3', 'IT', 5.0, 'Approved'), ('4', 'IT', 9.0, 'Pending')]:
+            db.session.add(Student(roll_no=roll, name=f'S{roll}', email=f'{roll}@e.com', mobile='1', department=dept,
+                                   semester=5, tenth_marks=80, twelfth_marks=80, cgpa=cgpa,
+                                   password_hash='hash', status=status))
+        db.session.commit()
+
+        client = self.app.test_client()
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+        response = client.post('/admin/drive/new', data={
+            'company_id': company.id, 'job_title': 'Developer', 'job_description': 'Code',
+            'criteria_10th': 60, 'criteria_12th': 60, 'criteria_cgpa': 7, 'allowed_branches': 'it',
+            'salary': '5 LPA', 'deadline': (date.today() + timedelta(days=7)).isoformat(),
+            'drive_date': (date.today() + timedelta(days=10)).isoformat(), 'venue': 'Hall', 'mode': 'Offline',
+        }, follow_redirects=True)
+
+        self.assertIn('Notifying 1 eligible students', response.get_data(as_text=True))
+        self.assertEqual([m['to'] for m in self.mailbox.messages], [['1@e.com']])
+        self.assertIn('Developer at Acme', self.mailbox.messages[0]['subject'])
+        self.assertEqual(EmailLog.query.one().email_type, 'DriveNotification')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -21,7 +21,7 @@ class EmailOverrideTestCase(unittest.TestCase):
     def tearDown(self):
         self.app_context.pop()
         
-    @patch('utils.email_sender.requests.post')
+    @patch('utils.email_sender.requests.Session.post')
     def test_send_email_uses_override(self, mock_post):
         # Mock API response
         mock_response = MagicMock()
@@ -0,0 +1,98 @@
+import unittest
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from app import create_app
+from config import Config
+from utils.email_sender import detect_provider, send_email, RESEND_URL, BREVO_URL
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    MAIL_API_TOKEN = 'test-token'
+    MAIL_OVERRIDE_RECIPIENT = None
+    MAIL_API_RETRY_BACKOFF = 0
+
+class FlakyProvider(BaseHTTPRequestHandler):
+    """Fails the first `failures` requests with `status`, then accepts."""
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    failures = 0
+    status = 429
+    requests = []
+    connections = set()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        FlakyProvider.requests.append(json.loads(body))
+        FlakyProvider.connections.add(self.client_address)
+        status = FlakyProvider.status if len(FlakyProvider.requests) <= FlakyProvider.failures else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+class EmailTransportTestCase(unittest.TestCase):
+    def setUp(self):
+        FlakyProvider.failures = 0
+        FlakyProvider.status = 429
+        FlakyProvider.requests = []
+        FlakyProvider.connections = set()
+        self.server = HTTPServer(('127.0.0.1', 0), FlakyProvider)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        TestConfig.MAIL_API_URL = f'http://127.0.0.1:{self.server.server_port}/send'
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.transport = self.app.extensions['mail_transport']
+
+    def tearDown(self):
+        self.transport.close()
+        self.app_context.pop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_provider_detection(self):
+        self.assertEqual(detect_provider('re_abc', 'https://send.api.mailtrap.io/api/send'), ('resend', RESEND_URL))
+        self.assertEqual(detect_provider('xkeysib-abc', ''), ('brevo', BREVO_URL))
+        self.assertEqual(detect_provider('tok', 'https://api.brevo.com/v3/smtp/email')[0], 'brevo')
+        self.assertEqual(detect_provider('tok', 'https://mock.api.com/send'), ('other', 'https://mock.api.com/send'))
+
+    def test_provider_resolved_at_startup(self):
+        self.assertEqual(self.transport.provider, 'other')
+        self.assertEqual(self.transport.api_url, TestConfig.MAIL_API_URL)
+
+    def test_connections_are_reused(self):
+        for i in range(3):
+            success, _ = send_email(f'Hello {i}', ['a@e.com'], 'Body')
+            self.assertTrue(success)
+        self.assertEqual(len(FlakyProvider.requests), 3)
+        self.assertEqual(len(FlakyProvider.connections), 1)
+
+    def test_retries_rate_limits(self):
+        FlakyProvider.failures = 2
+        success, _ = send_email('Retry', ['a@e.com'], 'Body')
+        self.assertTrue(success)
+        self.assertEqual(len(FlakyProvider.requests), 3)
+
+    def test_gives_up_after_retries(self):
+        FlakyProvider.failures = 10
+        success, msg = send_email('Down', ['a@e.com'], 'Body')
+        self.assertFalse(success)
+        self.assertIn('429', msg)
+        self.assertEqual(len(FlakyProvider.requests), 1 + TestConfig.MAIL_API_RETRIES)
+
+    def test_server_errors_not_resent(self):
+        # The provider may have sent it before failing; the outbox decides on retries
+        FlakyProvider.status = 503
+        FlakyProvider.failures = 1
+        success, msg = send_email('Maybe sent', ['a@e.com'], 'Body')
+        self.assertFalse(success)
+        self.assertIn('503', msg)
+        self.assertEqual(len(FlakyProvider.requests), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -54,7 +54,7 @@ class FullEmailSuiteTestCase(unittest.TestCase):
         db.drop_all()
         self.app_context.pop()
 
-    @patch('utils.email_sender.requests.post')
+    @patch('utils.email_sender.requests.Session.post')
     def test_full_email_features(self, mock_post):
         mock_resp = MagicMock()
         mock_resp.status_code = 200
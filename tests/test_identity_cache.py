@@ -0,0 +1,110 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from config import Config
+from models import Student, AdminUser, Company, PlacementDrive, Quiz, QuizAttempt
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_PROVIDER = 'fake'
+    IDENTITY_CACHE_TTL = 60
+
+class IdentityCacheTestCase(unittest.TestCase):
+    # Requests must not run inside a test-held app context: it would share
+    # the session's identity map (and g) between requests and hide queries.
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.set_password('admin')
+        student = Student(roll_no='S1', name='Cached Student', email='s1@e.com', mobile='1', department='IT',
+                          semester=5, status='Approved', is_password_changed=True, is_email_verified=True)
+        student.set_password('password')
+        company = Company(name='Acme')
+        db.session.add_all([admin, student, company])
+        db.session.commit()
+        self.drive = PlacementDrive(company_id=company.id, job_title='Developer',
+                                    deadline=datetime.utcnow() + timedelta(days=10))
+        db.session.add(self.drive)
+        db.session.commit()
+        self.quiz = Quiz(title='Aptitude', drive_id=self.drive.id, is_live=True)
+        db.session.add(self.quiz)
+        db.session.commit()
+        self.student_id = student.id
+        self.drive_id, self.quiz_id = self.drive.id, self.quiz.id
+        db.session.remove()
+        self.app_context.pop()
+
+        self.client = self.app.test_client()
+        self.client.post('/student/login', data={'roll_no': 'S1', 'password': 'password'})
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def get_counting(self, url, *tables):
+        selects = []
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('SELECT') and any(f'FROM {t}' in statement for t in tables):
+                selects.append(statement)
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            response = self.client.get(url)
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+        return response, selects
+
+    def test_repeat_requests_skip_identity_queries(self):
+        self.client.get('/student/drives')
+        response, selects = self.get_counting('/student/drives', 'students', 'job_applications')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(selects, [])
+
+    def test_apply_invalidates_applied_drives(self):
+        self.client.get('/student/quizzes')
+        self.client.post(f'/student/drive/{self.drive_id}/apply')
+        response = self.client.get('/student/quizzes')
+        self.assertIn('Aptitude', response.get_data(as_text=True))
+
+        with self.app.app_context():
+            db.session.add(QuizAttempt(student_id=self.student_id, quiz_id=self.quiz_id, score=1, total_marks=1))
+            db.session.commit()
+        response = self.client.get(f'/student/quiz/{self.quiz_id}/start', follow_redirects=True)
+        self.assertIn('already taken', response.get_data(as_text=True))
+
+    def test_status_change_is_seen_immediately(self):
+        self.client.get('/student/drives')
+        with self.app.app_context():
+            db.session.get(Student, self.student_id).status = 'Rejected'
+            db.session.commit()
+
+        response = self.client.get('/student/drives', follow_redirects=True)
+        self.assertIn('pending approval', response.get_data(as_text=True))
+
+    def test_bulk_update_clears_cache(self):
+        self.client.get('/student/drives')
+        self.assertEqual(len(self.app.extensions['identity_cache'].entries), 1)
+        with self.app.app_context():
+            db.session.execute(db.update(Student).values(status='Pending'))
+            db.session.commit()
+        self.assertEqual(len(self.app.extensions['identity_cache'].entries), 0)
+
+    def test_disabled_cache_still_works(self):
+        self.app.extensions['identity_cache'].ttl = 0
+        self.client.get('/student/drives')
+        response, selects = self.get_counting('/student/drives', 'students')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(selects), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -40,7 +40,7 @@ class EmailInvitationTestCase(unittest.TestCase):
         db.drop_all()
         self.app_context.pop()
         
-    @patch('blueprints.admin.send_email')
+    @patch('utils.outbox.send_email')
     def test_invite_company_calls_send_email(self, mock_send_email):
         # Setup mock to return (True, Msg) tuple - IMPORTANT!
         mock_send_email.return_value = (True, "Success")
@@ -0,0 +1,142 @@
+import unittest
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from app import create_app, db
+from config import Config
+from models import AdminUser, Company, BackgroundJob
+from utils.jobs import enqueue_job, job_handler, run_next_job
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    JOB_WORKER_THREADS = 0
+    JOB_HEARTBEAT_INTERVAL = 0.05
+
+@job_handler('test_echo')
+def echo_job(job):
+    job.set_progress(50)
+    return {'echo': job.params['value']}
+
+@job_handler('test_boom')
+def boom_job(job):
+    raise RuntimeError('boom')
+
+@job_handler('test_slow')
+def slow_job(job):
+    # Never reports progress; the worker's heartbeat keeps it alive
+    time.sleep(0.3)
+    return {'path_exists': os.path.exists(job.params['path'])}
+
+class JobsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        admin = AdminUser(username='tpo', email='tpo@example.com')
+        admin.set_password('admin123')
+        db.session.add(admin)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self, client):
+        client.post('/admin/login', data={'username': 'tpo', 'password': 'admin123'})
+
+    def test_queue_runs_in_order(self):
+        first = enqueue_job('test_echo', {'value': 1})
+        second = enqueue_job('test_echo', {'value': 2})
+        self.assertEqual(first.status, 'Queued')
+
+        self.assertTrue(run_next_job())
+        db.session.expire_all()
+        self.assertEqual(db.session.get(BackgroundJob, first.id).status, 'Completed')
+        self.assertEqual(db.session.get(BackgroundJob, second.id).status, 'Queued')
+
+        self.assertTrue(run_next_job())
+        self.assertFalse(run_next_job())
+        job = db.session.get(BackgroundJob, second.id)
+        self.assertEqual(job.progress, 100.0)
+        self.assertEqual(job.to_dict()['result'], {'echo': 2})
+
+    def test_failed_job_records_error(self):
+        job = enqueue_job('test_boom')
+        run_next_job()
+        db.session.expire_all()
+        job = db.session.get(BackgroundJob, job.id)
+        self.assertEqual(job.status, 'Failed')
+        self.assertEqual(job.error_message, 'boom')
+
+    def test_heartbeat_and_upload_cleanup(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        job = enqueue_job('test_slow', {'path': path})
+        run_next_job()
+        db.session.expire_all()
+        job = db.session.get(BackgroundJob, job.id)
+        self.assertEqual(job.to_dict()['result'], {'path_exists': True})
+        self.assertGreater(job.heartbeat_at, job.started_at)
+        self.assertFalse(os.path.exists(path))
+
+    def test_stale_jobs_and_old_artifacts_removed(self):
+        upload_fd, upload = tempfile.mkstemp()
+        artifact_fd, artifact = tempfile.mkstemp()
+        os.close(upload_fd)
+        os.close(artifact_fd)
+        long_ago = datetime.utcnow() - timedelta(days=30)
+        stale = BackgroundJob(job_type='test_slow', status='Running', params=f'{{"path": "{upload}"}}',
+                              started_at=long_ago, heartbeat_at=long_ago)
+        done = BackgroundJob(job_type='report', status='Completed', finished_at=long_ago, artifact_path=artifact)
+        db.session.add_all([stale, done])
+        db.session.commit()
+
+        self.assertFalse(run_next_job())
+        db.session.expire_all()
+        self.assertEqual(db.session.get(BackgroundJob, stale.id).status, 'Failed')
+        self.assertIsNone(db.session.get(BackgroundJob, done.id).artifact_path)
+        self.assertFalse(os.path.exists(upload))
+        self.assertFalse(os.path.exists(artifact))
+
+    def test_status_endpoint_json(self):
+        job = enqueue_job('test_echo', {'value': 'x'})
+        client = self.app.test_client()
+        with client:
+            self.login(client)
+            data = client.get(f'/admin/jobs/{job.id}?format=json').get_json()
+            self.assertEqual(data['status'], 'Queued')
+            run_next_job()
+            data = client.get(f'/admin/jobs/{job.id}', headers={'Accept': 'application/json'}).get_json()
+            self.assertEqual(data['status'], 'Completed')
+            html = client.get(f'/admin/jobs/{job.id}')
+            self.assertIn(b'Background Job', html.data)
+
+    def test_pdf_report_is_queued(self):
+        db.session.add(Company(name='PyCorp', email='hr@pycorp.com', location='Pune'))
+        db.session.commit()
+        client = self.app.test_client()
+        with client:
+            self.login(client)
+            resp = client.get('/admin/reports/companies/pdf')
+            self.assertEqual(resp.status_code, 302)
+            job = BackgroundJob.query.one()
+            self.assertEqual(job.job_type, 'report')
+
+            run_next_job()
+            db.session.expire_all()
+            job = db.session.get(BackgroundJob, job.id)
+            self.assertEqual(job.status, 'Completed')
+            download = client.get(f'/admin/jobs/{job.id}/download')
+            self.assertEqual(download.mimetype, 'application/pdf')
+            self.assertTrue(download.data.startswith(b'%PDF'))
+            download.close()
+        os.remove(job.artifact_path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from config import Config
+from models import Student, AdminUser, LoginAttempt
+from utils.login_throttle import get_throttle, MemoryFailureStore
+from utils.password_hashing import hashing_stats
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    LOGIN_THROTTLE_BACKEND = 'memory'
+    LOGIN_THROTTLE_MAX_PER_ACCOUNT = 3
+    LOGIN_THROTTLE_MAX_PER_ADDRESS = 10
+
+class LoginThrottleTestCase(unittest.TestCase):
+    config = TestConfig
+
+    def setUp(self):
+        self.app = create_app(self.config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.set_password('admin')
+        student = Student(roll_no='101', name='S', email='s@e.com', mobile='1', department='IT', semester=5,
+                          status='Approved', is_password_changed=True, is_email_verified=True)
+        student.set_password('right')
+        db.session.add_all([admin, student])
+        db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self, password, roll_no='101'):
+        return self.client.post('/student/login', data={'roll_no': roll_no, 'password': password})
+
+    def verifications(self):
+        return sum(v['count'] for v in hashing_stats()['verifications'].values())
+
+    def test_blocks_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self.login('wrong').status_code, 200)
+        hashed = self.verifications()
+
+        response = self.login('right')  # even the right password is refused now
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Too many failed login attempts', response.get_data(as_text=True))
+        self.assertEqual(self.verifications(), hashed)
+
+        stats = get_throttle().stats()
+        self.assertEqual((stats['checked'], stats['blocked'], stats['failures_recorded']), (4, 1, 3))
+
+    def test_success_resets_account_but_not_address(self):
+        self.login('wrong')
+        self.login('wrong')
+        self.assertEqual(self.login('right').status_code, 302)
+        self.client.get('/logout')
+        self.login('wrong')
+        self.login('wrong')
+        self.assertNotEqual(self.login('wrong').status_code, 429)
+
+        # Walking other roll numbers from one address hits the address limit
+        for roll_no in range(200, 210):
+            self.login('x', roll_no=str(roll_no))
+        self.assertEqual(self.login('x', roll_no='300').status_code, 429)
+
+    def test_admin_login_is_throttled(self):
+        for _ in range(3):
+            self.client.post('/admin/login', data={'username': 'admin', 'password': 'nope'})
+        response = self.client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+        self.assertEqual(response.status_code, 429)
+
+    def test_memory_store_sweeps_and_caps_keys(self):
+        store = MemoryFailureStore(max_keys=50)
+        store.add(['old'], window=300)
+        store.failures['old'][0] -= 600  # failed long ago, never seen again
+        for i in range(100):
+            store.add([f'S:random{i}'], window=300)
+        self.assertEqual(len(store.failures), 50)
+        self.assertNotIn('old', store.failures)
+        self.assertIn('S:random99', store.failures)  # the least recently failed go first
+
+class SharedAddressConfig(TestConfig):
+    LOGIN_THROTTLE_MAX_PER_ADDRESS = Config.LOGIN_THROTTLE_MAX_PER_ADDRESS
+
+class SharedAddressTestCase(unittest.TestCase):
+    """Behind a proxy without TRUSTED_PROXY_COUNT every client has the proxy's address."""
+    config = SharedAddressConfig
+    setUp = LoginThrottleTestCase.setUp
+    tearDown = LoginThrottleTestCase.tearDown
+
+    def login(self, password, roll_no='101', address='10.0.0.1'):
+        return self.client.post('/student/login', data={'roll_no': roll_no, 'password': password},
+                                environ_base={'REMOTE_ADDR': address})
+
+    def test_typos_from_many_users_do_not_lock_everyone_out(self):
+        for roll_no in range(200, 300):
+            self.assertNotEqual(self.login('typo', roll_no=str(roll_no)).status_code, 429)
+        self.assertEqual(self.login('right').status_code, 302)
+        self.assertFalse(any(key.startswith('ip:') for key in get_throttle().store.failures))
+
+class ProxyConfig(TestConfig):
+    TRUSTED_PROXY_COUNT = 1
+
+class ProxyAddressTestCase(unittest.TestCase):
+    config = ProxyConfig
+    setUp = LoginThrottleTestCase.setUp
+    tearDown = LoginThrottleTestCase.tearDown
+
+    def login(self, password, roll_no='101', address='10.0.0.1', client='203.0.113.1'):
+        return self.client.post('/student/login', data={'roll_no': roll_no, 'password': password},
+                                environ_base={'REMOTE_ADDR': address}, headers={'X-Forwarded-For': client})
+
+    def test_limit_applies_per_forwarded_client(self):
+        for roll_no in range(200, 210):
+            self.login('x', roll_no=str(roll_no), client='203.0.113.9')
+        self.assertEqual(self.login('x', roll_no='300', client='203.0.113.9').status_code, 429)
+        self.assertEqual(self.login('right').status_code, 302)  # same proxy, another client
+
+class DatabaseConfig(TestConfig):
+    LOGIN_THROTTLE_BACKEND = 'database'
+
+class DatabaseLoginThrottleTestCase(LoginThrottleTestCase):
+    config = DatabaseConfig
+
+    def test_failures_are_shared_rows(self):
+        self.login('wrong')
+        self.assertEqual({a.key for a in LoginAttempt.query}, {'S:101', 'ip:127.0.0.1'})
+        self.assertEqual(self.login('right').status_code, 302)
+        self.assertEqual([a.key for a in LoginAttempt.query], ['ip:127.0.0.1'])
+
+    def test_expired_rows_of_any_key_are_deleted(self):
+        old = datetime.utcnow() - timedelta(seconds=TestConfig.LOGIN_THROTTLE_WINDOW + 10)
+        db.session.add_all([LoginAttempt(key=f'S:random{i}', created_at=old) for i in range(20)])
+        db.session.commit()
+        get_throttle().store.next_sweep = time.monotonic()
+        self.login('wrong')
+        self.assertEqual({a.key for a in LoginAttempt.query}, {'S:101', 'ip:127.0.0.1'})
+
+if __name__ == '__main__':
+    unittest.main()
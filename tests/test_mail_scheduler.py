@@ -0,0 +1,123 @@
+import unittest
+from app import create_app, db
+from config import Config
+from models import AdminUser, EmailOutbox, EmailLog
+from utils.email_sender import RATE_LIMITED_ERROR
+from utils.mail_scheduler import TokenBucket, MailScheduler, get_scheduler
+from utils.outbox import enqueue_emails, deliver_pending
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_PROVIDER = 'fake'
+    MAIL_OVERRIDE_RECIPIENT = None
+    MAIL_RATE_LIMITS = {'fake': {'per_second': 2, 'burst': 2}}
+    MAIL_RATE_PER_SECOND = None
+    MAIL_DAILY_QUOTA = None
+
+def messages(n):
+    return [{'subject': f'Hi {i}', 'recipients': [f's{i}@e.com'], 'body': 'Body'} for i in range(n)]
+
+class TokenBucketTestCase(unittest.TestCase):
+    def test_refill_and_pause(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=4, clock=clock)
+        self.assertEqual(bucket.take(10), 4)
+        self.assertEqual(bucket.take(1), 0)
+        self.assertAlmostEqual(bucket.wait_time(1), 0.5)
+
+        clock.now += 1
+        self.assertEqual(bucket.take(10), 2)
+
+        bucket.pause(5)
+        clock.now += 3
+        self.assertEqual(bucket.take(1), 0)
+        clock.now += 3  # 1s past the pause
+        self.assertEqual(bucket.take(10), 2)
+
+    def test_batch_provider_counts_requests_not_messages(self):
+        scheduler = MailScheduler('resend', {'per_second': 2, 'burst': 2}, messages_per_request=100,
+                                  clock=FakeClock())
+        self.assertEqual(scheduler.admit(150), 150)  # two requests
+        self.assertEqual(scheduler.admit(1), 0)
+        self.assertTrue(scheduler.throttled)
+
+    def test_daily_quota(self):
+        scheduler = MailScheduler('brevo', {'per_day': 10})
+        self.assertEqual(scheduler.admit(4, load_sent_today=lambda: 7), 3)
+        scheduler.record_sent(3)
+        self.assertEqual(scheduler.admit(1), 0)
+        self.assertIsNone(scheduler.wait_time())
+        self.assertEqual([e['reason'] for e in scheduler.throttle_events], ['daily quota'])
+        self.assertEqual(scheduler.deferred_total, 2)
+
+class ScheduledDeliveryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.mailbox = self.app.extensions['mail_transport'].fake
+        self.clock = FakeClock()
+        self.scheduler = get_scheduler()
+        self.scheduler.bucket.clock = self.clock
+        self.scheduler.bucket.updated = self.clock()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_excess_is_queued_not_dropped(self):
+        enqueue_emails(messages(5))
+        db.session.commit()
+
+        self.assertEqual(deliver_pending(), 2)
+        self.assertEqual(EmailOutbox.query.filter_by(status='Pending').count(), 3)
+        self.assertEqual(self.scheduler.throttle_count, 1)
+
+        self.clock.now += 1
+        self.assertEqual(deliver_pending(), 2)
+        self.clock.now += 1
+        self.assertEqual(deliver_pending(), 1)
+        self.assertEqual(len(self.mailbox.messages), 5)
+        self.assertEqual(EmailLog.query.filter_by(status='Failed').count(), 0)
+
+    def test_provider_429_pauses_without_using_attempts(self):
+        self.mailbox.fail(error=RATE_LIMITED_ERROR + ' Status: 429')
+        enqueue_emails(messages(1))
+        db.session.commit()
+
+        deliver_pending()
+        message = EmailOutbox.query.one()
+        self.assertEqual((message.status, message.attempts), ('Pending', 0))
+        self.assertEqual(self.scheduler.bucket.take(1), 0)  # paused
+        self.assertIn('429', self.scheduler.throttle_events[-1]['reason'])
+
+    def test_queue_status_endpoint(self):
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.set_password('admin')
+        db.session.add(admin)
+        enqueue_emails(messages(3))
+        db.session.commit()
+        deliver_pending()
+
+        client = self.app.test_client()
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+        data = client.get('/admin/email/queue').get_json()
+        self.assertEqual(data['queue']['pending'], 1)
+        self.assertEqual(data['queue']['sent'], 2)
+        self.assertEqual(data['scheduler']['per_second'], 2)
+        self.assertEqual(data['scheduler']['throttle_count'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
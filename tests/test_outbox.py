@@ -0,0 +1,133 @@
+import unittest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+from app import create_app, db
+from config import Config
+from models import Student, AdminUser, EmailOutbox, EmailLog
+from utils.outbox import enqueue_email, deliver_pending, retry_dead
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_PROVIDER = 'fake'
+    MAIL_OVERRIDE_RECIPIENT = None
+    MAIL_OUTBOX_MAX_ATTEMPTS = 3
+    MAIL_OUTBOX_RETRY_BACKOFF = 0
+
+class OutboxTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.mailbox = self.app.extensions['mail_transport'].fake
+
+        self.student = Student(roll_no='900', name='Outbox Student', email='outbox@e.com', mobile='1',
+                               department='IT', semester=1, password_hash='hash', status='Pending')
+        db.session.add(self.student)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_rolled_back_email_is_never_sent(self):
+        enqueue_email('Hello', ['a@e.com'], 'Body', email_type='Test')
+        db.session.rollback()
+        self.assertEqual(deliver_pending(), 0)
+        self.assertEqual(self.mailbox.messages, [])
+
+    def test_delivery_updates_email_log(self):
+        enqueue_email('Hello', ['a@e.com'], 'Body', email_type='Test', student_id=self.student.id)
+        db.session.commit()
+        self.assertEqual(deliver_pending(), 1)
+
+        self.assertEqual(self.mailbox.messages[0]['to'], ['a@e.com'])
+        message = EmailOutbox.query.one()
+        self.assertEqual((message.status, message.attempts), ('Sent', 1))
+        log = EmailLog.query.one()
+        self.assertEqual((log.student_id, log.email_type, log.status), (self.student.id, 'Test', 'Success'))
+
+    def test_retry_then_dead_letter(self):
+        self.mailbox.fail(times=5, error='Provider down')
+        enqueue_email('Hello', ['a@e.com'], 'Body', email_type='Test')
+        db.session.commit()
+
+        # Backoff is 0 here, so each pass picks the retry up straight away
+        deliver_pending(limit=1)
+        message = EmailOutbox.query.one()
+        self.assertEqual((message.status, message.attempts, message.last_error), ('Pending', 1, 'Provider down'))
+        self.assertEqual(EmailLog.query.count(), 0)
+
+        deliver_pending()
+        db.session.refresh(message)
+        self.assertEqual((message.status, message.attempts), ('Dead', 3))
+        log = EmailLog.query.one()
+        self.assertEqual(log.status, 'Failed')
+        self.assertIn('Provider down', log.error_message)
+
+        # Dead letters can be re-queued once the provider is back
+        self.mailbox.failures.clear()
+        self.assertEqual(retry_dead(), 1)
+        deliver_pending()
+        db.session.refresh(message)
+        self.assertEqual(message.status, 'Sent')
+
+    def test_backoff_delays_retry(self):
+        self.app.config['MAIL_OUTBOX_RETRY_BACKOFF'] = 60
+        self.mailbox.fail()
+        enqueue_email('Hello', ['a@e.com'], 'Body')
+        db.session.commit()
+        self.assertEqual(deliver_pending(), 1)
+        self.assertEqual(deliver_pending(), 0)  # not due yet
+        message = EmailOutbox.query.one()
+        self.assertGreater(message.next_attempt_at, datetime.utcnow() + timedelta(seconds=50))
+
+    def test_first_request_starts_delivery(self):
+        # Messages left Pending by a restart must not wait for the next enqueue
+        with patch('utils.outbox.start_delivery_workers') as start:
+            self.app.test_client().get('/student/login')
+        start.assert_called_with(self.app)
+
+    def test_stale_sending_message_is_requeued(self):
+        enqueue_email('Hello', ['a@e.com'], 'Body')
+        db.session.commit()
+        message = EmailOutbox.query.one()
+        message.status = 'Sending'
+        message.locked_at = datetime.utcnow() - timedelta(hours=1)
+        db.session.commit()
+
+        self.assertEqual(deliver_pending(), 1)
+        self.assertEqual(len(self.mailbox.messages), 1)
+
+    def test_approval_sends_welcome_email_through_outbox(self):
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+
+        client = self.app.test_client()
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+        client.post(f'/admin/student/{self.student.id}/status', data={'status': 'Approved'})
+
+        self.assertEqual(EmailOutbox.query.one().status, 'Sent')
+        self.assertIn('Welcome', self.mailbox.messages[0]['subject'])
+        self.assertEqual(EmailLog.query.one().email_type, 'Approval')
+
+    def test_admin_password_reset_email(self):
+        admin = AdminUser(username='resetme', email='reset@e.com')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+
+        client = self.app.test_client()
+        client.post('/admin/forgot-password', data={'email': 'reset@e.com'})
+        self.assertEqual(len(self.mailbox.messages), 1)
+        self.assertIn('Dear resetme', self.mailbox.messages[0]['body'])
+        self.assertIsNone(EmailLog.query.one().student_id)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import base64
+import json
+import re
+import unittest
+from sqlalchemy import insert, update
+from app import create_app, db
+from config import Config
+from models import Student, AdminUser, Company, PlacementDrive, Quiz, DriveInvitation, ProfileUpdateRequest
+from utils.pagination import keyset_paginate, list_counts, _encode
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_PROVIDER = 'fake'
+    ADMIN_LIST_PER_PAGE = 4
+
+class KeysetPaginationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.execute(insert(Student), [
+            {'roll_no': f'R{i:02d}', 'name': f'Student {i}', 'email': f's{i}@e.com', 'mobile': '1',
+             'department': 'IT', 'semester': 5, 'password_hash': 'x',
+             'status': 'Pending' if i % 3 == 0 else 'Approved'} for i in range(10)])
+        db.session.commit()
+        self.order = [Student.status.desc(), Student.id.desc()]
+        self.expected = [s.roll_no for s in Student.query.order_by(*self.order)]
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def page(self, query_string='', query=None, order=None):
+        with self.app.test_request_context(f'/admin/students?{query_string}'):
+            page = keyset_paginate(query or Student.query, order or self.order)
+            return page, [s.roll_no for s in page], page.next_url, page.prev_url
+
+    def test_walks_forward_and_back(self):
+        seen, url, urls = [], 'q=x', []
+        while url is not None:
+            page, rolls, url, prev = self.page(url.split('?', 1)[1] if '?' in url else url)
+            self.assertEqual(page.total, 10)
+            seen += rolls
+            urls.append(prev)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(urls), 3)
+        self.assertIsNone(urls[0])
+        self.assertIn('q=x', urls[2])
+
+        # Back from the last page lands on the middle one, then the first
+        page, rolls, _, prev = self.page(urls[2].split('?', 1)[1])
+        self.assertEqual(rolls, self.expected[4:8])
+        _, rolls, _, prev = self.page(prev.split('?', 1)[1])
+        self.assertEqual(rolls, self.expected[:4])
+        self.assertIsNone(prev)
+
+        _, rolls, _, _ = self.page('after=not-a-cursor')
+        self.assertEqual(rolls, self.expected[:4])
+
+    def test_mistyped_cursor_values_start_over(self):
+        for values in (['Approved', 'x'], ['Approved', 2 ** 70], [{'a': 1}, 3], ['Approved', True], ['Approved']):
+            _, rolls, _, _ = self.page(f'after={_encode(values)}')
+            self.assertEqual(rolls, self.expected[:4], values)
+
+    def test_cached_total_invalidated_on_writes(self):
+        self.assertEqual(self.page()[0].total, 10)
+        db.session.execute(insert(Student).values(roll_no='X', name='X', email='x@e.com', mobile='1',
+                                                  department='IT', semester=5, password_hash='x'))
+        self.assertEqual(self.page()[0].total, 10)  # not committed yet
+        db.session.commit()
+        self.assertEqual(self.page()[0].total, 11)
+
+        db.session.delete(Student.query.filter_by(roll_no='X').one())
+        db.session.commit()
+        self.assertEqual(self.page()[0].total, 10)
+        self.assertIn(('students', None), list_counts().entries)
+        db.session.execute(update(Company).values(name='n'))  # other tables leave it alone
+        db.session.commit()
+        self.assertIn(('students', None), list_counts().entries)
+
+    def test_admin_lists(self):
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.set_password('admin')
+        company = Company(name='Acme')
+        db.session.add_all([admin, company])
+        db.session.commit()
+        for i in range(6):
+            drive = PlacementDrive(company_id=company.id, job_title=f'Drive {i}')
+            db.session.add(drive)
+            db.session.flush()
+            db.session.add_all([Quiz(title=f'Quiz {i}', drive_id=drive.id),
+                                DriveInvitation(company_id=company.id, subject=f'Invite {i}', message='Hi'),
+                                ProfileUpdateRequest(student_id=1, requested_changes='{}')])
+        db.session.commit()
+
+        client = self.app.test_client()
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+        for path, first, rest in [('/admin/drives', 'Drive 5', 'Drive 1'), ('/admin/quizzes', 'Quiz 5', 'Quiz 1')]:
+            page = client.get(path).get_data(as_text=True)
+            self.assertIn(first, page)
+            self.assertNotIn(rest, page)
+            self.assertIn('4 of 6', page)
+            self.assertIn('after=', page)
+        for path in ('/admin/students?q=student', '/admin/companies', '/admin/invitations', '/admin/requests'):
+            self.assertEqual(client.get(path).status_code, 200, path)
+
+        # Search results page by relevance, then id
+        page = client.get('/admin/students?q=student').get_data(as_text=True)
+        self.assertIn('Student 3<', page)
+        self.assertNotIn('Student 4<', page)
+        next_url = re.search(r'href="([^"]*after=[^"]*)"', page).group(1).replace('&amp;', '&')
+        cursor = re.search(r'after=([\w-]+)', next_url).group(1)
+        self.assertEqual(json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))),
+                         [Student.query.filter_by(name='Student 3').one().id])  # the rank is not in it
+        page = client.get(next_url).get_data(as_text=True)
+        self.assertIn('Student 4<', page)
+        self.assertNotIn('Student 3<', page)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from app import create_app, db
+from config import Config
+from extensions import bcrypt
+from flask import Flask
+from models import Student, AdminUser
+from utils.password_hashing import hash_passwords, hash_password, calibrate_rounds, init_password_hashing
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+
+class PasswordHashingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_pool_hashes_verify_in_order(self):
+        passwords = [f"{i}@password" for i in range(20)]
+        hashes = hash_passwords(passwords, workers=2)
+        self.assertEqual(len(hashes), 20)
+        for password, h in zip(passwords, hashes):
+            self.assertTrue(bcrypt.check_password_hash(h, password))
+        self.assertFalse(bcrypt.check_password_hash(hashes[0], passwords[1]))
+
+    def test_uses_configured_rounds(self):
+        self.assertTrue(hash_password('secret').startswith('$2b$04$'))
+
+    def test_empty_password_rejected(self):
+        with self.assertRaises(ValueError):
+            hash_passwords(['ok', ''])
+
+    def test_model_set_password(self):
+        s = Student(roll_no='101', name='A', email='a@e.com', mobile='1', department='IT', semester=1)
+        s.set_password('secret')
+        self.assertTrue(s.check_password('secret'))
+
+    def test_calibration_respects_target_and_bounds(self):
+        rounds, estimate = calibrate_rounds(target_ms=1, min_rounds=4, max_rounds=6)
+        self.assertEqual(rounds, 4)  # even the floor is over 1 ms: keep the minimum
+        rounds, estimate = calibrate_rounds(target_ms=10 ** 6, min_rounds=4, max_rounds=6)
+        self.assertEqual(rounds, 6)
+        self.assertLess(estimate, 10 ** 6)
+
+    def test_startup_calibration_sets_rounds(self):
+        calibration = os.path.join(tempfile.mkdtemp(), 'bcrypt_calibration.json')
+        app = Flask(__name__)
+        app.config.update(BCRYPT_TARGET_MS=10 ** 6, BCRYPT_MIN_ROUNDS=4, BCRYPT_MAX_ROUNDS=5,
+                          BCRYPT_CALIBRATION_FILE=calibration)
+        init_password_hashing(app)
+        self.assertEqual(app.config['BCRYPT_LOG_ROUNDS'], 5)
+        self.assertTrue(os.path.exists(calibration))
+
+        # Other processes reuse the saved cost instead of measuring their own
+        other = Flask(__name__)
+        other.config.update(BCRYPT_TARGET_MS=1, BCRYPT_MIN_ROUNDS=4, BCRYPT_MAX_ROUNDS=5,
+                            BCRYPT_CALIBRATION_FILE=calibration)
+        init_password_hashing(other)
+        self.assertEqual(other.config['BCRYPT_LOG_ROUNDS'], 5)
+        os.remove(calibration)
+
+        # A fast target lowers the cost below the old default, down to the floor
+        fast = Flask(__name__)
+        fast.config.update(BCRYPT_TARGET_MS=1, BCRYPT_MIN_ROUNDS=4, BCRYPT_MAX_ROUNDS=14,
+                           BCRYPT_CALIBRATION_FILE=calibration)
+        init_password_hashing(fast)
+        self.assertEqual(fast.config['BCRYPT_LOG_ROUNDS'], 4)
+        os.remove(calibration)
+
+        pinned = Flask(__name__)
+        pinned.config.update(BCRYPT_TARGET_MS=10 ** 6, BCRYPT_LOG_ROUNDS=4)
+        init_password_hashing(pinned)
+        self.assertEqual(pinned.config['BCRYPT_LOG_ROUNDS'], 4)
+
+    def test_login_rehashes_at_current_cost(self):
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.password_hash = hash_password('admin', rounds=5)
+        db.session.add(admin)
+        db.session.commit()
+
+        client = self.app.test_client()
+        client.post('/admin/login', data={'username': 'admin', 'password': 'wrong'})
+        db.session.refresh(admin)
+        self.assertTrue(admin.password_hash.startswith('$2b$05$'))
+
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+        db.session.refresh(admin)
+        self.assertTrue(admin.password_hash.startswith('$2b$04$'))  # lowered to the current cost too
+
+        self.app.config['BCRYPT_LOG_ROUNDS'] = 6
+        client.get('/logout')
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+        db.session.refresh(admin)
+        self.assertTrue(admin.password_hash.startswith('$2b$06$'))
+        self.assertTrue(admin.check_password('admin'))
+
+        stats = client.get('/admin/security/password-hashing').get_json()
+        self.assertEqual(stats['rounds'], 6)
+        self.assertEqual(stats['rehashed'], 2)
+        self.assertEqual(stats['verifications']['5']['count'], 2)
+        self.assertIn('p95_ms', stats['verifications']['5'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import os
+import tempfile
+import pandas as pd
+from app import create_app, db
+from config import Config
+from models import Quiz, Question
+from utils.question_import import import_question_file
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    JOB_WORKER_THREADS = 0
+
+COLUMNS = ['Question Text', 'Option A', 'Option B', 'Option C', 'Option D', 'Correct Option', 'Marks']
+
+class QuestionImportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.quiz = Quiz(title='Aptitude')
+        db.session.add(self.quiz)
+        db.session.commit()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def import_rows(self, rows):
+        path = os.path.join(self.tmp.name, 'questions.xlsx')
+        pd.DataFrame(rows, columns=COLUMNS).to_excel(path, index=False)
+        return import_question_file(self.quiz.id, path)
+
+    def test_import_and_validation(self):
+        result = self.import_rows([
+            ['2 + 2?', '3', '4', '5', '6', ' b ', 2],
+            ['Capital of France?', 'Paris', 'Rome', 'Oslo', 'Bern', 'A', None],
+            ['Bad option', '1', '2', '3', '4', 'E', 1],
+            ['Bad marks', '1', '2', '3', '4', 'A', 'two'],
+            ['Missing option', '1', None, '3', '4', 'A', 1],
+        ])
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual(len(result['errors']), 3)
+        self.assertTrue(result['errors'][0].startswith('Row 4: Correct Option'))
+        self.assertIn("Invalid Marks 'two'", result['errors'][1])
+        self.assertIn('Option B is empty', result['errors'][2])
+
+        q = Question.query.filter_by(question_text='2 + 2?').one()
+        self.assertEqual((q.correct_option, q.marks), ('B', 2))
+        self.assertEqual(Question.query.filter_by(question_text='Capital of France?').one().marks, 1)
+
+    def test_reimport_skips_duplicates(self):
+        db.session.add(Question(quiz_id=self.quiz.id, question_text='What is  SQL?', option_a='A language',
+                                option_b='A fruit', option_c='A car', option_d='A city', correct_option='A'))
+        db.session.commit()
+
+        rows = [
+            ['what is sql?', 'a language', 'A fruit', 'A car', 'A city', 'A', 1],  # same after normalising
+            ['New one', 'w', 'x', 'y', 'z', 'C', 1],
+            ['New one', 'w', 'x', 'y', 'z', 'C', 1],  # repeated in the sheet
+            ['New one', 'x', 'w', 'y', 'z', 'C', 1],  # options reordered: different question
+        ]
+        result = self.import_rows(rows)
+        self.assertEqual((result['imported'], result['duplicates']), (2, 2))
+
+        result = self.import_rows(rows)
+        self.assertEqual((result['imported'], result['duplicates']), (0, 4))
+        self.assertEqual(Question.query.filter_by(quiz_id=self.quiz.id).count(), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from config import Config
+from models import Student, Company, PlacementDrive, Recommendation, RecommendationQueue, BackgroundJob
+from utils.recommendations import process_queue, rebuild_recommendations, mark_recommendations_stale
+from utils.skills import seed_skills
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_PROVIDER = 'fake'
+    RECOMMENDATIONS_PER_KIND = 2
+
+class RecommendationsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        seed_skills(db.session)
+        db.session.commit()
+
+        self.students = {}
+        for roll, dept, cgpa, skills in [('1', 'IT', 8.0, 'Python, SQL, Linux'),
+                                         ('2', 'CS', 9.0, 'React, JavaScript'),
+                                         ('3', 'IT', 6.0, 'Python, Docker')]:
+            student = Student(roll_no=roll, name=f'S{roll}', email=f'{roll}@e.com', mobile='1', department=dept,
+                              semester=5, cgpa=cgpa, skills=skills, status='Approved',
+                              is_password_changed=True, is_email_verified=True)
+            student.set_password('pw')
+            db.session.add(student)
+            self.students[roll] = student
+        self.companies = {name: Company(name=name, required_skills=skills) for name, skills in
+                          [('Data', 'Python, SQL'), ('Web', 'React, JavaScript'), ('Ops', 'Docker, Linux')]}
+        db.session.add_all(self.companies.values())
+        db.session.commit()
+
+        deadline = datetime.utcnow() + timedelta(days=5)
+        self.drives = {
+            'analyst': PlacementDrive(company_id=self.companies['Data'].id, job_title='Analyst', criteria_cgpa=7,
+                                      job_description='SQL and Python reporting', deadline=deadline),
+            'frontend': PlacementDrive(company_id=self.companies['Web'].id, job_title='Frontend',
+                                       deadline=deadline),  # falls back to the company's skills
+            'devops': PlacementDrive(company_id=self.companies['Ops'].id, job_title='DevOps',
+                                     allowed_branches='IT', deadline=deadline),
+        }
+        db.session.add_all(self.drives.values())
+        db.session.commit()
+        process_queue(db.session)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def listed(self, roll, kind):
+        rows = Recommendation.query.filter_by(student_id=self.students[roll].id, kind=kind) \
+            .order_by(Recommendation.rank).all()
+        if kind == 'drive':
+            return [db.session.get(PlacementDrive, r.target_id).job_title for r in rows]
+        return [db.session.get(Company, r.target_id).name for r in rows]
+
+    def test_scored_on_skills_and_eligibility(self):
+        self.assertEqual(self.listed('1', 'drive'), ['Analyst', 'DevOps'])  # eligible for DevOps, no skill overlap
+        self.assertEqual(self.listed('1', 'company'), ['Data', 'Ops'])
+        self.assertEqual(self.listed('2', 'drive'), ['Frontend', 'Analyst'])  # CS: not eligible for DevOps
+        self.assertEqual(self.listed('3', 'drive'), ['DevOps', 'Frontend'])  # cgpa too low for Analyst
+
+        top = Recommendation.query.filter_by(student_id=self.students['1'].id, kind='drive', rank=1).one()
+        self.assertAlmostEqual(top.similarity, 0.78, places=2)  # Linux is not in the description
+        self.assertAlmostEqual(top.score, 0.7 * top.similarity + 0.3)
+        self.assertEqual(RecommendationQueue.query.count(), 0)
+        self.assertEqual(BackgroundJob.query.count(), 0)  # no auto refresh while testing
+
+    def test_incremental_refresh(self):
+        self.companies['Web'].required_skills = 'Python, Docker'
+        db.session.commit()
+        self.assertEqual([(q.kind, q.target_id) for q in RecommendationQueue.query],
+                         [('company', self.companies['Web'].id)])
+        result = process_queue(db.session)
+        self.assertEqual(result['queued'], 1)
+        self.assertEqual(self.listed('3', 'drive'), ['Frontend', 'DevOps'])  # Frontend now matches exactly
+        web = Recommendation.query.filter_by(student_id=self.students['2'].id, target_id=self.companies['Web'].id,
+                                             kind='company').one()
+        self.assertEqual((web.similarity, web.score), (0.0, 0.3))  # still eligible, no longer a skill match
+
+        self.students['2'].skills = 'Docker'
+        db.session.commit()
+        process_queue(db.session)
+        self.assertEqual(self.listed('2', 'company'), ['Web', 'Ops'])
+
+        # Bulk writes queue their ids explicitly; the result matches a full rebuild
+        mark_recommendations_stale('student', [self.students['1'].id])
+        db.session.commit()
+        process_queue(db.session)
+        incremental = {(r.student_id, r.kind, r.target_id, r.rank) for r in Recommendation.query}
+        rebuild_recommendations(db.session)
+        db.session.commit()
+        self.assertEqual({(r.student_id, r.kind, r.target_id, r.rank) for r in Recommendation.query}, incremental)
+
+        db.session.delete(self.drives['devops'])
+        db.session.commit()
+        self.assertEqual(Recommendation.query.filter_by(kind='drive', target_id=self.drives['devops'].id).count(), 0)
+
+    def test_dashboard(self):
+        client = self.app.test_client()
+        client.post('/student/login', data={'roll_no': '1', 'password': 'pw'})
+        page = client.get('/student/dashboard').get_data(as_text=True)
+        self.assertIn('Recommended for You', page)
+        self.assertIn('Analyst', page)
+        self.assertIn('78% skill fit', page)
+
+if __name__ == '__main__':
+    unittest.main()
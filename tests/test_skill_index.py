@@ -0,0 +1,93 @@
+import io
+import unittest
+import pandas as pd
+from app import create_app, db
+from config import Config
+from models import Student, AdminUser, StudentSkill
+from utils.skill_index import rebuild_skill_index
+from utils.skill_ranking import rank_students
+from utils.skills import skill_names, skill_ids
+from utils.student_import import StudentImporter
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_PROVIDER = 'fake'
+
+class SkillIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.students = {}
+        for roll, skills, status in [('1', 'Python, SQL', 'Approved'),
+                                     ('2', ' python ,Machine  Learning,SQL', 'Approved'),
+                                     ('3', 'CSS, HTML', 'Approved'),
+                                     ('4', 'Python', 'Pending')]:
+            student = Student(roll_no=roll, name=f'S{roll}', email=f'{roll}@e.com', mobile='1', department='IT',
+                              semester=5, skills=skills, status=status)
+            student.set_password('pw')
+            db.session.add(student)
+            self.students[roll] = student
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def postings(self, roll):
+        student = Student.query.filter_by(roll_no=roll).one()
+        return set(skill_names(row.skill_id for row in StudentSkill.query.filter_by(student_id=student.id)))
+
+    def ranked(self, *skills):
+        return [(r['student'].roll_no, r['matches']) for r in rank_students(skill_ids(list(skills)))]
+
+    def test_search_scores_from_postings(self):
+        self.assertEqual(self.postings('2'), {'Python', 'Machine Learning', 'SQL'})  # named as first typed
+        self.assertEqual(self.ranked('SQL', 'machine learning'), [('2', ['SQL', 'Machine Learning']), ('1', ['SQL'])])
+        self.assertEqual(self.ranked('c'), [])  # whole skills only: 'C' is not 'CSS'
+        self.assertEqual(self.ranked(' ', ''), [])
+
+    def test_index_follows_writes(self):
+        self.students['3'].skills = 'CSS, Python'
+        db.session.commit()
+        self.assertEqual(self.postings('3'), {'CSS', 'Python'})
+        # Ranked by similarity: S2's third skill dilutes its match
+        self.assertEqual([roll for roll, _ in self.ranked('python')], ['1', '3', '2'])
+
+        student_id = self.students['1'].id
+        db.session.delete(self.students['1'])
+        db.session.commit()
+        self.assertEqual(StudentSkill.query.filter_by(student_id=student_id).count(), 0)
+
+        header = 'roll_no,name,email,mobile,department,semester,tenth_marks,twelfth_marks,cgpa,backlogs,skills,projects\n'
+        StudentImporter().import_frame(pd.read_csv(io.StringIO(
+            header + '3,S3,3@e.com,1,IT,5,70,70,7,0,Go,\n9,S9,9@e.com,1,IT,5,70,70,7,0,"Go, Rust",\n'), dtype=str))
+        db.session.commit()
+        self.assertEqual(self.postings('3'), {'Go'})
+        self.assertEqual(self.postings('9'), {'Go', 'Rust'})
+
+        before = {(r.student_id, r.skill_id) for r in StudentSkill.query}
+        rebuild_skill_index(db.session)
+        db.session.commit()
+        self.assertEqual({(r.student_id, r.skill_id) for r in StudentSkill.query}, before)
+
+    def test_tech_match_page(self):
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+        client = self.app.test_client()
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+        page = client.get('/admin/tech-match?type=students&skills=Python,SQL').get_data(as_text=True)
+        self.assertIn('Found 2 matches', page)
+        self.assertIn('2 Skill Matches', page)
+        self.assertIn('% fit', page)
+        self.assertNotIn('S4', page)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import time
+import unittest
+import numpy as np
+from datetime import datetime, timedelta
+from app import create_app, db
+from config import Config
+from models import Student, Company, PlacementDrive, AdminUser
+from utils.skill_ranking import SkillMatrix, query_skills, rank_students
+from utils.skills import seed_skills, skill_ids
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_PROVIDER = 'fake'
+
+class SkillRankingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        seed_skills(db.session)
+        self.students = {}
+        for roll, skills in [('1', 'SQL, Kubernetes'), ('2', 'SQL, Python'), ('3', 'SQL, Python, Excel, HTML, CSS'),
+                             ('4', 'SQL'), ('5', 'Java')]:
+            student = Student(roll_no=roll, name=f'S{roll}', email=f'{roll}@e.com', mobile='1', department='IT',
+                              semester=5, skills=skills, status='Approved')
+            student.set_password('pw')
+            db.session.add(student)
+            self.students[roll] = student
+        self.company = Company(name='Acme', required_skills='k8s, sql')
+        db.session.add(self.company)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def ranked(self, ids, k=50):
+        return [r['student'].roll_no for r in rank_students(ids, k)]
+
+    def test_idf_cosine_order(self):
+        # Kubernetes is rare, SQL is everywhere; a focused profile beats a long list
+        self.assertEqual(self.ranked(query_skills(company=self.company)), ['1', '4', '2', '3'])
+        self.assertEqual(self.ranked(query_skills(company=self.company), k=2), ['1', '4'])
+        top = rank_students(query_skills(skills=['python', 'SQL']))
+        self.assertEqual([r['student'].roll_no for r in top], ['2', '4', '3', '1'])
+        self.assertEqual(top[0]['matches'], ['Python', 'SQL'])
+        self.assertAlmostEqual(top[0]['similarity'], 1.0)
+        self.assertEqual(rank_students([]), [])
+
+    def test_drive_description(self):
+        drive = PlacementDrive(company_id=self.company.id, job_title='Dev', deadline=datetime.utcnow() + timedelta(days=3),
+                               job_description='Backend role. Must know Java and Spring Boot; Python is a plus.')
+        db.session.add(drive)
+        db.session.commit()
+        self.assertEqual(query_skills(drive=drive), skill_ids('Java, Spring Boot, Python'))
+        drive.job_description = 'Great culture.'
+        self.assertEqual(query_skills(drive=drive), query_skills(company=self.company))
+
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+        client = self.app.test_client()
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+        page = client.get(f'/admin/tech-match?type=students&drive_id={drive.id}').get_data(as_text=True)
+        self.assertIn('matches for Acme - Dev', page)
+        self.assertIn('100% fit', page)
+
+    def test_matrix_follows_commits(self):
+        query = query_skills(company=self.company)
+        self.ranked(query)  # build the cached matrix
+        self.students['5'].skills = 'Java, Kubernetes'
+        db.session.commit()
+        self.assertIn('5', self.ranked(query))
+        self.students['1'].status = 'Rejected'
+        db.session.commit()
+        self.assertNotIn('1', self.ranked(query))
+
+        from blueprints.admin import bulk_set_status
+        self.students['1'].status = 'Pending'
+        db.session.commit()
+        bulk_set_status('Approved', student_ids=[self.students['1'].id])
+        db.session.commit()
+        self.assertEqual(self.ranked(query)[0], '1')
+
+    def test_ranking_20k_students_is_fast(self):
+        rng = np.random.default_rng(0)
+        pairs = sorted({(sid, int(skill)) for sid in range(20000) for skill in rng.zipf(1.5, 6) if skill < 500})
+        matrix = SkillMatrix(pairs)
+        started = time.perf_counter()
+        top = matrix.top([1, 7, 42, 300], 50)
+        self.assertLess(time.perf_counter() - started, 0.05)
+        self.assertEqual(len(top), 50)
+        self.assertEqual(top, sorted(top, key=lambda pair: (-pair[0], pair[1])))
+
+if __name__ == '__main__':
+    unittest.main()
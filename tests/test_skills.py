@@ -0,0 +1,111 @@
+import unittest
+from unittest.mock import patch
+from sqlalchemy import update
+from app import create_app, db
+from config import Config
+from models import Student, Company, AdminUser, Skill, StudentSkill
+from utils.skills import skill_key, canonicalize, skill_ids, seed_skills, backfill_skills, get_registry, SkillRegistry
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_PROVIDER = 'fake'
+
+class SkillRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        seed_skills(db.session)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_student(self, roll, skills):
+        student = Student(roll_no=roll, name=f'S{roll}', email=f'{roll}@e.com', mobile='1', department='IT',
+                          semester=5, skills=skills, status='Approved')
+        student.set_password('pw')
+        db.session.add(student)
+        db.session.commit()
+        return student
+
+    def test_keys_and_aliases(self):
+        self.assertEqual(skill_key(' React.js '), 'reactjs')
+        self.assertEqual(skill_key('C++'), 'c++')
+        self.assertEqual(canonicalize('ReactJS, react.js ,React, python3, c, CSS'), 'React, Python, C, CSS')
+        self.assertEqual(skill_ids('c'), skill_ids(['C Language']))
+        self.assertNotEqual(skill_ids('c'), skill_ids('css'))
+        self.assertIsNone(canonicalize(' , '))
+
+    def test_canonicalized_on_write(self):
+        student = self.add_student('1', 'reactjs, Flutter ,  nodejs')
+        self.assertEqual(student.skills, 'React, Flutter, Node.js')  # Flutter registered as typed
+        student.skills = 'flutter, K8S'
+        db.session.commit()
+        self.assertEqual(student.skills, 'Flutter, Kubernetes')
+        self.assertEqual(Skill.query.filter_by(name='Flutter').count(), 1)
+
+        company = Company(name='Acme', required_skills='js,  postgres')
+        db.session.add(company)
+        db.session.commit()
+        self.assertEqual(company.required_skills, 'JavaScript, PostgreSQL')
+
+    def test_registry_cache_survives_rollback(self):
+        student = self.add_student('1', 'Python')
+        student.skills = 'Elixir'
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(skill_ids('elixir'), [])  # never committed, so not cached
+        self.assertEqual(Skill.query.filter_by(name='Elixir').count(), 0)
+
+        self.add_student('2', 'Elixir')
+        self.assertIn('elixir', get_registry().aliases)
+
+    def test_concurrent_registration_uses_existing_skill(self):
+        flutter = skill_ids('Flutter', create=True)
+        db.session.commit()
+        # Another request registered it after this one looked it up
+        with patch.object(SkillRegistry, 'find', return_value={}):
+            student = self.add_student('1', 'flutter, Python')
+        self.assertEqual(skill_ids('Flutter'), flutter)
+        self.assertEqual(student.skills, 'Flutter, Python')
+        self.assertEqual(Skill.query.filter_by(name='Flutter').count(), 1)
+
+    def test_backfill(self):
+        for roll in range(7):
+            self.add_student(str(roll), 'Python')
+        db.session.add(Company(name='Acme'))
+        db.session.commit()
+        # Rows written before the registry existed
+        db.session.execute(update(Student), [{'id': s.id, 'skills': 'python3 , ReactJS'} for s in Student.query])
+        db.session.execute(update(Company), [{'id': c.id, 'required_skills': 'ml,java se'} for c in Company.query])
+        db.session.execute(StudentSkill.__table__.delete())
+        db.session.commit()
+        db.session.expire_all()
+
+        counts = backfill_skills(db.session, batch_size=3)
+        self.assertEqual((counts['students'], counts['companies'], counts['changed']), (7, 1, 8))
+        self.assertEqual({s.skills for s in Student.query}, {'Python, React'})
+        self.assertEqual(Company.query.one().required_skills, 'Machine Learning, Java')
+        self.assertEqual(StudentSkill.query.count(), 14)
+
+    def test_company_match_by_id(self):
+        db.session.add_all([Company(name='A', required_skills='C, SQL'), Company(name='B', required_skills='CSS')])
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+        client = self.app.test_client()
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+        page = client.get('/admin/tech-match?type=companies&skills=c language').get_data(as_text=True)
+        self.assertIn('Found 1 matches', page)
+        self.assertIn('mb-1">A</h5>', page)
+
+if __name__ == '__main__':
+    unittest.main()
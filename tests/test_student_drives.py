@@ -0,0 +1,88 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from config import Config
+from models import Student, Company, PlacementDrive, Quiz, JobApplication
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_PROVIDER = 'fake'
+    STUDENT_DRIVES_PER_PAGE = 50
+
+class StudentDriveListTestCase(unittest.TestCase):
+    # Requests run outside a test-held app context so every request starts
+    # with an empty identity map, as in production.
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        with self.app.app_context():
+            db.create_all()
+            student = Student(roll_no='S1', name='S', email='s1@e.com', mobile='1', department='IT', semester=5,
+                              cgpa=8.0, status='Approved', is_password_changed=True, is_email_verified=True)
+            student.set_password('password')
+            db.session.add(student)
+            db.session.commit()
+            self.student_id = student.id
+        self.client = self.app.test_client()
+        self.client.post('/student/login', data={'roll_no': 'S1', 'password': 'password'})
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def add_drives(self, count, start=0):
+        with self.app.app_context():
+            deadline = datetime.utcnow() + timedelta(days=10)
+            for i in range(start, start + count):
+                company = Company(name=f'Company {i}')
+                db.session.add(company)
+                db.session.flush()
+                drive = PlacementDrive(company_id=company.id, job_title=f'Role {i}', deadline=deadline,
+                                       criteria_cgpa=9.0 if i % 2 else 0.0)
+                db.session.add(drive)
+                db.session.flush()
+                db.session.add(Quiz(title=f'Quiz {i}', drive_id=drive.id, is_live=True))
+                if i == 0:
+                    db.session.add(JobApplication(student_id=self.student_id, drive_id=drive.id))
+            db.session.commit()
+
+    def count_queries(self, url):
+        statements = []
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        self.client.get(url)  # warm the login cache so both counts see the same state
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            response = self.client.get(url)
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+        self.assertEqual(response.status_code, 200)
+        return len(statements), response.get_data(as_text=True)
+
+    def test_query_count_does_not_grow_with_drives(self):
+        self.add_drives(5)
+        few, _ = self.count_queries('/student/drives')
+        self.add_drives(40, start=5)
+        many, page = self.count_queries('/student/drives')
+        self.assertEqual(few, many)
+        self.assertIn('Company 44', page)
+        self.assertIn('Take Assessment', page)  # quizzes of the applied drive
+        self.assertIn('Not Eligible', page)
+        self.assertIn('badge bg-info text-dark">Eligible', page)
+        self.assertIn('Apply Now', page)
+
+    def test_pagination(self):
+        self.add_drives(60)
+        _, first = self.count_queries('/student/drives')
+        _, second = self.count_queries('/student/drives?page=2')
+        self.assertIn('Page 1 of 2', first)
+        self.assertEqual(second.count('Apply by'), 10)
+
+if __name__ == '__main__':
+    unittest.main()
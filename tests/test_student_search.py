@@ -0,0 +1,97 @@
+import io
+import time
+import unittest
+import pandas as pd
+from sqlalchemy import insert, update
+from app import create_app, db
+from config import Config
+from models import Student, AdminUser
+from utils.student_search import search_students
+from utils.student_import import StudentImporter
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_PROVIDER = 'fake'
+
+class StudentSearchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        for roll, name, email in [('21CS001', 'Alice Kumar', 'alice@college.edu'),
+                                  ('21CS002', 'Bob Alison', 'bob@college.edu'),
+                                  ('21IT003', 'Carol Das', 'carol.das@mail.com')]:
+            student = Student(roll_no=roll, name=name, email=email, mobile='1', department='IT', semester=5)
+            student.set_password('pw')
+            db.session.add(student)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def search(self, text):
+        return [s.roll_no for s in search_students(Student.query, text)]
+
+    def test_prefix_matches_ranked(self):
+        self.assertEqual(self.search('ali'), ['21CS001', '21CS002'])
+        self.assertEqual(self.search('ali kum'), ['21CS001'])
+        self.assertEqual(self.search('21cs'), ['21CS001', '21CS002'])
+        self.assertEqual(self.search('carol.das@'), ['21IT003'])
+        self.assertEqual(self.search('"bob*'), ['21CS002'])  # FTS syntax is not interpreted
+        self.assertEqual(len(self.search('  ')), 3)
+        self.assertEqual(self.search('zed'), [])
+
+    def test_index_follows_writes(self):
+        carol = Student.query.filter_by(roll_no='21IT003').one()
+        carol.name = 'Caroline Zed'
+        db.session.commit()
+        self.assertEqual(self.search('zed'), ['21IT003'])
+        self.assertEqual(self.search('das'), ['21IT003'])  # still in the email
+
+        db.session.execute(update(Student).where(Student.id == carol.id).values(email='cz@mail.com'))
+        db.session.commit()
+        self.assertEqual(self.search('das'), [])
+
+        db.session.delete(carol)
+        db.session.commit()
+        self.assertEqual(self.search('zed'), [])
+
+        header = 'roll_no,name,email,mobile,department,semester,tenth_marks,twelfth_marks,cgpa,backlogs,skills,projects\n'
+        StudentImporter().import_frame(pd.read_csv(io.StringIO(
+            header + '21CS001,Alice Menon,alice@college.edu,1,IT,5,70,70,7,0,,\n'
+                     '22ME010,Dev Patel,dev@college.edu,1,ME,5,70,70,7,0,,\n'), dtype=str))
+        db.session.commit()
+        self.assertEqual(self.search('menon'), ['21CS001'])
+        self.assertEqual(self.search('kumar'), [])
+        self.assertEqual(self.search('patel'), ['22ME010'])
+
+    def test_admin_list(self):
+        admin = AdminUser(username='admin', email='admin@e.com')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+        client = self.app.test_client()
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+        page = client.get('/admin/students?q=alison').get_data(as_text=True)
+        self.assertIn('Bob Alison', page)
+        self.assertNotIn('Alice Kumar', page)
+
+    def test_search_speed(self):
+        db.session.execute(insert(Student), [
+            {'roll_no': f'R{i:06d}', 'name': f'Student {i} Name{i % 997}', 'email': f's{i}@college.edu',
+             'mobile': '1', 'department': 'IT', 'semester': 5, 'password_hash': 'x'} for i in range(50000)])
+        db.session.commit()
+        search_students(Student.query, 'name12').limit(10).all()  # warm up
+        started = time.perf_counter()
+        page = search_students(Student.query, 'name12').limit(10).all()
+        self.assertLess(time.perf_counter() - started, 0.02)
+        self.assertEqual(len(page), 10)
+
+if __name__ == '__main__':
+    unittest.main()
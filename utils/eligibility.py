@@ -0,0 +1,216 @@
+"""
+Drive eligibility: a student may apply to a drive when their 10th, 12th
+and diploma CGPA marks meet the drive's thresholds (missing marks count
+as 0) and their department is in allowed_branches (empty = all).
+
+Three ways to evaluate the same rules:
+  eligibility_filter()  - SQL predicate, for queries over students
+  evaluate_drives()     - NumPy, one or more drives against all approved students
+  evaluate_student()    - NumPy, one student against many drives
+The NumPy forms also say which criteria failed.
+
+department_counts() answers "how many would be eligible with these
+criteria" for the drive form, from a cached columnar snapshot of the
+approved students (see StudentSnapshot).
+"""
+import threading
+import time
+import numpy as np
+from flask import current_app
+from sqlalchemy import func
+from models import Student
+
+# Failure reasons, in the order apply_drive has always reported them
+CRITERIA = ('tenth', 'twelfth', 'cgpa', 'branch')
+
+
+def allowed_branches(drive):
+    """Lower-cased department codes a drive is open to (empty = all)."""
+    if not drive.allowed_branches:
+        return []
+    return [b.strip().lower() for b in drive.allowed_branches.split(',') if b.strip()]
+
+
+def eligibility_filter(drive):
+    """
+    SQL conditions for "meets the drive's criteria", mirroring the checks
+    in student.apply_drive (missing marks count as 0).
+    """
+    conditions = [
+        func.coalesce(Student.tenth_marks, 0) >= (drive.criteria_10th or 0),
+        func.coalesce(Student.twelfth_marks, 0) >= (drive.criteria_12th or 0),
+        func.coalesce(Student.cgpa, 0) >= (drive.criteria_cgpa or 0),
+    ]
+    branches = allowed_branches(drive)
+    if branches:
+        conditions.append(func.lower(Student.department).in_(branches))
+    return conditions
+
+
+def eligible_students(drive, *columns):
+    """Approved students eligible for a drive (only the given columns, if any)."""
+    query = Student.query.with_entities(*columns) if columns else Student.query
+    return query.filter(Student.status == 'Approved', *eligibility_filter(drive))
+
+
+def reason(criterion, drive, department=None):
+    """Student-facing text for a failed criterion."""
+    if criterion == 'tenth':
+        return f"10th Marks < {drive.criteria_10th}%"
+    if criterion == 'twelfth':
+        return f"12th Marks < {drive.criteria_12th}%"
+    if criterion == 'cgpa':
+        return f"Diploma CGPA < {drive.criteria_cgpa}"
+    return f"Department '{department}' not eligible."
+
+
+def _thresholds(drives):
+    return np.array([[d.criteria_10th or 0, d.criteria_12th or 0, d.criteria_cgpa or 0] for d in drives],
+                    dtype=float).reshape(-1, 3)
+
+
+def _student_columns(student_ids=None):
+    """ids, (n, 3) marks matrix and lower-cased departments of the approved students."""
+    query = Student.query.with_entities(Student.id, Student.tenth_marks, Student.twelfth_marks, Student.cgpa,
+                                        Student.department).filter(Student.status == 'Approved')
+    if student_ids is not None:
+        query = query.filter(Student.id.in_(student_ids))
+    rows = query.order_by(Student.id).all()
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    marks = np.array([[r[1] or 0, r[2] or 0, r[3] or 0] for r in rows], dtype=float).reshape(-1, 3)
+    departments = np.array([(r[4] or '').strip().lower() for r in rows], dtype=object)
+    return ids, marks, departments
+
+
+def evaluate_drives(drives, student_ids=None):
+    """
+    Evaluate drives against every approved student (or just student_ids)
+    with one student query and array comparisons.
+
+    Returns {drive_id: {'total': n, 'eligible': set of ids,
+    'failures': {criterion: set of ids}}}; a student can fail several criteria.
+    """
+    drives = list(drives)
+    ids, marks, departments = _student_columns(student_ids)
+    results = {}
+    for drive, threshold in zip(drives, _thresholds(drives)):
+        fails = marks < threshold  # (n, 3): tenth, twelfth, cgpa
+        branches = allowed_branches(drive)
+        branch_fail = ~np.isin(departments, branches) if branches else np.zeros(len(ids), dtype=bool)
+        failed = np.column_stack([fails, branch_fail])
+        results[drive.id] = {
+            'total': len(ids),
+            'eligible': set(ids[~failed.any(axis=1)].tolist()),
+            'failures': {criterion: set(ids[failed[:, i]].tolist()) for i, criterion in enumerate(CRITERIA)},
+        }
+    return results
+
+
+def evaluate_student(student, drives):
+    """
+    One student against many drives at once: {drive_id: [reasons]}, where an
+    empty list means eligible.
+    """
+    drives = list(drives)
+    marks = np.array([student.tenth_marks or 0, student.twelfth_marks or 0, student.cgpa or 0], dtype=float)
+    fails = marks < _thresholds(drives)  # (drives, 3)
+    department = (student.department or '').strip().lower()
+
+    results = {}
+    for drive, row in zip(drives, fails):
+        reasons = [reason(criterion, drive) for criterion, failed in zip(CRITERIA, row) if failed]
+        branches = allowed_branches(drive)
+        if branches and department not in branches:
+            reasons.append(reason('branch', drive, student.department))
+        results[drive.id] = reasons
+    return results
+
+
+def eligible_counts(drives):
+    """{drive_id: number of approved students eligible} for the admin drive list."""
+    return {drive_id: len(result['eligible']) for drive_id, result in evaluate_drives(drives).items()}
+
+
+# -- Criteria preview ----------------------------------------------------------
+
+class StudentSnapshot:
+    """
+    The approved students' marks and departments as arrays, with each
+    department encoded as a small integer so per-department counts are a
+    single bincount. Built with one query; department_counts() over 20k
+    students is a few vectorised comparisons (well under a millisecond).
+    """
+
+    def __init__(self, ids, marks, departments):
+        self.ids = ids
+        self.marks = marks
+        self.built_at = time.monotonic()
+        codes, self.department_index = np.unique(departments, return_inverse=True)
+        self.codes = [str(code) for code in codes]
+        self.department_totals = np.bincount(self.department_index, minlength=len(self.codes))
+
+    @classmethod
+    def load(cls):
+        return cls(*_student_columns())
+
+    def counts(self, thresholds, branches=()):
+        mask = (self.marks >= thresholds).all(axis=1)
+        if branches:
+            allowed = np.isin(np.array(self.codes, dtype=object), branches)  # per department code
+            mask &= allowed[self.department_index]
+        return np.bincount(self.department_index[mask], minlength=len(self.codes))
+
+
+class SnapshotCache:
+    """
+    One StudentSnapshot per app, rebuilt after ELIGIBILITY_SNAPSHOT_TTL
+    seconds or when a commit changes an approved student's eligibility
+    (utils/eligibility_matrix.py calls invalidate()).
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.snapshot = None
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        snapshot = self.snapshot
+        if snapshot is not None and time.monotonic() - snapshot.built_at < self.ttl:
+            return snapshot
+        generation = self.generation
+        snapshot = StudentSnapshot.load()
+        with self.lock:
+            # An invalidation while loading means the snapshot may already be stale
+            if generation == self.generation:
+                self.snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.snapshot = None
+
+
+def init_eligibility_snapshot(app):
+    app.extensions['eligibility_snapshot'] = SnapshotCache(app.config.get('ELIGIBILITY_SNAPSHOT_TTL', 300))
+
+
+def snapshot_cache():
+    return current_app.extensions['eligibility_snapshot']
+
+
+def department_counts(drive):
+    """
+    Approved students eligible for a drive's criteria, by department:
+    {'total', 'eligible', 'departments': [{'department', 'total', 'eligible'}]}.
+    The drive need not be saved, so the form can preview unsaved criteria.
+    """
+    snapshot = snapshot_cache().get()
+    eligible = snapshot.counts(_thresholds([drive])[0], allowed_branches(drive))
+    return {
+        'total': len(snapshot.ids),
+        'eligible': int(eligible.sum()),
+        'departments': [{'department': code.upper(), 'total': int(total), 'eligible': int(count)}
+                        for code, total, count in zip(snapshot.codes, snapshot.department_totals, eligible)],
+    }
@@ -0,0 +1,210 @@
+"""
+Materialised student x drive eligibility (the drive_eligibility table).
+
+Rows exist for every approved student and every open drive (deadline not
+passed, or none). Pages read them instead of re-evaluating the criteria:
+one indexed lookup per student/drive, and grouped counts for the admin
+screens.
+
+The table is refreshed incrementally in the same transaction as the change
+that affects it. Session events collect what changed and the rows are
+rebuilt just before commit:
+  - a Student's marks, cgpa, backlogs, department or status changed
+    (profile edits, admin edits, handle_request approvals) -> that student
+  - a PlacementDrive created or its criteria/deadline changed -> that drive
+  - students or drives deleted -> their rows
+Bulk statements bypass the ORM, so bulk_import and the bulk status update
+call mark_students_stale() with the ids they wrote.
+
+rebuild_eligibility() recomputes everything (init_db.py runs it once).
+The same student changes also drop the in-memory snapshot behind the drive
+form's eligibility preview, once the commit has gone through.
+"""
+from datetime import datetime, date
+from flask import has_app_context
+from sqlalchemy import event, delete, insert, func, case, or_, inspect
+from sqlalchemy.orm import Session
+from models import Student, PlacementDrive, DriveEligibility
+from utils.eligibility import CRITERIA, evaluate_drives, evaluate_student, reason, snapshot_cache
+
+# Student columns that can change eligibility. Backlogs are not a drive
+# criterion yet but are tracked so adding one needs no change here.
+ELIGIBILITY_FIELDS = ('tenth_marks', 'twelfth_marks', 'cgpa', 'backlogs', 'department', 'status')
+DRIVE_FIELDS = ('criteria_10th', 'criteria_12th', 'criteria_cgpa', 'allowed_branches', 'deadline')
+
+
+def open_drives_filter():
+    return or_(PlacementDrive.deadline.is_(None), PlacementDrive.deadline >= date.today())
+
+
+def _rows(results, now):
+    for drive_id, result in results.items():
+        failed_by = {}
+        for criterion in CRITERIA:
+            for sid in result['failures'][criterion]:
+                failed_by.setdefault(sid, []).append(criterion)
+        for sid in result['eligible']:
+            yield {'student_id': sid, 'drive_id': drive_id, 'eligible': True, 'reasons': None, 'updated_at': now}
+        for sid, codes in failed_by.items():
+            yield {'student_id': sid, 'drive_id': drive_id, 'eligible': False, 'reasons': ','.join(codes),
+                   'updated_at': now}
+
+
+def _write(session, results, batch_size=5000):
+    rows = list(_rows(results, datetime.utcnow()))
+    for start in range(0, len(rows), batch_size):
+        session.execute(insert(DriveEligibility), rows[start:start + batch_size])
+    return len(rows)
+
+
+def refresh_drives(session, drive_ids):
+    """Recompute the rows of the given drives for every approved student."""
+    drive_ids = list(drive_ids)
+    session.execute(delete(DriveEligibility).where(DriveEligibility.drive_id.in_(drive_ids)))
+    drives = session.query(PlacementDrive).filter(PlacementDrive.id.in_(drive_ids), open_drives_filter()).all()
+    return _write(session, evaluate_drives(drives)) if drives else 0
+
+
+def refresh_students(session, student_ids, batch_size=1000):
+    """Recompute the given students' rows against every open drive."""
+    student_ids = sorted(student_ids)
+    drives = session.query(PlacementDrive).filter(open_drives_filter()).all()
+    written = 0
+    for start in range(0, len(student_ids), batch_size):
+        ids = student_ids[start:start + batch_size]
+        session.execute(delete(DriveEligibility).where(DriveEligibility.student_id.in_(ids)))
+        if drives:
+            written += _write(session, evaluate_drives(drives, student_ids=ids))
+    return written
+
+
+def rebuild_eligibility(session):
+    session.execute(delete(DriveEligibility))
+    drives = session.query(PlacementDrive).filter(open_drives_filter()).all()
+    return _write(session, evaluate_drives(drives)) if drives else 0
+
+
+def mark_students_stale(student_ids, session=None):
+    """For bulk writes that bypass the ORM: refresh these students at commit."""
+    from extensions import db
+    session = session or db.session()
+    session.info.setdefault('eligibility_students', set()).update(student_ids)
+
+
+# -- Reading -----------------------------------------------------------------
+
+def student_eligibility(student, drives):
+    """
+    {drive_id: [reasons]} for one student (empty list = eligible), from the
+    table. Drives without a row yet (e.g. created before the table existed)
+    are evaluated directly.
+    """
+    drives = list(drives)
+    rows = dict(DriveEligibility.query.with_entities(DriveEligibility.drive_id, DriveEligibility.reasons)
+                .filter(DriveEligibility.student_id == student.id,
+                        DriveEligibility.drive_id.in_([d.id for d in drives])))
+    missing = [d for d in drives if d.id not in rows]
+    result = evaluate_student(student, missing) if missing else {}
+    for drive in drives:
+        if drive.id in rows:
+            codes = rows[drive.id].split(',') if rows[drive.id] else []
+            result[drive.id] = [reason(code, drive, student.department) for code in codes]
+    return result
+
+
+def eligible_counts(drives):
+    """{drive_id: eligible approved students}, from grouped counts over the table."""
+    drives = list(drives)
+    counts = {drive_id: int(eligible or 0) for drive_id, eligible in
+              DriveEligibility.query.with_entities(DriveEligibility.drive_id,
+                                                   func.sum(case((DriveEligibility.eligible, 1), else_=0)))
+              .filter(DriveEligibility.drive_id.in_([d.id for d in drives]))
+              .group_by(DriveEligibility.drive_id)}
+    # Closed or not yet materialised drives fall back to the live engine
+    missing = [d for d in drives if d.id not in counts]
+    if missing:
+        from utils.eligibility import eligible_counts as live_counts
+        counts.update(live_counts(missing))
+    return {d.id: counts.get(d.id, 0) for d in drives}
+
+
+def drive_forecast(drive):
+    """Eligible count plus failures per criterion for one drive (same shape as evaluate_drives)."""
+    rows = DriveEligibility.query.with_entities(DriveEligibility.student_id, DriveEligibility.eligible,
+                                                DriveEligibility.reasons) \
+        .filter(DriveEligibility.drive_id == drive.id).all()
+    if not rows:
+        return evaluate_drives([drive])[drive.id]
+    failures = {criterion: set() for criterion in CRITERIA}
+    for sid, eligible, reasons in rows:
+        for code in (reasons or '').split(','):
+            if code:
+                failures[code].add(sid)
+    return {'total': len(rows), 'eligible': {sid for sid, eligible, _ in rows if eligible}, 'failures': failures}
+
+
+# -- Change tracking ------------------------------------------------------------
+
+def _changed(obj, fields):
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_changes(session, flush_context, instances):
+    students = session.info.setdefault('eligibility_students', set())
+    drives = session.info.setdefault('eligibility_drives', set())
+    for obj in session.dirty:
+        if isinstance(obj, Student) and _changed(obj, ELIGIBILITY_FIELDS):
+            students.add(obj)
+        elif isinstance(obj, PlacementDrive) and _changed(obj, DRIVE_FIELDS):
+            drives.add(obj)
+    for obj in session.new:
+        if isinstance(obj, Student):
+            students.add(obj)
+        elif isinstance(obj, PlacementDrive):
+            drives.add(obj)
+    for obj in session.deleted:
+        if isinstance(obj, (Student, PlacementDrive)):
+            session.info.setdefault('eligibility_deleted', []).append(obj)
+
+
+@event.listens_for(Session, 'before_commit')
+def _refresh_before_commit(session):
+    if not has_app_context():
+        return
+    # commit() only flushes after this hook, so flush now to collect the pending changes
+    session.flush()
+    info = session.info
+    if not (info.get('eligibility_students') or info.get('eligibility_drives') or info.get('eligibility_deleted')):
+        return
+
+    deleted = info.pop('eligibility_deleted', [])
+    student_ids = {s.id for s in deleted if isinstance(s, Student)}
+    drive_ids = {d.id for d in deleted if isinstance(d, PlacementDrive)}
+    if student_ids:
+        session.execute(delete(DriveEligibility).where(DriveEligibility.student_id.in_(student_ids)))
+    if drive_ids:
+        session.execute(delete(DriveEligibility).where(DriveEligibility.drive_id.in_(drive_ids)))
+
+    # Entries are instances (ORM changes, ids assigned by the flush) or plain ids (bulk writes)
+    stale_students = {getattr(s, 'id', s) for s in info.pop('eligibility_students', ())} - student_ids
+    stale_drives = {getattr(d, 'id', d) for d in info.pop('eligibility_drives', ())} - drive_ids
+    if stale_drives:
+        refresh_drives(session, stale_drives)
+    if stale_students:
+        refresh_students(session, stale_students)
+    if stale_students or student_ids:
+        info['eligibility_snapshot_stale'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _drop_snapshot(session):
+    if session.info.pop('eligibility_snapshot_stale', False) and has_app_context():
+        snapshot_cache().invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    for key in ('eligibility_students', 'eligibility_drives', 'eligibility_deleted', 'eligibility_snapshot_stale'):
+        session.info.pop(key, None)
@@ -1,19 +1,238 @@
 import os
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from flask import current_app
 from extensions import mail
 from flask_mail import Message
 
-def send_email(subject, recipients, body, html=None):
+RESEND_URL = 'https://api.resend.com/emails'
+BREVO_URL = 'https://api.brevo.com/v3/smtp/email'
+
+# Statuses retried in place. Only 429 is safe: the provider refused the
+# message. After a 5xx it may still have sent it, so those are left to the
+# outbox's own retries rather than re-POSTed here.
+RETRY_STATUSES = (429,)
+
+# Prefix of the error returned when the provider still answers 429 after retries
+RATE_LIMITED_ERROR = 'Rate limited by provider.'
+
+
+def is_rate_limited(error):
+    return bool(error) and error.startswith(RATE_LIMITED_ERROR)
+
+
+def detect_provider(api_token, api_url):
     """
-    Send email using either SMTP (Flask-Mail) or HTTP API (e.g. Mailtrap/Resend/Brevo)
-    based on configuration.
+    Work out which API provider a token belongs to. Returns (provider, api_url)
+    with provider one of 'resend', 'brevo' or 'other' (Mailtrap / generic).
     """
-    
-    # Check for API Token - if present, prefer API (for Production/Railway)
-    api_token = current_app.config.get('MAIL_API_TOKEN')
-    api_url = current_app.config.get('MAIL_API_URL')
-    
+    # Smart Auto-Detection for Resend / Brevo
+    # Resend keys typically start with 're_'
+    # Brevo keys typically start with 'xkeysib-'
+    api_url = api_url or ''
+
+    # If token looks like Resend but URL is default (Mailtrap), switch to Resend URL automatically
+    if api_token.startswith('re_') and 'resend.com' not in api_url:
+        print("DEBUG: Detected Resend Token URL. Switching to Resend API URL.")
+        return 'resend', RESEND_URL
+
+    # If token looks like Brevo but URL is default, switch to Brevo
+    if api_token.startswith('xkeysib-') and 'brevo.com' not in api_url:
+        print("DEBUG: Detected Brevo Token. Switching to Brevo API URL.")
+        return 'brevo', BREVO_URL
+
+    if 'resend.com' in api_url or api_token.startswith('re_'):
+        return 'resend', api_url
+    if 'brevo.com' in api_url or api_token.startswith('xkeysib-'):
+        return 'brevo', api_url
+    return 'other', api_url
+
+
+class FakeMailbox:
+    """
+    Offline stand-in for a provider (MAIL_PROVIDER = 'fake'). Messages are
+    kept in memory; fail() makes the next sends fail, for exercising retries.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.failures = []
+        self._lock = threading.Lock()
+
+    def fail(self, times=1, error='Simulated provider failure'):
+        with self._lock:
+            self.failures.extend([error] * times)
+
+    def send(self, subject, recipients, body, html=None):
+        with self._lock:
+            if self.failures:
+                return False, self.failures.pop(0)
+            self.messages.append({'subject': subject, 'to': list(recipients), 'body': body, 'html': html})
+        return True, "Email stored by fake provider."
+
+
+class MailTransport:
+    """
+    Outbound mail settings resolved once per app, plus a pooled keep-alive
+    HTTP session for the API providers. Connections are reused across
+    messages, every request has connect/read timeouts, and connection
+    failures and 429 responses are retried with exponential backoff
+    (honouring Retry-After). Anything after the request was sent (read
+    timeouts, 5xx) is not retried here, as the email may have gone out.
+    """
+
+    def __init__(self, config):
+        self.api_token = config.get('MAIL_API_TOKEN')
+        self.sender_email = config.get('MAIL_DEFAULT_SENDER') or os.getenv('MAIL_USERNAME')
+        self.timeout = (config.get('MAIL_API_CONNECT_TIMEOUT', 5), config.get('MAIL_API_READ_TIMEOUT', 30))
+        self.pool_size = config.get('MAIL_API_POOL_SIZE', 10)
+        self.retries = config.get('MAIL_API_RETRIES', 3)
+        self.backoff = config.get('MAIL_API_RETRY_BACKOFF', 0.5)
+
+        self.fake = None
+        if config.get('MAIL_PROVIDER') == 'fake':
+            self.provider, self.api_url = 'fake', None
+            self.fake = FakeMailbox()
+        elif self.api_token:
+            self.provider, self.api_url = detect_provider(self.api_token, config.get('MAIL_API_URL'))
+        else:
+            self.provider, self.api_url = 'smtp', None
+
+        self.resend_sender = None
+        if self.provider == 'resend':
+            self.resend_sender = "onboarding@resend.dev" # Default safe sender
+
+            # Check if user provided sender is safe (not a public domain that requires verification)
+            # If they have a custom domain verified, they should use it.
+            # If they try to use gmail/yahoo, it will fail, so we force the default.
+            unsafe_domains = ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com']
+            if self.sender_email:
+                domain = self.sender_email.split('@')[-1].lower() if '@' in self.sender_email else ''
+                if domain and domain not in unsafe_domains:
+                    self.resend_sender = self.sender_email
+                else:
+                    print(f"WARN: Sender '{self.sender_email}' is a public domain. Forcing 'onboarding@resend.dev' for Resend compatibility.")
+
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+        self.retry_after = None  # from the provider's last 429
+
+    @property
+    def provider_name(self):
+        return {'resend': 'Resend', 'brevo': 'Brevo', 'smtp': 'SMTP', 'fake': 'Fake'}.get(self.provider, 'Other')
+
+    @property
+    def session(self):
+        # One session per process: pooled sockets must not be shared across a fork.
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    retry = Retry(
+                        total=self.retries,
+                        connect=self.retries,
+                        read=0,
+                        other=0,
+                        status=self.retries,
+                        backoff_factor=self.backoff,
+                        status_forcelist=RETRY_STATUSES,
+                        allowed_methods=frozenset(['POST']),
+                        respect_retry_after_header=True,
+                        raise_on_status=False,
+                    )
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                                          max_retries=retry)
+                    session = requests.Session()
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session, self._session_pid = session, os.getpid()
+        return self._session
+
+    def headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.provider == 'brevo':
+            headers["api-key"] = self.api_token
+        else:
+            headers["Authorization"] = f"Bearer {self.api_token}"
+        return headers
+
+    def post(self, payload, url=None):
+        return self.session.post(url or self.api_url, json=payload, headers=self.headers(),
+                                 timeout=self.timeout)
+
+    def note_rate_limited(self, response):
+        """Remember the provider's Retry-After for the scheduler; returns the error message."""
+        try:
+            self.retry_after = float(response.headers.get('Retry-After') or 1)
+        except (TypeError, ValueError):
+            self.retry_after = 1.0
+        error_msg = f"{RATE_LIMITED_ERROR} Status: 429, Response: {response.text}"
+        print(f"ERROR: {error_msg}")
+        return error_msg
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+def init_mail_transport(app):
+    """Resolve the mail provider once at startup and attach the transport to the app."""
+    transport = MailTransport(app.config)
+    app.extensions['mail_transport'] = transport
+    print(f"DEBUG: Outbound email provider: {transport.provider_name}")
+    return transport
+
+
+def get_transport():
+    transport = current_app.extensions.get('mail_transport')
+    if transport is None:
+        # Apps not built through create_app (e.g. one-off scripts)
+        transport = init_mail_transport(current_app._get_current_object())
+    return transport
+
+
+def build_payload(transport, subject, recipients, body, html=None):
+    """Provider specific JSON body for a single message."""
+    if transport.provider == 'resend':
+        return {
+            "from": transport.resend_sender,
+            "to": recipients,
+            "subject": subject,
+            "text": body,
+            "html": html or body
+        }
+
+    if transport.provider == 'brevo':
+        # Brevo (Sendinblue) Specific Logic
+        # https://developers.brevo.com/reference/sendtransacemail
+
+        # Brevo requires 'sender' object {name, email}
+        # 'to' is list of objects [{email: "..."}]
+        return {
+            "sender": {
+                "name": "TPO Portal",
+                "email": transport.sender_email
+            },
+            "to": [{"email": r} for r in recipients],
+            "subject": subject,
+            "htmlContent": html or body,
+            "textContent": body
+        }
+
+    # Mailtrap / Default Logic
+    return {
+        "from": {"email": transport.sender_email, "name": "TPO Portal"},
+        "to": [{"email": r} for r in recipients],
+        "subject": subject,
+        "text": body,
+        "html": html or body
+    }
+
+
+def _apply_override(subject, recipients):
     # Check for Override Recipient (Testing/Sandbox)
     override_email = current_app.config.get('MAIL_OVERRIDE_RECIPIENT')
     if override_email:
@@ -21,108 +240,48 @@ def send_email(subject, recipients, body, html=None):
         subject = f"[TEST OVERRIDE -> {original_recipients}] {subject}"
         recipients = [override_email]
         print(f"DEBUG: Email Override Enabled. Redirecting to {override_email}")
-    
-    
-    if api_token:
+    return subject, recipients
+
+
+def send_email(subject, recipients, body, html=None):
+    """
+    Send email using either SMTP (Flask-Mail) or HTTP API (e.g. Mailtrap/Resend/Brevo)
+    based on configuration.
+    """
+
+    # API token present at startup -> API (for Production/Railway), otherwise SMTP
+    transport = get_transport()
+
+    subject, recipients = _apply_override(subject, recipients)
+    return _send_single(transport, subject, recipients, body, html)
+
+
+def _send_single(transport, subject, recipients, body, html=None):
+    if transport.provider == 'fake':
+        return transport.fake.send(subject, recipients, body, html)
+
+    if transport.provider != 'smtp':
         try:
-            # Smart Auto-Detection for Resend / Brevo
-            # Resend keys typically start with 're_'
-            # Brevo keys typically start with 'xkeysib-'
-            is_resend = 'resend.com' in api_url or api_token.startswith('re_')
-            is_brevo = 'brevo.com' in api_url or api_token.startswith('xkeysib-')
-            
-            # If token looks like Resend but URL is default (Mailtrap), switch to Resend URL automatically
-            if api_token.startswith('re_') and 'resend.com' not in api_url:
-                print("DEBUG: Detected Resend Token URL. Switching to Resend API URL.")
-                api_url = 'https://api.resend.com/emails'
-                is_resend = True
-                is_brevo = False
-            
-            # If token looks like Brevo but URL is default, switch to Brevo
-            if api_token.startswith('xkeysib-') and 'brevo.com' not in api_url:
-                 print("DEBUG: Detected Brevo Token. Switching to Brevo API URL.")
-                 api_url = 'https://api.brevo.com/v3/smtp/email'
-                 is_brevo = True
-                 is_resend = False
-
-            provider_name = 'Resend' if is_resend else ('Brevo' if is_brevo else 'Other')
-            print(f"DEBUG: Attempting to send email via API to {recipients}. Provider: {provider_name}")
-            
-            sender_email = current_app.config.get('MAIL_DEFAULT_SENDER') or os.getenv('MAIL_USERNAME')
-            
-            headers = {
-                "Content-Type": "application/json"
-            }
+            print(f"DEBUG: Attempting to send email via API to {recipients}. Provider: {transport.provider_name}")
+
+            payload = build_payload(transport, subject, recipients, body, html)
+            response = transport.post(payload)
 
-            if is_resend:
-                # Resend Specific Logic
-                final_sender = "onboarding@resend.dev" # Default safe sender
-                
-                # Check if user provided sender is safe (not a public domain that requires verification)
-                # If they have a custom domain verified, they should use it.
-                # If they try to use gmail/yahoo, it will fail, so we force the default.
-                unsafe_domains = ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com']
-                if sender_email:
-                    domain = sender_email.split('@')[-1].lower() if '@' in sender_email else ''
-                    if domain and domain not in unsafe_domains:
-                        final_sender = sender_email
-                    else:
-                        print(f"WARN: Sender '{sender_email}' is a public domain. Forcing 'onboarding@resend.dev' for Resend compatibility.")
-                
-                payload = {
-                    "from": final_sender,
-                    "to": recipients,
-                    "subject": subject,
-                    "text": body,
-                    "html": html or body
-                }
-                headers["Authorization"] = f"Bearer {api_token}"
-
-            elif is_brevo:
-                 # Brevo (Sendinblue) Specific Logic
-                 # https://developers.brevo.com/reference/sendtransacemail
-                 
-                 # Brevo requires 'sender' object {name, email}
-                 # 'to' is list of objects [{email: "..."}]
-                 
-                 payload = {
-                     "sender": {
-                         "name": "TPO Portal", 
-                         "email": sender_email
-                     },
-                     "to": [{"email": r} for r in recipients],
-                     "subject": subject,
-                     "htmlContent": html or body,
-                     "textContent": body
-                 }
-                 headers["api-key"] = api_token
-                
-            else:
-                # Mailtrap / Default Logic
-                payload = {
-                    "from": {"email": sender_email, "name": "TPO Portal"},
-                    "to": [{"email": r} for r in recipients],
-                    "subject": subject,
-                    "text": body,
-                    "html": html or body
-                }
-                headers["Authorization"] = f"Bearer {api_token}"
-            
-            response = requests.post(api_url, json=payload, headers=headers)
-            
             if response.status_code in [200, 201, 202]:
                 print(f"SUCCESS: Email sent via API. ID: {response.text}")
                 return True, "Email sent successfully."
+            elif response.status_code == 429:
+                return False, transport.note_rate_limited(response)
             else:
                 error_msg = f"API Sending failed. Status: {response.status_code}, Response: {response.text}"
                 print(f"ERROR: {error_msg}")
                 return False, error_msg
-                
+
         except Exception as e:
             error_msg = f"API Email sending error: {str(e)}"
             print(f"EXCEPTION: {error_msg}")
             return False, error_msg
-            
+
     else:
         # Fallback to SMTP (Flask-Mail) - Default for Localhost
         try:
@@ -139,3 +298,100 @@ def send_email(subject, recipients, body, html=None):
             error_msg = f"SMTP Email sending error: {str(e)}"
             print(f"ERROR: {error_msg}")
             return False, error_msg
+
+
+# Largest batch each provider accepts in one request
+PROVIDER_BATCH_LIMITS = {'resend': 100, 'brevo': 1000}
+
+
+def _resend_batch_url(transport):
+    base = transport.api_url if transport.api_url.rstrip('/').endswith('/emails') else RESEND_URL
+    return base.rstrip('/') + '/batch'
+
+
+def _send_api_batch(transport, messages):
+    """One provider request for the whole group; it succeeds or fails as a unit."""
+    if transport.provider == 'resend':
+        payload = [build_payload(transport, m['subject'], m['recipients'], m['body'], m.get('html'))
+                   for m in messages]
+        url = _resend_batch_url(transport)
+    else:
+        # Brevo: one request, one personalised "message version" per recipient
+        payload = build_payload(transport, messages[0]['subject'], messages[0]['recipients'],
+                                messages[0]['body'], messages[0].get('html'))
+        del payload['to']
+        payload['messageVersions'] = [
+            {
+                "to": [{"email": r} for r in m['recipients']],
+                "subject": m['subject'],
+                "htmlContent": m.get('html') or m['body'],
+                "textContent": m['body'],
+            }
+            for m in messages
+        ]
+        url = None
+
+    try:
+        response = transport.post(payload, url=url)
+    except Exception as e:
+        error_msg = f"API Email batch error: {str(e)}"
+        print(f"EXCEPTION: {error_msg}")
+        return [(False, error_msg)] * len(messages)
+
+    if response.status_code in [200, 201, 202]:
+        print(f"SUCCESS: Batch of {len(messages)} emails sent via {transport.provider_name}.")
+        return [(True, "Email sent successfully.")] * len(messages)
+    if response.status_code == 429:
+        return [(False, transport.note_rate_limited(response))] * len(messages)
+    error_msg = f"API Batch sending failed. Status: {response.status_code}, Response: {response.text}"
+    print(f"ERROR: {error_msg}")
+    return [(False, error_msg)] * len(messages)
+
+
+def _send_smtp_batch(messages):
+    """All messages over one SMTP connection instead of a login per message."""
+    results = []
+    try:
+        with mail.connect() as conn:
+            for m in messages:
+                try:
+                    conn.send(Message(subject=m['subject'], recipients=m['recipients'],
+                                      body=m['body'], html=m.get('html')))
+                    results.append((True, "Email sent successfully via SMTP."))
+                except Exception as e:
+                    results.append((False, f"SMTP Email sending error: {str(e)}"))
+    except Exception as e:
+        error_msg = f"SMTP connection error: {str(e)}"
+        print(f"ERROR: {error_msg}")
+        results += [(False, error_msg)] * (len(messages) - len(results))
+    return results
+
+
+def send_batch(messages):
+    """
+    Send many personalised messages, grouping them into as few provider
+    calls as possible: Resend's batch endpoint, Brevo messageVersions, or a
+    single SMTP connection. messages is a list of dicts with subject,
+    recipients, body and optional html. Returns a (success, info) pair per
+    message, in order.
+    """
+    transport = get_transport()
+    prepared = []
+    for m in messages:
+        subject, recipients = _apply_override(m['subject'], list(m['recipients']))
+        prepared.append(dict(m, subject=subject, recipients=recipients))
+    messages = prepared
+
+    if transport.provider == 'fake':
+        return [transport.fake.send(m['subject'], m['recipients'], m['body'], m.get('html')) for m in messages]
+    if transport.provider == 'smtp':
+        return _send_smtp_batch(messages)
+    if transport.provider not in PROVIDER_BATCH_LIMITS:
+        # No batch endpoint: still one pooled keep-alive connection for all of them
+        return [_send_single(transport, m['subject'], m['recipients'], m['body'], m.get('html')) for m in messages]
+
+    size = min(current_app.config.get('MAIL_BATCH_SIZE', 100), PROVIDER_BATCH_LIMITS[transport.provider])
+    results = []
+    for start in range(0, len(messages), size):
+        results += _send_api_batch(transport, messages[start:start + size])
+    return results
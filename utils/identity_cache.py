@@ -0,0 +1,217 @@
+"""
+Identity cache for Flask-Login's user_loader.
+
+Every authenticated request used to SELECT the user row, and the student
+pages then walked current_user.applications / quiz attempts to work out
+which drives and quizzes the student already has. The loader now keeps a
+detached snapshot of the user row, plus those derived id sets, for
+IDENTITY_CACHE_TTL seconds. A cache hit is merged into the request's
+session with load=False, so it is a normal persistent object (edits and
+lazy relationships still work) but costs no query.
+
+Entries are dropped as soon as a transaction that touched the user commits:
+ORM flushes of Student/AdminUser, JobApplication and QuizAttempt rows mark
+their owner stale, and bulk INSERT/UPDATE/DELETE statements on those tables
+(imports, bulk approvals) clear the whole cache. The cache is per process,
+so with several workers another process may serve a stale row for at most
+the TTL. IDENTITY_CACHE_TTL = 0 turns it off; the derived sets are then
+still computed at most once per request.
+"""
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from extensions import db
+from models import Student, AdminUser, JobApplication, QuizAttempt
+
+_MODELS = {'S': Student, 'A': AdminUser}
+_WATCHED = (Student, AdminUser, JobApplication, QuizAttempt)
+
+
+class _Entry:
+    __slots__ = ('user', 'derived', 'expires')
+
+    def __init__(self, user, expires):
+        self.user = user
+        self.derived = {}
+        self.expires = expires
+
+
+class IdentityCache:
+    """TTL + LRU map of 'S-12' style ids to cached users, one per app."""
+
+    def __init__(self, ttl, size):
+        self.ttl = ttl
+        self.size = size
+        self.entries = OrderedDict()
+        self.generation = 0  # bumped on every invalidation, so in-flight loads don't store old data
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, user, generation):
+        if not self.ttl:
+            return
+        entry = _Entry(_snapshot(user), time.monotonic() + self.ttl)
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[key] = entry
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def discard(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+            self.generation += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+
+def init_identity_cache(app):
+    app.extensions['identity_cache'] = IdentityCache(app.config.get('IDENTITY_CACHE_TTL', 0),
+                                                     app.config.get('IDENTITY_CACHE_SIZE', 5000))
+
+
+def _cache():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('identity_cache')
+
+
+def _snapshot(user):
+    """Detached copy of the user's column values, safe to share between sessions."""
+    mapper = db.inspect(type(user))
+    copy = type(user)(**{attr.key: getattr(user, attr.key) for attr in mapper.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+
+def load_identity(user_id):
+    """user_loader body: the user for a session id like 'S-12', from the cache when fresh."""
+    try:
+        prefix, real_id = user_id.split('-', 1)
+        model = _MODELS[prefix]
+        real_id = int(real_id)
+    except (KeyError, ValueError):
+        return None
+
+    cache = _cache()
+    entry = cache.get(user_id) if cache else None
+    if entry is not None:
+        return db.session.merge(entry.user, load=False)
+
+    generation = cache.generation if cache else 0
+    user = db.session.get(model, real_id)
+    if user is not None and cache:
+        cache.put(user_id, user, generation)
+    return user
+
+
+def invalidate_identity(user_or_key):
+    """Drop one user's cached row and derived sets (pass the user or its get_id() key)."""
+    key = user_or_key if isinstance(user_or_key, str) else user_or_key.get_id()
+    cache = _cache()
+    if cache:
+        cache.discard([key])
+
+
+def _derived(student, name, compute):
+    # Request-level memo first, then the TTL entry, then the database
+    key = student.get_id()
+    memo = g.setdefault('_identity_derived', {})
+    if (key, name) in memo:
+        return memo[key, name]
+
+    cache = _cache()
+    entry = cache.get(key) if cache else None
+    if entry is not None and name in entry.derived:
+        value = entry.derived[name]
+    else:
+        generation = cache.generation if cache else 0
+        value = frozenset(compute())
+        if entry is not None:
+            with cache.lock:
+                if generation == cache.generation and cache.entries.get(key) is entry:
+                    entry.derived[name] = value
+    memo[key, name] = value
+    return value
+
+
+def applied_drive_ids(student):
+    """Ids of the drives the student has applied to."""
+    return _derived(student, 'applied_drive_ids', lambda: (
+        drive_id for (drive_id,) in
+        db.session.query(JobApplication.drive_id).filter(JobApplication.student_id == student.id)))
+
+
+def attempted_quiz_ids(student):
+    """Ids of the quizzes the student has already attempted."""
+    return _derived(student, 'attempted_quiz_ids', lambda: (
+        quiz_id for (quiz_id,) in
+        db.session.query(QuizAttempt.quiz_id).filter(QuizAttempt.student_id == student.id)))
+
+
+def _owner_key(obj):
+    if isinstance(obj, (Student, AdminUser)):
+        return obj.get_id() if obj.id is not None else None
+    if isinstance(obj, (JobApplication, QuizAttempt)) and obj.student_id is not None:
+        return f"S-{obj.student_id}"
+    return None
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_stale(session, flush_context):
+    keys = {key for key in map(_owner_key, list(session.new) + list(session.dirty) + list(session.deleted)) if key}
+    if not keys:
+        return
+    session.info.setdefault('identity_stale', set()).update(keys)
+    # Derived sets memoised earlier in this request are stale too
+    if has_app_context() and '_identity_derived' in g:
+        for cached in [k for k in g._identity_derived if k[0] in keys]:
+            del g._identity_derived[cached]
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, _WATCHED):
+        orm_execute_state.session.info['identity_clear_all'] = True
+        if has_app_context():
+            g.pop('_identity_derived', None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    stale = session.info.pop('identity_stale', None)
+    clear_all = session.info.pop('identity_clear_all', False)
+    cache = _cache()
+    if cache is None:
+        return
+    if clear_all:
+        cache.clear()
+    elif stale:
+        cache.discard(stale)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('identity_stale', None)
+    session.info.pop('identity_clear_all', None)
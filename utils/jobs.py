@@ -0,0 +1,244 @@
+"""
+Background jobs with the database as the queue.
+
+Routes call enqueue_job(); worker threads started inside the web process
+(JOB_WORKER_THREADS) or a separate `python job_worker.py` process claim
+queued rows and run the handler registered for the job type with
+@job_handler. No external broker is needed: claiming is a conditional
+UPDATE ... WHERE status = 'Queued', which works the same on SQLite and
+Postgres.
+
+While a handler runs, a timer thread refreshes the job's heartbeat every
+JOB_HEARTBEAT_INTERVAL, so only jobs whose worker died are reaped as stale.
+The uploaded input (the 'path' param) is deleted when the job ends or is
+reaped; generated artifacts are deleted JOB_ARTIFACT_TTL after the job
+finished.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from werkzeug.utils import secure_filename
+from extensions import db
+from models import BackgroundJob
+
+JOB_HANDLERS = {}
+
+_workers = []
+_workers_pid = None
+_workers_lock = threading.Lock()
+
+
+def job_handler(job_type):
+    """Register func(job) as the handler for job_type. Its return value is stored as the job result."""
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return decorator
+
+
+class JobContext:
+    """What a handler gets: the job params plus progress and artifact reporting."""
+
+    def __init__(self, job):
+        self.id = job.id
+        self.params = json.loads(job.params) if job.params else {}
+        self.artifact = None
+
+    def set_progress(self, percent):
+        db.session.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == self.id)
+            .values(progress=min(max(percent, 0.0), 100.0), heartbeat_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def save_artifact(self, data, filename, mimetype):
+        folder = current_app.config['JOB_ARTIFACT_FOLDER']
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{self.id}_{secure_filename(filename)}")
+        if hasattr(data, 'getvalue'):
+            data = data.getvalue()
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.artifact = (path, filename, mimetype)
+
+
+def enqueue_job(job_type, params=None, created_by=None):
+    job = BackgroundJob(job_type=job_type, params=json.dumps(params or {}), created_by=created_by)
+    db.session.add(job)
+    db.session.commit()
+    start_workers(current_app._get_current_object())
+    return job
+
+
+def _remove_file(path):
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _remove_upload(params):
+    """Delete the uploaded file a job was given (the 'path' param), once nothing will read it again."""
+    params = json.loads(params) if isinstance(params, str) else (params or {})
+    _remove_file(params.get('path'))
+
+
+class _Heartbeat:
+    """Refreshes a running job's heartbeat_at on a timer, on its own connection."""
+
+    def __init__(self, job_id, interval):
+        self.job_id = job_id
+        self.interval = interval
+        self.engine = db.engine
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"job-heartbeat-{job_id}", daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(update(BackgroundJob).where(BackgroundJob.id == self.job_id,
+                                                             BackgroundJob.status == 'Running')
+                                 .values(heartbeat_at=datetime.utcnow()))
+            except Exception as e:
+                print(f"ERROR: Heartbeat for job {self.job_id}: {e}")
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+
+def _fail_stale_jobs():
+    # A Running job whose worker died never finishes; fail it instead of leaving it hanging
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=current_app.config['JOB_STALE_SECONDS'])
+    stale = db.session.query(BackgroundJob.id, BackgroundJob.params) \
+        .filter(BackgroundJob.status == 'Running', BackgroundJob.heartbeat_at < cutoff).all()
+    if stale:
+        db.session.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id.in_([job_id for job_id, _ in stale]), BackgroundJob.status == 'Running')
+            .values(status='Failed', error_message='Worker stopped before the job finished.', finished_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        for _, params in stale:
+            _remove_upload(params)
+
+    # Generated files are kept for download for JOB_ARTIFACT_TTL, then removed
+    expired = db.session.query(BackgroundJob.id, BackgroundJob.artifact_path) \
+        .filter(BackgroundJob.artifact_path.isnot(None),
+                BackgroundJob.finished_at < now - timedelta(seconds=current_app.config['JOB_ARTIFACT_TTL'])).all()
+    if expired:
+        for _, path in expired:
+            _remove_file(path)
+        db.session.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id.in_([job_id for job_id, _ in expired]))
+            .values(artifact_path=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+
+def _claim_next():
+    _fail_stale_jobs()
+    queued = db.session.query(BackgroundJob.id).filter_by(status='Queued')\
+                       .order_by(BackgroundJob.id).limit(5).all()
+    for (job_id,) in queued:
+        now = datetime.utcnow()
+        claimed = db.session.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id, BackgroundJob.status == 'Queued')
+            .values(status='Running', started_at=now, heartbeat_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(BackgroundJob, job_id)
+    return None
+
+
+def run_next_job():
+    """Claim and run one queued job. Returns False if the queue was empty."""
+    job = _claim_next()
+    if job is None:
+        return False
+
+    ctx = JobContext(job)
+    try:
+        handler = JOB_HANDLERS.get(job.job_type)
+        if handler is None:
+            raise ValueError(f"No handler registered for job type '{job.job_type}'.")
+        with _Heartbeat(ctx.id, current_app.config['JOB_HEARTBEAT_INTERVAL']):
+            result = handler(ctx)
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(BackgroundJob, ctx.id)
+        job.status = 'Failed'
+        job.error_message = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        print(f"ERROR: Job {ctx.id} ({job.job_type}) failed: {e}")
+        return True
+    finally:
+        _remove_upload(ctx.params)
+
+    job = db.session.get(BackgroundJob, ctx.id)
+    job.status = 'Completed'
+    job.progress = 100.0
+    job.result = json.dumps(result) if result is not None else None
+    if ctx.artifact:
+        job.artifact_path, job.artifact_name, job.artifact_mimetype = ctx.artifact
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return True
+
+
+def _worker_loop(app, stop_event=None):
+    interval = app.config['JOB_POLL_INTERVAL']
+    while stop_event is None or not stop_event.is_set():
+        try:
+            with app.app_context():
+                ran = run_next_job()
+                db.session.remove()
+        except Exception as e:
+            print(f"ERROR: Job worker loop: {e}")
+            ran = False
+        if not ran:
+            time.sleep(interval)
+
+
+def start_workers(app):
+    """Start the in-process worker threads once per process (no-op if JOB_WORKER_THREADS is 0)."""
+    global _workers_pid
+    count = app.config['JOB_WORKER_THREADS']
+    if count <= 0:
+        return
+    with _workers_lock:
+        # Threads don't survive a fork (e.g. gunicorn workers), so track the owning pid
+        if _workers_pid == os.getpid() and any(t.is_alive() for t in _workers):
+            return
+        _workers.clear()
+        _workers_pid = os.getpid()
+        for i in range(count):
+            t = threading.Thread(target=_worker_loop, args=(app,), name=f"job-worker-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+
+
+def run_worker(app):
+    """Blocking worker loop for a dedicated worker process."""
+    print(f"Job worker started (pid {os.getpid()}), polling every {app.config['JOB_POLL_INTERVAL']}s")
+    _worker_loop(app)
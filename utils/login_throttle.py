@@ -0,0 +1,208 @@
+"""
+Login throttling that runs before the bcrypt check.
+
+Failed logins are counted in a sliding window (LOGIN_THROTTLE_WINDOW
+seconds) under two keys: the account ('S:<roll_no>' / 'A:<username>') and
+the client address ('ip:<addr>', only when LOGIN_THROTTLE_MAX_PER_ADDRESS
+is set; see TRUSTED_PROXY_COUNT). Once either key has reached its limit
+the login is refused without loading the user or hashing anything, so a
+script walking sequential roll numbers costs a dictionary lookup (or one
+indexed COUNT) per attempt instead of a full bcrypt verification.
+
+LOGIN_THROTTLE_BACKEND picks where failures are kept:
+  'memory'   - per process; fine for a single worker.
+  'database' - the login_attempts table, shared by every worker.
+  'none'     - throttling disabled.
+Either way expired failures of every key are swept out, not just those of
+keys that come back, so random usernames can't grow the store without
+bound; the memory store also holds at most LOGIN_THROTTLE_MAX_KEYS keys.
+
+Counters (checks, blocked attempts and the bcrypt time that blocking
+saved, estimated from the measured verification latency) are per process
+and shown at /admin/security/login-throttle.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func
+from extensions import db
+from models import LoginAttempt
+
+
+class MemoryFailureStore:
+    def __init__(self, max_keys=100000):
+        # key -> deque of monotonic timestamps, least recently failed key first
+        self.failures = OrderedDict()
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+
+    def _prune(self, key, window):
+        times = self.failures.get(key)
+        if times is None:
+            return None
+        cutoff = time.monotonic() - window
+        while times and times[0] <= cutoff:
+            times.popleft()
+        if not times:
+            del self.failures[key]
+            return None
+        return times
+
+    def counts(self, keys, window):
+        with self.lock:
+            return {key: len(self._prune(key, window) or ()) for key in keys}
+
+    def retry_after(self, key, window):
+        with self.lock:
+            times = self._prune(key, window)
+            return window - (time.monotonic() - times[0]) if times else 0
+
+    def _sweep(self, window):
+        # Keys are ordered by their latest failure, so the expired ones are at the front
+        cutoff = time.monotonic() - window
+        while self.failures:
+            key, times = next(iter(self.failures.items()))
+            if times[-1] > cutoff:
+                break
+            del self.failures[key]
+        while len(self.failures) > self.max_keys:
+            self.failures.popitem(last=False)
+
+    def add(self, keys, window):
+        now = time.monotonic()
+        with self.lock:
+            for key in keys:
+                self._prune(key, window)
+                self.failures.setdefault(key, deque()).append(now)
+                self.failures.move_to_end(key)
+            self._sweep(window)
+
+    def clear(self, key):
+        with self.lock:
+            self.failures.pop(key, None)
+
+
+class DatabaseFailureStore:
+    """Failures as rows in login_attempts, so the limit holds across processes."""
+
+    def __init__(self):
+        self.next_sweep = 0.0
+        self.lock = threading.Lock()
+
+    def counts(self, keys, window):
+        cutoff = datetime.utcnow() - timedelta(seconds=window)
+        rows = db.session.query(LoginAttempt.key, func.count(LoginAttempt.id)) \
+            .filter(LoginAttempt.key.in_(keys), LoginAttempt.created_at > cutoff) \
+            .group_by(LoginAttempt.key).all()
+        counts = dict.fromkeys(keys, 0)
+        counts.update(rows)
+        return counts
+
+    def retry_after(self, key, window):
+        cutoff = datetime.utcnow() - timedelta(seconds=window)
+        oldest = db.session.query(func.min(LoginAttempt.created_at)) \
+            .filter(LoginAttempt.key == key, LoginAttempt.created_at > cutoff).scalar()
+        if oldest is None:
+            return 0
+        return window - (datetime.utcnow() - oldest).total_seconds()
+
+    def add(self, keys, window):
+        now = datetime.utcnow()
+        # Once per window, delete every expired row (indexed on created_at), whatever its key
+        with self.lock:
+            sweep = time.monotonic() >= self.next_sweep
+            if sweep:
+                self.next_sweep = time.monotonic() + window
+        if sweep:
+            db.session.execute(delete(LoginAttempt).where(LoginAttempt.created_at <= now - timedelta(seconds=window)))
+        db.session.add_all([LoginAttempt(key=key, created_at=now) for key in keys])
+        db.session.commit()
+
+    def clear(self, key):
+        db.session.execute(delete(LoginAttempt).where(LoginAttempt.key == key))
+        db.session.commit()
+
+
+class LoginThrottle:
+    def __init__(self, store, window, max_per_account, max_per_address):
+        self.store = store
+        self.window = window
+        self.limits = {'account': max_per_account, 'address': max_per_address}
+        self.checked = 0
+        self.blocked = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def keys(kind, identifier, address):
+        return f"{kind}:{(identifier or '').strip().lower()}", f"ip:{address or 'unknown'}"
+
+    def check(self, kind, identifier, address):
+        """
+        Call before verifying the password. Returns None if the attempt may
+        proceed, or the number of seconds until it may be retried.
+        """
+        account, ip = self.keys(kind, identifier, address)
+        limited = [(key, limit) for key, limit in ((account, self.limits['account']), (ip, self.limits['address']))
+                   if limit]
+        counts = self.store.counts([key for key, _ in limited], self.window) if limited else {}
+        over = [key for key, limit in limited if counts[key] >= limit]
+        with self.lock:
+            self.checked += 1
+            if over:
+                self.blocked += 1
+        if not over:
+            return None
+        return max(1, int(max(self.store.retry_after(key, self.window) for key in over)) + 1)
+
+    def failed(self, kind, identifier, address):
+        with self.lock:
+            self.failures += 1
+        account, ip = self.keys(kind, identifier, address)
+        # Addresses are not tracked at all while their limit is off
+        self.store.add([account, ip] if self.limits['address'] else [account], self.window)
+
+    def succeeded(self, kind, identifier, address):
+        # Only the account's failures are forgiven; a shared address keeps its count
+        self.store.clear(self.keys(kind, identifier, address)[0])
+
+    def stats(self):
+        from utils.password_hashing import hashing_stats
+        # Each blocked attempt would have cost one verification at the current cost
+        current = hashing_stats()['verifications'].get(str(current_app.config.get('BCRYPT_LOG_ROUNDS', 12)))
+        per_hash = current['mean_ms'] if current else None
+        with self.lock:
+            return {
+                'backend': type(self.store).__name__,
+                'window_seconds': self.window,
+                'max_per_account': self.limits['account'],
+                'max_per_address': self.limits['address'],
+                'checked': self.checked,
+                'blocked': self.blocked,
+                'failures_recorded': self.failures,
+                'bcrypt_ms_per_check': per_hash,
+                'cpu_ms_saved': round(self.blocked * per_hash, 1) if per_hash else None,
+            }
+
+
+def init_login_throttle(app):
+    backend = (app.config.get('LOGIN_THROTTLE_BACKEND') or 'none').lower()
+    if backend == 'none':
+        app.extensions['login_throttle'] = None
+        return
+    if backend == 'database':
+        store = DatabaseFailureStore()
+    else:
+        store = MemoryFailureStore(app.config.get('LOGIN_THROTTLE_MAX_KEYS', 100000))
+    app.extensions['login_throttle'] = LoginThrottle(
+        store,
+        window=app.config.get('LOGIN_THROTTLE_WINDOW', 300),
+        max_per_account=app.config.get('LOGIN_THROTTLE_MAX_PER_ACCOUNT', 5),
+        max_per_address=app.config.get('LOGIN_THROTTLE_MAX_PER_ADDRESS', 0),
+    )
+
+
+def get_throttle():
+    return current_app.extensions.get('login_throttle')
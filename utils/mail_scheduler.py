@@ -0,0 +1,186 @@
+"""
+Provider-aware send scheduling for outbound mail.
+
+Each provider gets a token bucket on API requests (per-second rate plus
+burst) and an optional daily message quota, configured in
+MAIL_RATE_LIMITS. The outbox asks admit() how many messages it may send
+right now before claiming a batch; anything over the limit simply stays
+Pending in the outbox and goes out as soon as tokens are available, so
+bursts are smoothed instead of turning into 429 failures. A 429 that
+still gets through pauses the bucket for the provider's Retry-After.
+
+Buckets are per process; with several worker processes divide the rate
+between them.
+"""
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import current_app
+from utils.email_sender import get_transport, PROVIDER_BATCH_LIMITS
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self.tokens = self.burst
+        self.clock = clock
+        self.updated = clock()
+        self.paused_until = 0.0
+
+    def _refill(self):
+        now = self.clock()
+        if now < self.paused_until:
+            self.updated = now
+            return
+        start = max(self.updated, self.paused_until)
+        self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self.updated = now
+
+    def take(self, n=1):
+        """Take up to n whole tokens without blocking; returns how many were granted."""
+        self._refill()
+        granted = min(int(n), int(self.tokens))
+        self.tokens -= granted
+        return granted
+
+    def give_back(self, n):
+        self.tokens = min(self.burst, self.tokens + n)
+
+    def wait_time(self, n=1):
+        """Seconds until n tokens will be available."""
+        self._refill()
+        paused = max(0.0, self.paused_until - self.clock())
+        missing = max(0.0, n - self.tokens)
+        return paused + missing / self.rate
+
+    def pause(self, seconds):
+        """Provider pushed back: spend nothing for `seconds` and start from empty."""
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+
+class MailScheduler:
+    def __init__(self, provider, limits, messages_per_request=1, clock=time.monotonic):
+        self.provider = provider
+        self.messages_per_request = messages_per_request
+        limits = limits or {}
+        self.bucket = TokenBucket(limits['per_second'], limits.get('burst'), clock) \
+            if limits.get('per_second') else None
+        self.daily_quota = limits.get('per_day')
+        self.day = None
+        self.sent_today = 0
+        self.throttle_count = 0
+        self.deferred_total = 0
+        self.throttle_events = deque(maxlen=50)
+        self.throttled = False
+        self._lock = threading.Lock()
+
+    def _throttle(self, reason, deferred, new_episode=False):
+        # One event per throttling episode: repeated refusals while the
+        # backlog drains only add to the deferred count.
+        self.deferred_total += deferred
+        if self.throttled and not new_episode:
+            return
+        self.throttled = True
+        self.throttle_count += 1
+        self.throttle_events.append({'at': datetime.utcnow().isoformat(), 'reason': reason, 'deferred': deferred})
+
+    def _roll_day(self, load_sent_today):
+        today = datetime.utcnow().date()
+        if self.day != today:
+            self.day = today
+            self.sent_today = load_sent_today() if load_sent_today else 0
+
+    def _requests(self, messages):
+        return math.ceil(messages / self.messages_per_request)
+
+    def admit(self, wanted, load_sent_today=None):
+        """
+        How many of `wanted` messages may be sent now. The caller must
+        release() whatever it does not actually send.
+        """
+        capped = False
+        with self._lock:
+            if self.daily_quota:
+                self._roll_day(load_sent_today)
+                remaining = self.daily_quota - self.sent_today
+                if remaining <= 0:
+                    self._throttle('daily quota reached', wanted)
+                    return 0
+                if remaining < wanted:
+                    self._throttle('daily quota', wanted - remaining)
+                    wanted = remaining
+                    capped = True
+            if self.bucket is not None:
+                granted = self.bucket.take(self._requests(wanted))
+                allowed = min(wanted, granted * self.messages_per_request)
+                if allowed < wanted:
+                    self._throttle('rate limit', wanted - allowed)
+                    return allowed
+            if not capped:
+                self.throttled = False
+            return wanted
+
+    def release(self, admitted, used):
+        """Return the tokens for admitted-but-unsent messages."""
+        with self._lock:
+            if self.bucket is not None:
+                unused = self._requests(admitted) - self._requests(used)
+                if unused > 0:
+                    self.bucket.give_back(unused)
+
+    def record_sent(self, count):
+        with self._lock:
+            self.sent_today += count
+
+    def rate_limited(self, retry_after):
+        """The provider answered 429 despite the bucket; back off for retry_after seconds."""
+        with self._lock:
+            if self.bucket is not None:
+                self.bucket.pause(retry_after)
+            self._throttle(f'provider 429, paused {retry_after:.0f}s', 0, new_episode=True)
+        print(f"WARN: {self.provider} rate limited outbound mail, pausing for {retry_after:.0f}s")
+
+    def wait_time(self):
+        """Seconds until the next message could be admitted (None if blocked by the daily quota)."""
+        with self._lock:
+            if self.daily_quota and self.day == datetime.utcnow().date() and self.sent_today >= self.daily_quota:
+                return None
+            return self.bucket.wait_time() if self.bucket else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'provider': self.provider,
+                'per_second': self.bucket.rate if self.bucket else None,
+                'burst': self.bucket.burst if self.bucket else None,
+                'tokens': round(self.bucket.tokens, 2) if self.bucket else None,
+                'daily_quota': self.daily_quota,
+                'sent_today': self.sent_today,
+                'throttle_count': self.throttle_count,
+                'deferred_total': self.deferred_total,
+                'throttle_events': list(self.throttle_events),
+            }
+
+
+def get_scheduler():
+    """The app's scheduler, built on first use for the provider resolved at startup."""
+    app = current_app._get_current_object()
+    scheduler = app.extensions.get('mail_scheduler')
+    if scheduler is None:
+        transport = get_transport()
+        limits = dict(app.config.get('MAIL_RATE_LIMITS', {}).get(transport.provider) or {})
+        if app.config.get('MAIL_RATE_PER_SECOND'):
+            limits['per_second'] = app.config['MAIL_RATE_PER_SECOND']
+        if app.config.get('MAIL_DAILY_QUOTA'):
+            limits['per_day'] = app.config['MAIL_DAILY_QUOTA']
+        # Batch providers take a whole batch per request; the rest one message per request
+        per_request = min(app.config.get('MAIL_BATCH_SIZE', 100), PROVIDER_BATCH_LIMITS.get(transport.provider, 1))
+        scheduler = MailScheduler(transport.provider, limits, messages_per_request=per_request)
+        app.extensions['mail_scheduler'] = scheduler
+    return scheduler
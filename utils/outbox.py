@@ -0,0 +1,301 @@
+"""
+Transactional email outbox.
+
+Request handlers call enqueue_email() instead of sending: the message is
+added to the same session as the change that triggers it, so it is
+committed (or rolled back) together with it. After committing they call
+flush_outbox(), which wakes the delivery threads (or, in inline mode,
+delivers straight away). The threads are also started with each web
+process's first request, and job_worker.py runs them too, so messages left
+Pending across a restart are picked up.
+
+Delivery claims batches of Pending rows with a conditional UPDATE, the
+same way utils/jobs.py claims jobs, so several threads/processes can
+drain the table concurrently, and hands each batch to send_batch(). How
+much is claimed at a time is limited by the provider's rate limits (see
+utils/mail_scheduler.py); the rest simply waits in the table. Failed sends are retried with exponential backoff;
+after MAIL_OUTBOX_MAX_ATTEMPTS a message is dead-lettered (status 'Dead').
+The final outcome of every message is recorded in EmailLog.
+"""
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, insert, update
+from extensions import db
+from models import EmailOutbox, EmailLog
+from utils.email_sender import send_email, send_batch, get_transport, is_rate_limited
+from utils.mail_scheduler import get_scheduler
+
+_workers = []
+_workers_pid = None
+_workers_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+def enqueue_email(subject, recipients, body, html=None, email_type=None, student_id=None):
+    """Queue an email in the current transaction. The caller commits."""
+    message = EmailOutbox(
+        email_type=email_type,
+        student_id=student_id,
+        recipients=json.dumps(list(recipients)),
+        subject=subject,
+        body=body,
+        html=html,
+        status='Pending',
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.session.add(message)
+    return message
+
+
+def _inline(app):
+    inline = app.config.get('MAIL_OUTBOX_INLINE')
+    return app.testing if inline is None else inline
+
+
+def flush_outbox():
+    """Call after committing queued emails: delivers them now (inline mode) or wakes the workers."""
+    app = current_app._get_current_object()
+    if _inline(app):
+        deliver_pending()
+    else:
+        start_delivery_workers(app)
+        _wakeup.set()
+
+
+def _requeue_stale():
+    # A message left in Sending by a worker that died goes back to the queue
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['MAIL_OUTBOX_STALE_SECONDS'])
+    db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.status == 'Sending', EmailOutbox.locked_at < cutoff)
+        .values(status='Pending')
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def enqueue_emails(messages):
+    """
+    Queue many emails with one bulk INSERT in the current transaction.
+    messages: dicts with subject, recipients, body and optional html,
+    email_type, student_id. The caller commits.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            'email_type': m.get('email_type'),
+            'student_id': m.get('student_id'),
+            'recipients': json.dumps(list(m['recipients'])),
+            'subject': m['subject'],
+            'body': m['body'],
+            'html': m.get('html'),
+            'status': 'Pending',
+            'attempts': 0,
+            'next_attempt_at': now,
+            'created_at': now,
+        }
+        for m in messages
+    ]
+    if rows:
+        db.session.execute(insert(EmailOutbox), rows)
+    return len(rows)
+
+
+def _due_ids(size):
+    now = datetime.utcnow()
+    return [message_id for (message_id,) in
+            db.session.query(EmailOutbox.id)
+                      .filter(EmailOutbox.status == 'Pending', EmailOutbox.next_attempt_at <= now)
+                      .order_by(EmailOutbox.id).limit(size)]
+
+
+def _claim(ids):
+    """Claim the given due messages in one UPDATE; returns the ones this pass got, in id order."""
+    # Another worker may claim some of the same rows first; the token tells us which are ours
+    token = uuid.uuid4().hex
+    db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(ids), EmailOutbox.status == 'Pending')
+        .values(status='Sending', locked_at=datetime.utcnow(), claim_token=token,
+                attempts=EmailOutbox.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return EmailOutbox.query.filter_by(claim_token=token, status='Sending')\
+                            .order_by(EmailOutbox.id).populate_existing().all()
+
+
+def _sent_today():
+    midnight = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    return EmailOutbox.query.filter(EmailOutbox.status == 'Sent', EmailOutbox.sent_at >= midnight).count()
+
+
+def deliver_batch(size=None):
+    """
+    Claim and send one batch of due messages through send_batch(), then
+    record the outcomes with one bulk UPDATE and one EmailLog INSERT.
+    The batch is cut down to what the provider's rate limit admits right
+    now; the rest stay Pending. Returns the number of messages processed
+    (0 if nothing was due or everything is throttled).
+    """
+    config = current_app.config
+    due = _due_ids(size or config['MAIL_BATCH_SIZE'])
+    if not due:
+        return 0
+    scheduler = get_scheduler()
+    allowed = scheduler.admit(len(due), load_sent_today=_sent_today)
+    if not allowed:
+        return 0
+    messages = _claim(due[:allowed])
+    scheduler.release(allowed, len(messages))
+    if not messages:
+        return 0
+
+    try:
+        if len(messages) == 1:
+            # Nothing to group; use the plain single-message call
+            m = messages[0]
+            results = [send_email(m.subject, json.loads(m.recipients), m.body, m.html)]
+        else:
+            results = send_batch([
+                {'subject': m.subject, 'recipients': json.loads(m.recipients), 'body': m.body, 'html': m.html}
+                for m in messages
+            ])
+    except Exception as e:
+        results = [(False, str(e))] * len(messages)
+
+    now = datetime.utcnow()
+    pause = None
+    if any(is_rate_limited(info) for ok, info in results if not ok):
+        pause = get_transport().retry_after or 1.0
+        scheduler.rate_limited(pause)
+
+    changes, logs = [], []
+    for message, (success, info) in zip(messages, results):
+        change = {'id': message.id, 'locked_at': None, 'claim_token': None}
+        if success:
+            change.update(status='Sent', sent_at=now, last_error=None)
+            logs.append({'student_id': message.student_id, 'email_type': message.email_type,
+                         'status': 'Success', 'error_message': None, 'sent_at': now})
+        elif is_rate_limited(info):
+            # Not the message's fault: requeue for after the pause without using up an attempt
+            change.update(status='Pending', attempts=message.attempts - 1,
+                          next_attempt_at=now + timedelta(seconds=pause), last_error=info)
+        elif message.attempts >= config['MAIL_OUTBOX_MAX_ATTEMPTS']:
+            change.update(status='Dead', last_error=info)
+            logs.append({'student_id': message.student_id, 'email_type': message.email_type,
+                         'status': 'Failed', 'sent_at': now,
+                         'error_message': f"Gave up after {message.attempts} attempts: {info}"})
+            print(f"ERROR: Email {message.id} ({message.email_type}) dead-lettered: {info}")
+        else:
+            backoff = config['MAIL_OUTBOX_RETRY_BACKOFF'] * 2 ** (message.attempts - 1)
+            change.update(status='Pending', next_attempt_at=now + timedelta(seconds=backoff), last_error=info)
+            print(f"WARN: Email {message.id} attempt {message.attempts} failed, retrying in {backoff:.0f}s: {info}")
+        changes.append(change)
+
+    db.session.execute(update(EmailOutbox), changes)
+    if logs:
+        db.session.execute(insert(EmailLog), logs)
+    db.session.commit()
+    scheduler.record_sent(sum(1 for ok, _ in results if ok))
+    return len(messages)
+
+
+def deliver_pending(limit=None):
+    """Send every message that is due now (up to limit). Returns the number processed."""
+    _requeue_stale()
+    batch_size = current_app.config['MAIL_BATCH_SIZE']
+    processed = 0
+    while limit is None or processed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - processed)
+        done = deliver_batch(size)
+        if not done:
+            break
+        processed += done
+    return processed
+
+
+def retry_dead(message_ids=None):
+    """Put dead-lettered messages back in the queue with a fresh set of attempts."""
+    query = update(EmailOutbox).where(EmailOutbox.status == 'Dead')
+    if message_ids is not None:
+        query = query.where(EmailOutbox.id.in_(message_ids))
+    count = db.session.execute(
+        query.values(status='Pending', attempts=0, next_attempt_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return count
+
+
+def queue_stats():
+    """Outbox depth by status, plus how many Pending messages are due right now."""
+    counts = dict(db.session.query(EmailOutbox.status, func.count(EmailOutbox.id))
+                            .group_by(EmailOutbox.status).all())
+    due = EmailOutbox.query.filter(EmailOutbox.status == 'Pending',
+                                   EmailOutbox.next_attempt_at <= datetime.utcnow()).count()
+    return {
+        'pending': counts.get('Pending', 0),
+        'due': due,
+        'sending': counts.get('Sending', 0),
+        'sent': counts.get('Sent', 0),
+        'dead': counts.get('Dead', 0),
+    }
+
+
+def _delivery_loop(app, stop_event=None):
+    interval = app.config['MAIL_OUTBOX_POLL_INTERVAL']
+    while stop_event is None or not stop_event.is_set():
+        delay = interval
+        try:
+            with app.app_context():
+                sent = deliver_pending(limit=50)
+                scheduler = get_scheduler()
+                if scheduler.throttled:
+                    # Sleep only as long as the rate limit requires
+                    wait = scheduler.wait_time()
+                    delay = interval if wait is None else min(max(wait, 0.05), interval)
+                    sent = 0
+                db.session.remove()
+        except Exception as e:
+            print(f"ERROR: Email delivery loop: {e}")
+            sent = 0
+        if not sent:
+            _wakeup.wait(delay)
+            _wakeup.clear()
+
+
+def init_outbox(app):
+    """
+    Start this process's delivery threads with its first request, so
+    messages left Pending by a restart go out without waiting for a new one
+    to be queued.
+    """
+    @app.before_request
+    def _start_delivery():
+        if _workers_pid != os.getpid():
+            start_delivery_workers(app)
+
+
+def start_delivery_workers(app, count=None):
+    """Start the in-process delivery threads once per process (no-op if MAIL_OUTBOX_WORKER_THREADS is 0)."""
+    global _workers_pid
+    if count is None:
+        count = app.config['MAIL_OUTBOX_WORKER_THREADS']
+    if count <= 0 or _inline(app):
+        return
+    with _workers_lock:
+        # Threads don't survive a fork (e.g. gunicorn workers), so track the owning pid
+        if _workers_pid == os.getpid() and any(t.is_alive() for t in _workers):
+            return
+        _workers.clear()
+        _workers_pid = os.getpid()
+        for i in range(count):
+            t = threading.Thread(target=_delivery_loop, args=(app,), name=f"mail-worker-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
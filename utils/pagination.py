@@ -0,0 +1,255 @@
+"""
+Keyset (seek) pagination for the admin lists, with cached totals.
+
+OFFSET pagination reads and discards every row before the page, and
+paginate() adds a COUNT(*) per request. Here a page is the next per_page
+rows after (or before) the last row shown, found by seeking an index:
+
+    WHERE (status, id) < ('Pending', 4211) ORDER BY status DESC, id DESC LIMIT 11
+
+so page 500 costs the same as page 1. The position travels in the URL as
+an opaque cursor (?after=... / ?before=...) holding the sort key of the
+edge row. Sort keys must end in a unique column (the primary key) and be
+non-null; the leading columns should be indexed.
+
+Only plain integer, float and string columns go in the cursor, and each
+value is checked against its column's type, so a forged cursor falls back
+to the first page instead of reaching the database. Computed keys (the
+search rank) stay out of it: they are read back from the edge row, found
+by the columns, so the seek uses the same value the ORDER BY sees now.
+
+Totals come from a per-app cache (app.extensions['list_counts']), keyed by
+table and filter. Commits that insert, update or delete rows of a table -
+ORM flushes and bulk statements alike - drop that table's entries;
+LIST_COUNT_TTL bounds staleness from other processes.
+"""
+import base64
+import json
+import math
+import threading
+import time
+from flask import current_app, has_app_context, request, url_for
+from sqlalchemy import Column, and_, or_, event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import UnaryExpression
+
+
+CURSOR_TYPES = (int, float, str)
+# Integers outside the 64-bit range can't be bound as parameters
+MAX_INT = 2 ** 63
+
+
+def _encode(values):
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def _valid(value, expected):
+    if isinstance(value, bool):
+        return False
+    if expected is int:
+        return isinstance(value, int) and -MAX_INT <= value < MAX_INT
+    if expected is float:
+        return isinstance(value, (int, float)) and math.isfinite(value)
+    return isinstance(value, expected)
+
+
+def _decode(cursor, types):
+    """Key values of a cursor, or None when it is missing, malformed or not of the columns' types."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != len(types):
+        return None
+    return values if all(_valid(value, expected) for value, expected in zip(values, types)) else None
+
+
+def _keys(order):
+    """[(expression, descending)] from ORDER BY clauses like Student.id.desc()."""
+    keys = []
+    for clause in order:
+        if isinstance(clause, UnaryExpression) and clause.modifier in (operators.desc_op, operators.asc_op):
+            keys.append((clause.element, clause.modifier is operators.desc_op))
+        else:
+            clause = clause.__clause_element__() if hasattr(clause, '__clause_element__') else clause
+            keys.append((clause, False))
+    return keys
+
+
+def _cursor_keys(keys):
+    """[(position, python type)] of the keys whose values go in cursors: the plain columns."""
+    cursor_keys = []
+    for i, (expression, _) in enumerate(keys):
+        if isinstance(expression, Column):
+            try:
+                python_type = expression.type.python_type
+            except NotImplementedError:
+                continue
+            if python_type in CURSOR_TYPES:
+                cursor_keys.append((i, python_type))
+    if not cursor_keys or cursor_keys[-1][0] != len(keys) - 1:
+        raise ValueError('Keyset order must end in a unique column.')
+    return cursor_keys
+
+
+def _edge_values(query, keys, cursor_keys, values):
+    """The full sort key of the row a cursor points at, or None if it is gone or no longer matches."""
+    row = query.order_by(None).with_entities(*[expression for expression, _ in keys]) \
+        .filter(*[keys[i][0] == value for (i, _), value in zip(cursor_keys, values)]).first()
+    return list(row) if row is not None else None
+
+
+def _seek(keys, values, forward):
+    """Rows strictly after the key values in the sort order (before them when not forward)."""
+    clauses = []
+    for i, (expression, descending) in enumerate(keys):
+        past = expression < values[i] if descending == forward else expression > values[i]
+        clauses.append(and_(*[keys[j][0] == values[j] for j in range(i)], past))
+    return or_(*clauses)
+
+
+class KeysetPage:
+    def __init__(self, items, per_page, total, next_cursor, prev_cursor):
+        self.items = items
+        self.per_page = per_page
+        self.total = total
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def _url(self, **cursor):
+        args = {k: v for k, v in request.args.items() if k not in ('after', 'before', 'page')}
+        return url_for(request.endpoint, **request.view_args, **args, **cursor)
+
+    @property
+    def next_url(self):
+        return self._url(after=self.next_cursor) if self.has_next else None
+
+    @property
+    def prev_url(self):
+        return self._url(before=self.prev_cursor) if self.has_prev else None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(query, order, per_page=None, count_key=None):
+    """
+    One page of query in the given order (e.g. [Student.status.desc(),
+    Student.id.desc()]), positioned by the request's after/before cursor.
+    count_key identifies the query's filters for the cached total (the
+    table is added); None means unfiltered.
+    """
+    per_page = per_page or current_app.config.get('ADMIN_LIST_PER_PAGE', 20)
+    keys = _keys(order)
+    cursor_keys = _cursor_keys(keys)
+    types = [python_type for _, python_type in cursor_keys]
+    after = _decode(request.args.get('after'), types)
+    before = None if after else _decode(request.args.get('before'), types)
+    table = query.column_descriptions[0]['entity'].__table__.name
+    total = list_counts().get((table, count_key), lambda: query.order_by(None).count())
+
+    seek = after or before
+    if seek is not None and len(cursor_keys) < len(keys):
+        seek = _edge_values(query, keys, cursor_keys, seek)
+        if seek is None:  # the edge row is gone: start over
+            after = before = None
+
+    forward = before is None
+    page_query = query.order_by(None).add_columns(*[expression for expression, _ in keys])
+    if seek is not None:
+        page_query = page_query.filter(_seek(keys, seek, forward))
+    # Backwards pages are read in reverse order from the cursor, then flipped
+    direction = [expression.desc() if descending == forward else expression.asc() for expression, descending in keys]
+    rows = page_query.order_by(*direction).limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page] if forward else rows[:per_page][::-1]
+
+    items = [row[0] for row in rows]
+    first = _encode([rows[0][1 + i] for i, _ in cursor_keys]) if rows else None
+    last = _encode([rows[-1][1 + i] for i, _ in cursor_keys]) if rows else None
+    if forward:
+        return KeysetPage(items, per_page, total, last if more else None, first if after else None)
+    return KeysetPage(items, per_page, total, last, first if more else None)
+
+
+# -- Cached totals ----------------------------------------------------------------
+
+class CountCache:
+    def __init__(self, ttl, max_entries=512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        """key: (table, filter key); compute() runs on a miss."""
+        entry = self.entries.get(key)
+        if entry is not None and time.monotonic() < entry[1]:
+            return entry[0]
+        generation = self.generations.get(key[0], 0)
+        value = compute()
+        with self.lock:
+            # A write to the table while counting means the count may already be stale
+            if generation == self.generations.get(key[0], 0):
+                if len(self.entries) >= self.max_entries:
+                    self.entries.clear()
+                self.entries[key] = (value, time.monotonic() + self.ttl)
+        return value
+
+    def invalidate(self, tables):
+        with self.lock:
+            for table in tables:
+                self.generations[table] = self.generations.get(table, 0) + 1
+            self.entries = {key: entry for key, entry in self.entries.items() if key[0] not in tables}
+
+
+def init_list_counts(app):
+    app.extensions['list_counts'] = CountCache(app.config.get('LIST_COUNT_TTL', 300))
+
+
+def list_counts():
+    return current_app.extensions['list_counts']
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_changes(session, flush_context, instances):
+    tables = session.info.setdefault('list_counts_stale', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            tables.add(table)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_writes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and getattr(table, 'name', None):
+            orm_execute_state.session.info.setdefault('list_counts_stale', set()).add(table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _drop_counts(session):
+    tables = session.info.pop('list_counts_stale', None)
+    if tables and has_app_context():
+        list_counts().invalidate(tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('list_counts_stale', None)
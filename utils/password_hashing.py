@@ -0,0 +1,249 @@
+import os
+import atexit
+import hashlib
+import json
+import threading
+import time
+import bcrypt
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+
+# Batches smaller than this are hashed inline; starting/feeding worker
+# processes costs more than it saves.
+MIN_POOL_BATCH = 8
+
+_executor = None
+_executor_workers = None
+
+
+def _hash_one(args):
+    # Runs inside the worker processes, so it must stay importable without an app
+    password, rounds, prefix = args
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds, prefix=prefix)).decode('utf-8')
+
+
+def _get_executor(workers):
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ProcessPoolExecutor(max_workers=workers)
+        _executor_workers = workers
+    return _executor
+
+
+@atexit.register
+def shutdown_pool():
+    global _executor, _executor_workers
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = None
+    _executor_workers = None
+
+
+def hash_passwords(passwords, rounds=None, workers=None):
+    """
+    Hash a batch of plaintext passwords with bcrypt across all cores.
+
+    Produces the same hashes as Flask-Bcrypt's generate_password_hash (same
+    BCRYPT_LOG_ROUNDS / BCRYPT_HASH_PREFIX / BCRYPT_HANDLE_LONG_PASSWORDS
+    settings), so they verify with check_password_hash. Order is preserved.
+    """
+    config = current_app.config
+    if rounds is None:
+        rounds = config.get('BCRYPT_LOG_ROUNDS', 12)
+    prefix = config.get('BCRYPT_HASH_PREFIX', '2b').encode('utf-8')
+    if workers is None:
+        workers = config.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1
+
+    jobs = []
+    for password in passwords:
+        if not password:
+            raise ValueError('Password must be non-empty.')
+        password = password.encode('utf-8') if isinstance(password, str) else password
+        if config.get('BCRYPT_HANDLE_LONG_PASSWORDS', False):
+            password = hashlib.sha256(password).hexdigest().encode('utf-8')
+        jobs.append((password, rounds, prefix))
+
+    if workers <= 1 or len(jobs) < MIN_POOL_BATCH:
+        return [_hash_one(job) for job in jobs]
+
+    chunksize = max(1, len(jobs) // (workers * 4))
+    return list(_get_executor(workers).map(_hash_one, jobs, chunksize=chunksize))
+
+
+def hash_password(password, rounds=None):
+    return hash_passwords([password], rounds=rounds)[0]
+
+
+# -- Cost calibration, verification timing and rehash-on-login -------------
+
+def _cost(pw_hash):
+    """Log-rounds encoded in a bcrypt hash ('$2b$12$...' -> 12), or None."""
+    try:
+        return int(pw_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def calibrate_rounds(target_ms, min_rounds=10, max_rounds=14, samples=2):
+    """
+    Highest bcrypt cost whose hash takes at most target_ms on this machine,
+    clamped to [min_rounds, max_rounds]. Times min_rounds and extrapolates:
+    every extra round doubles the work. Returns (rounds, measured_ms).
+    """
+    salt = bcrypt.gensalt(rounds=min_rounds)
+    best = None
+    for _ in range(samples):
+        started = time.perf_counter()
+        bcrypt.hashpw(b'calibration-password', salt)
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+
+    rounds = min_rounds
+    while rounds < max_rounds and best * 2 ** (rounds + 1 - min_rounds) <= target_ms:
+        rounds += 1
+    return rounds, best * 2 ** (rounds - min_rounds)
+
+
+class HashTimings:
+    """Rolling login-verification timings, grouped by the cost of the stored hash."""
+
+    def __init__(self, window=500):
+        self.window = window
+        self.by_cost = {}
+        self.rehashed = 0
+        self.lock = threading.Lock()
+
+    def record(self, cost, elapsed_ms):
+        with self.lock:
+            stats = self.by_cost.get(cost)
+            if stats is None:
+                stats = self.by_cost[cost] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                              'recent': deque(maxlen=self.window)}
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['recent'].append(elapsed_ms)
+
+    def snapshot(self):
+        with self.lock:
+            report = {}
+            for cost, stats in sorted(self.by_cost.items(), key=lambda item: item[0] or 0):
+                recent = sorted(stats['recent'])
+                report[str(cost)] = {
+                    'count': stats['count'],
+                    'mean_ms': round(stats['total_ms'] / stats['count'], 2),
+                    'p50_ms': round(recent[len(recent) // 2], 2),
+                    'p95_ms': round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 2),
+                    'max_ms': round(stats['max_ms'], 2),
+                }
+            return {'verifications': report, 'rehashed': self.rehashed}
+
+
+def _load_calibration(path):
+    """(rounds, measured_ms) from a calibration file, or None when missing or unreadable."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return int(data['rounds']), data.get('calibrated_ms')
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_calibration(path, rounds, estimate):
+    """
+    Write a calibration unless another process already has; either way
+    returns the one on disk, so every process ends up with the same cost.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'rounds': rounds, 'calibrated_ms': estimate}, f)
+    try:
+        os.link(tmp, path)  # atomic, and fails if the file exists
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp)
+    return _load_calibration(path) or (rounds, estimate)
+
+
+def init_password_hashing(app):
+    """
+    Pick the bcrypt cost for new hashes. With BCRYPT_TARGET_MS set the cost is
+    calibrated against this machine, unless BCRYPT_LOG_ROUNDS is pinned or
+    the app is testing; otherwise BCRYPT_LOG_ROUNDS is used as before. The
+    calibrated cost may be lower or higher than the old default of 12, but
+    never below BCRYPT_MIN_ROUNDS.
+
+    The first process to calibrate saves the result to
+    BCRYPT_CALIBRATION_FILE (instance/bcrypt_calibration.json by default)
+    and later ones reuse it, so all workers hash at one cost. Delete the
+    file to re-calibrate; pin BCRYPT_LOG_ROUNDS when hosts don't share it.
+    """
+    state = {'rounds': app.config.get('BCRYPT_LOG_ROUNDS', 12), 'calibrated_ms': None,
+             'target_ms': app.config.get('BCRYPT_TARGET_MS'), 'timings': HashTimings()}
+    pinned = 'BCRYPT_LOG_ROUNDS' in app.config
+    if state['target_ms'] and not pinned and not app.testing:
+        min_rounds = app.config.get('BCRYPT_MIN_ROUNDS', 10)
+        max_rounds = app.config.get('BCRYPT_MAX_ROUNDS', 14)
+        path = app.config.get('BCRYPT_CALIBRATION_FILE') or \
+            os.path.join(app.instance_path, 'bcrypt_calibration.json')
+        calibration = _load_calibration(path)
+        if calibration is None:
+            rounds, estimate = calibrate_rounds(state['target_ms'], min_rounds, max_rounds)
+            calibration = _save_calibration(path, rounds, round(estimate, 1))
+            app.logger.info('bcrypt cost calibrated to %s (~%s ms per hash, target %s ms)',
+                            calibration[0], calibration[1], state['target_ms'])
+        rounds, estimate = calibration
+        rounds = min(max(rounds, min_rounds), max_rounds)
+        app.config['BCRYPT_LOG_ROUNDS'] = rounds
+        state.update(rounds=rounds, calibrated_ms=estimate)
+    app.extensions['password_hashing'] = state
+
+
+def _state():
+    state = current_app.extensions.get('password_hashing')
+    if state is None:
+        init_password_hashing(current_app._get_current_object())
+        state = current_app.extensions['password_hashing']
+    return state
+
+
+def verify_password(pw_hash, password):
+    """check_password_hash with its latency recorded under the stored hash's cost."""
+    from extensions import bcrypt as flask_bcrypt
+    started = time.perf_counter()
+    try:
+        return flask_bcrypt.check_password_hash(pw_hash, password)
+    finally:
+        _state()['timings'].record(_cost(pw_hash), (time.perf_counter() - started) * 1000)
+
+
+def needs_rehash(pw_hash):
+    """True when a hash was made at a different cost than the current one."""
+    if not current_app.config.get('BCRYPT_REHASH_ON_LOGIN', True):
+        return False
+    return _cost(pw_hash) != current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
+
+
+def rehash_if_needed(user, password):
+    """
+    After a successful login, re-hash the password at the current cost if the
+    stored hash uses another one. The caller commits. Returns True if rehashed.
+    """
+    if not needs_rehash(user.password_hash):
+        return False
+    user.set_password(password)
+    state = _state()
+    with state['timings'].lock:
+        state['timings'].rehashed += 1
+    return True
+
+
+def hashing_stats():
+    state = _state()
+    return dict(state['timings'].snapshot(), rounds=current_app.config.get('BCRYPT_LOG_ROUNDS', 12),
+                target_ms=state['target_ms'], calibrated_ms=state['calibrated_ms'])
@@ -0,0 +1,92 @@
+import hashlib
+import pandas as pd
+from sqlalchemy import insert
+from extensions import db
+from models import Question
+
+REQUIRED_COLUMNS = ['Question Text', 'Option A', 'Option B', 'Option C', 'Option D', 'Correct Option', 'Marks']
+
+OPTION_COLUMNS = {'Option A': 'option_a', 'Option B': 'option_b', 'Option C': 'option_c', 'Option D': 'option_d'}
+
+
+def _normalise(values):
+    """Lower-cased text with runs of whitespace collapsed, for duplicate detection."""
+    return values.fillna('').astype(str).str.lower().str.split().str.join(' ')
+
+
+def question_hashes(texts, options):
+    """
+    Content hash per question: normalised text plus the four options in
+    order (order matters, the correct option refers to a letter).
+    texts is a Series, options a list of four Series aligned with it.
+    """
+    joined = _normalise(texts).str.cat([_normalise(o) for o in options], sep='\x1f')
+    return joined.map(lambda s: hashlib.sha1(s.encode('utf-8')).hexdigest())
+
+
+def _existing_hashes(quiz_id):
+    rows = db.session.query(Question.question_text, Question.option_a, Question.option_b,
+                            Question.option_c, Question.option_d).filter_by(quiz_id=quiz_id).all()
+    if not rows:
+        return set()
+    df = pd.DataFrame(rows, columns=['text', 'a', 'b', 'c', 'd'], dtype=object)
+    return set(question_hashes(df['text'], [df['a'], df['b'], df['c'], df['d']]))
+
+
+def import_question_file(quiz_id, path):
+    """
+    Import questions from an Excel sheet into a quiz.
+
+    Correct Option / Marks are validated column-wise, questions already in
+    the quiz (same text and options) or repeated in the sheet are skipped,
+    and the rest are written with one bulk INSERT.
+    Returns {'imported', 'duplicates', 'errors'}.
+    """
+    df = pd.read_excel(path, dtype=str)
+
+    # Validate headers roughly
+    if not all(col in df.columns for col in REQUIRED_COLUMNS):
+        raise ValueError(f'Missing columns. Required: {", ".join(REQUIRED_COLUMNS)}')
+
+    df = df.reset_index(drop=True)
+    df['row_num'] = df.index + 2
+    for col in REQUIRED_COLUMNS:
+        df[col] = df[col].str.strip().replace('', None)
+    df = df[df['Question Text'].notna()]
+
+    correct = df['Correct Option'].str.upper()
+    marks = pd.to_numeric(df['Marks'], errors='coerce')
+
+    error = pd.Series([None] * len(df), index=df.index, dtype=object)
+    error = error.mask(df['Marks'].notna() & ~(marks > 0),
+                       "Invalid Marks '" + df['Marks'].astype(str) + "'.")
+    error = error.mask(~correct.isin(['A', 'B', 'C', 'D']),
+                       "Correct Option must be A, B, C or D (got '" + df['Correct Option'].fillna('').astype(str) + "').")
+    for col in reversed(list(OPTION_COLUMNS)):
+        error = error.mask(df[col].isna(), f"{col} is empty.")
+
+    errors = [f"Row {row}: {msg}" for row, msg in zip(df['row_num'], error) if msg]
+    valid = error.isna()
+    df, correct, marks = df[valid], correct[valid], marks[valid]
+
+    hashes = question_hashes(df['Question Text'], [df[col] for col in OPTION_COLUMNS])
+    duplicate = hashes.isin(_existing_hashes(quiz_id)) | hashes.duplicated()
+
+    records = [
+        {
+            'quiz_id': quiz_id,
+            'question_text': r['Question Text'],
+            'option_a': r['Option A'],
+            'option_b': r['Option B'],
+            'option_c': r['Option C'],
+            'option_d': r['Option D'],
+            'correct_option': c,
+            'marks': m,
+        }
+        for r, c, m in zip(df[~duplicate].to_dict('records'), correct[~duplicate],
+                           marks[~duplicate].fillna(1.0))
+    ]
+    if records:
+        db.session.execute(insert(Question), records)
+    db.session.commit()
+    return {'imported': len(records), 'duplicates': int(duplicate.sum()), 'errors': errors}
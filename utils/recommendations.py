@@ -0,0 +1,312 @@
+"""
+Recommended drives and companies for each student (the recommendations
+table), read by the student dashboard.
+
+A drive's or company's score for a student is
+
+    SKILL_WEIGHT * skill similarity + ELIGIBILITY_WEIGHT * eligible
+
+where skill similarity is the IDF-weighted cosine of utils/skill_ranking.py
+(a drive is represented by the skills named in its description, falling
+back to its company's required_skills) and eligible comes from the
+drive_eligibility table; a company counts as eligible when the student is
+eligible for any of its open drives. Drives the student is not eligible
+for are never recommended. The best RECOMMENDATIONS_PER_KIND of each kind
+are stored per approved student.
+
+Refreshing is incremental and off the request path. Commits that change a
+student's skills or eligibility, a company's required_skills or a drive
+add rows to recommendation_queue in the same transaction and queue one
+'recommendations' background job (utils/jobs.py), which drains it:
+  - a student            -> that student's lists are recomputed
+  - a company or a drive -> its score is computed for every approved
+    student (one sparse product), and only the students whose lists it
+    enters or leaves are recomputed
+Bulk writes that bypass the ORM call mark_recommendations_stale().
+RECOMMENDATIONS_AUTO_REFRESH (default: on unless testing) controls whether
+commits queue the job; process_queue() can always be run directly.
+"""
+import heapq
+from datetime import datetime
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event, delete, insert, inspect, func
+from sqlalchemy.orm import Session, joinedload
+from models import (Student, Company, PlacementDrive, DriveEligibility, Recommendation, RecommendationQueue,
+                    BackgroundJob)
+from utils.eligibility_matrix import ELIGIBILITY_FIELDS, DRIVE_FIELDS, open_drives_filter
+from utils.jobs import job_handler, start_workers
+from utils.skill_ranking import SkillMatrix, query_skills
+
+SKILL_WEIGHT = 0.7
+ELIGIBILITY_WEIGHT = 0.3
+KINDS = ('drive', 'company')
+
+
+def _per_kind():
+    return current_app.config.get('RECOMMENDATIONS_PER_KIND', 5)
+
+
+class Targets:
+    """Open drives and all companies as IDF-weighted skill queries over a SkillMatrix."""
+
+    def __init__(self, session, matrix):
+        drives = session.query(PlacementDrive).options(joinedload(PlacementDrive.company)) \
+            .filter(open_drives_filter()).order_by(PlacementDrive.id).all()
+        companies = session.query(Company).order_by(Company.id).all()
+        self.ids = {'drive': [d.id for d in drives], 'company': [c.id for c in companies]}
+        self.drive_company = {d.id: d.company_id for d in drives}
+        width = len(matrix.skills)
+        self.queries = {
+            'drive': np.array([matrix.query_vector(query_skills(drive=d)) for d in drives]).reshape(len(drives), width),
+            'company': np.array([matrix.query_vector(query_skills(company=c)) for c in companies]).reshape(len(companies), width),
+        }
+
+    def eligible(self, kind, pairs, student_ids):
+        """(students, targets) bool matrix from (student_id, drive_id) eligible pairs."""
+        result = np.zeros((len(student_ids), len(self.ids[kind])), dtype=bool)
+        rows = {sid: i for i, sid in enumerate(student_ids)}
+        cols = {target_id: j for j, target_id in enumerate(self.ids[kind])}
+        for sid, drive_id in pairs:
+            target = drive_id if kind == 'drive' else self.drive_company.get(drive_id)
+            if sid in rows and target in cols:
+                result[rows[sid], cols[target]] = True
+        return result
+
+
+def _score(kind, similarity, eligible):
+    score = SKILL_WEIGHT * similarity + ELIGIBILITY_WEIGHT * eligible
+    if kind == 'drive':
+        score = np.where(eligible, score, 0.0)
+    return score
+
+
+def _eligible_pairs(session, student_ids=None, drive_ids=None):
+    query = session.query(DriveEligibility.student_id, DriveEligibility.drive_id).filter(DriveEligibility.eligible)
+    if student_ids is not None:
+        query = query.filter(DriveEligibility.student_id.in_(student_ids))
+    if drive_ids is not None:
+        query = query.filter(DriveEligibility.drive_id.in_(drive_ids))
+    return query.all()
+
+
+def refresh_students(session, student_ids, batch_size=500, matrix=None, targets=None):
+    """Recompute the stored lists of the given students (rows of unapproved students are just removed)."""
+    matrix = matrix or SkillMatrix.load(session)
+    targets = targets or Targets(session, matrix)
+    per_kind = _per_kind()
+    student_ids = sorted(student_ids)
+    written = 0
+    for start in range(0, len(student_ids), batch_size):
+        ids = student_ids[start:start + batch_size]
+        session.execute(delete(Recommendation).where(Recommendation.student_id.in_(ids)))
+        approved = [sid for (sid,) in session.query(Student.id)
+                    .filter(Student.id.in_(ids), Student.status == 'Approved').order_by(Student.id)]
+        if not approved:
+            continue
+        dense = matrix.dense_rows(approved)
+        pairs = _eligible_pairs(session, student_ids=approved)
+        now = datetime.utcnow()
+        rows = []
+        for kind in KINDS:
+            similarity = dense @ targets.queries[kind].T  # (students, targets)
+            eligible = targets.eligible(kind, pairs, approved)
+            scores = _score(kind, similarity, eligible)
+            for i, sid in enumerate(approved):
+                best = heapq.nlargest(per_kind, (j for j in range(scores.shape[1]) if scores[i, j] > 0),
+                                      key=lambda j: scores[i, j])
+                rows += [{'student_id': sid, 'kind': kind, 'target_id': targets.ids[kind][j], 'rank': rank,
+                          'score': float(scores[i, j]), 'similarity': float(similarity[i, j]),
+                          'eligible': bool(eligible[i, j]), 'updated_at': now}
+                         for rank, j in enumerate(best, 1)]
+        if rows:
+            session.execute(insert(Recommendation), rows)
+        written += len(rows)
+    return written
+
+
+def affected_students(session, kind, target_ids, matrix, targets):
+    """
+    Students whose lists a change to these drives/companies can alter:
+    those listing one of them now, and those it would now make the cut for.
+    """
+    target_ids = set(target_ids)
+    per_kind = _per_kind()
+    affected = {sid for (sid,) in session.query(Recommendation.student_id)
+                .filter(Recommendation.kind == kind, Recommendation.target_id.in_(target_ids))}
+
+    approved = [sid for (sid,) in session.query(Student.id).filter(Student.status == 'Approved').order_by(Student.id)]
+    columns = [j for j, target_id in enumerate(targets.ids[kind]) if target_id in target_ids]
+    if not approved or not columns:
+        return affected
+    drive_ids = [d for d, c in targets.drive_company.items() if (d if kind == 'drive' else c) in target_ids]
+    eligible = targets.eligible(kind, _eligible_pairs(session, drive_ids=drive_ids), approved)
+
+    # The score a student's list must beat: its lowest, or 0 while it is not full
+    cut = dict.fromkeys(approved, 0.0)
+    for sid, lowest, count in session.query(Recommendation.student_id, func.min(Recommendation.score),
+                                            func.count()).filter(Recommendation.kind == kind) \
+            .group_by(Recommendation.student_id):
+        if sid in cut and count >= per_kind:
+            cut[sid] = lowest
+    cut = np.array([cut[sid] for sid in approved])
+
+    approved_ids = np.array(approved)
+    for j in columns:
+        similarity = matrix.similarities_for(targets.queries[kind][j], approved_ids)
+        scores = _score(kind, similarity, eligible[:, j])
+        affected.update(approved_ids[(scores > 0) & (scores > cut)].tolist())
+    return affected
+
+
+def process_queue(session):
+    """Drain recommendation_queue: refresh the queued students and whoever the queued targets affect."""
+    started = datetime.utcnow()
+    queued = session.query(RecommendationQueue.kind, RecommendationQueue.target_id) \
+        .filter(RecommendationQueue.queued_at <= started).all()
+    if not queued:
+        return {'queued': 0, 'students': 0}
+    by_kind = {}
+    for kind, target_id in queued:
+        by_kind.setdefault(kind, set()).add(target_id)
+
+    matrix = SkillMatrix.load(session)
+    targets = Targets(session, matrix)
+    # A company's drives fall back to its required_skills, so they may move too
+    companies = by_kind.get('company', set())
+    drives = by_kind.get('drive', set()) | {d for d, c in targets.drive_company.items() if c in companies}
+    students = set(by_kind.get('student', ()))
+    if companies:
+        students |= affected_students(session, 'company', companies, matrix, targets)
+    if drives:
+        students |= affected_students(session, 'drive', drives, matrix, targets)
+    refresh_students(session, students, matrix=matrix, targets=targets)
+
+    for kind, ids in by_kind.items():
+        session.execute(delete(RecommendationQueue).where(
+            RecommendationQueue.kind == kind, RecommendationQueue.target_id.in_(ids),
+            RecommendationQueue.queued_at <= started))
+    session.commit()
+    return {'queued': len(queued), 'students': len(students)}
+
+
+def rebuild_recommendations(session):
+    session.execute(delete(Recommendation))
+    return refresh_students(session, [sid for (sid,) in session.query(Student.id).filter(Student.status == 'Approved')])
+
+
+@job_handler('recommendations')
+def run_recommendations_job(job):
+    from extensions import db
+    if job.params.get('full'):
+        rows = rebuild_recommendations(db.session)
+        db.session.execute(delete(RecommendationQueue))
+        db.session.commit()
+        return {'rows': rows}
+    return process_queue(db.session)
+
+
+# -- Reading -----------------------------------------------------------------------
+
+def recommendations_for(student):
+    """{'drive': [(Recommendation, PlacementDrive)], 'company': [(Recommendation, Company)]}, best first."""
+    from extensions import db
+    base = db.session.query(Recommendation).filter(Recommendation.student_id == student.id)
+    return {
+        # Drives past their deadline since the last refresh are left out
+        'drive': base.filter(Recommendation.kind == 'drive')
+                     .join(PlacementDrive, PlacementDrive.id == Recommendation.target_id)
+                     .filter(open_drives_filter())
+                     .options(joinedload(PlacementDrive.company))
+                     .add_entity(PlacementDrive).order_by(Recommendation.rank).all(),
+        'company': base.filter(Recommendation.kind == 'company')
+                       .join(Company, Company.id == Recommendation.target_id)
+                       .add_entity(Company).order_by(Recommendation.rank).all(),
+    }
+
+
+# -- Change tracking --------------------------------------------------------------
+
+def mark_recommendations_stale(kind, ids, session=None):
+    """For bulk writes that bypass the ORM: queue these students/companies/drives at commit."""
+    from extensions import db
+    session = session or db.session()
+    session.info.setdefault('recommendations_stale', set()).update((kind, i) for i in ids)
+
+
+def _changed(obj, fields):
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+TRACKED = (
+    (Student, 'student', ELIGIBILITY_FIELDS + ('skills',)),
+    (Company, 'company', ('required_skills',)),
+    (PlacementDrive, 'drive', DRIVE_FIELDS + ('job_description', 'company_id')),
+)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_changes(session, flush_context, instances):
+    stale = session.info.setdefault('recommendations_stale', set())
+    for model, kind, fields in TRACKED:
+        for obj in session.new:
+            if isinstance(obj, model):
+                stale.add((kind, obj))
+        for obj in session.dirty:
+            if isinstance(obj, model) and _changed(obj, fields):
+                stale.add((kind, obj))
+        for obj in session.deleted:
+            if isinstance(obj, model):
+                session.info.setdefault('recommendations_deleted', []).append((kind, obj))
+
+
+def _auto_refresh(app):
+    auto = app.config.get('RECOMMENDATIONS_AUTO_REFRESH')
+    return not app.testing if auto is None else auto
+
+
+@event.listens_for(Session, 'before_commit')
+def _queue_before_commit(session):
+    if not has_app_context():
+        return
+    # commit() only flushes after this hook, so flush now to collect the pending changes
+    session.flush()
+    info = session.info
+    deleted = info.pop('recommendations_deleted', [])
+    for kind, obj in deleted:
+        if kind == 'student':
+            session.execute(delete(Recommendation).where(Recommendation.student_id == obj.id))
+        else:
+            session.execute(delete(Recommendation).where(Recommendation.kind == kind,
+                                                         Recommendation.target_id == obj.id))
+    gone = {(kind, obj.id) for kind, obj in deleted}
+    # Entries hold instances (ORM changes, ids assigned by the flush) or plain ids (bulk writes)
+    stale = {(kind, getattr(obj, 'id', obj)) for kind, obj in info.pop('recommendations_stale', ())} - gone
+    if not stale:
+        return
+
+    now = datetime.utcnow()
+    for kind in ('student', 'company', 'drive'):
+        ids = [i for k, i in stale if k == kind]
+        if ids:
+            session.execute(delete(RecommendationQueue).where(RecommendationQueue.kind == kind,
+                                                              RecommendationQueue.target_id.in_(ids)))
+    session.execute(insert(RecommendationQueue), [{'kind': k, 'target_id': i, 'queued_at': now} for k, i in stale])
+
+    if _auto_refresh(current_app) and not session.query(BackgroundJob.id).filter_by(
+            job_type='recommendations', status='Queued').first():
+        session.add(BackgroundJob(job_type='recommendations', params='{}'))
+        info['recommendations_job_queued'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_workers(session):
+    if session.info.pop('recommendations_job_queued', False) and has_app_context():
+        start_workers(current_app._get_current_object())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    for key in ('recommendations_stale', 'recommendations_deleted', 'recommendations_job_queued'):
+        session.info.pop(key, None)
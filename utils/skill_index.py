@@ -0,0 +1,117 @@
+"""
+Inverted skill index (the student_skills table): canonical skill id ->
+the students listing it.
+
+Student.skills stays a comma list of canonical names (utils/skills.py);
+the index holds one row per (student, skill id), so nothing has to parse
+skill strings at search time. Tech match ranks students from it through
+the sparse matrix in utils/skill_ranking.py.
+
+Rows are rewritten in the same transaction as the change, like the
+eligibility table (utils/eligibility_matrix.py): session events collect
+students whose skills changed (or who were added/deleted) and their
+postings are rebuilt just before commit. The bulk import bypasses the ORM
+and calls mark_skills_stale() with the ids it wrote.
+"""
+from flask import has_app_context
+from sqlalchemy import event, delete, insert, inspect
+from sqlalchemy.orm import Session
+from models import Student, StudentSkill
+from utils.skills import skill_ids
+
+
+def index_students(session, student_ids, batch_size=1000):
+    """Rewrite the postings of the given students from their skills column."""
+    student_ids = sorted(student_ids)
+    written = 0
+    for start in range(0, len(student_ids), batch_size):
+        ids = student_ids[start:start + batch_size]
+        session.execute(delete(StudentSkill).where(StudentSkill.student_id.in_(ids)))
+        students = session.query(Student.id, Student.skills).filter(Student.id.in_(ids)).all()
+        rows = [{'student_id': sid, 'skill_id': skill_id}
+                for sid, skills in students
+                for skill_id in skill_ids(skills, session, create=True)]
+        if rows:
+            session.execute(insert(StudentSkill), rows)
+        written += len(rows)
+    return written
+
+
+def rebuild_skill_index(session):
+    session.execute(delete(StudentSkill))
+    return index_students(session, [sid for (sid,) in session.query(Student.id)])
+
+
+def mark_skills_stale(student_ids, session=None):
+    """For bulk writes that bypass the ORM: reindex these students at commit."""
+    from extensions import db
+    session = session or db.session()
+    session.info.setdefault('skill_index_students', set()).update(student_ids)
+
+
+# -- Searching -------------------------------------------------------------------
+
+def _requested(skills):
+    """{skill id: name as typed} for the requested skills that are registered."""
+    skills = [part.strip() for part in skills if part.strip()]
+    requested = {}
+    for name in skills:
+        ids = skill_ids([name])
+        if ids:
+            requested.setdefault(ids[0], name)
+    return requested
+
+
+def match_companies(companies, skills):
+    """
+    Companies whose required_skills include any of the requested skills, by
+    skill id, best match first: [{'company', 'score', 'matches'}].
+    """
+    requested = _requested(skills)
+    results = []
+    for company in companies:
+        ids = set(skill_ids(company.required_skills))
+        matches = [typed for skill_id, typed in requested.items() if skill_id in ids]
+        if matches:
+            results.append({'company': company, 'score': len(matches), 'matches': matches})
+    return sorted(results, key=lambda r: -r['score'])
+
+
+# -- Change tracking ------------------------------------------------------------
+
+@event.listens_for(Session, 'before_flush')
+def _collect_changes(session, flush_context, instances):
+    students = session.info.setdefault('skill_index_students', set())
+    for obj in session.new:
+        if isinstance(obj, Student):
+            students.add(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Student) and inspect(obj).attrs.skills.history.has_changes():
+            students.add(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Student):
+            session.info.setdefault('skill_index_deleted', []).append(obj)
+
+
+@event.listens_for(Session, 'before_commit')
+def _reindex_before_commit(session):
+    if not has_app_context():
+        return
+    # commit() only flushes after this hook, so flush now to collect the pending changes
+    session.flush()
+    info = session.info
+    deleted = {s.id for s in info.pop('skill_index_deleted', ())}
+    if deleted:
+        session.execute(delete(StudentSkill).where(StudentSkill.student_id.in_(deleted)))
+    # Entries are instances (ORM changes, ids assigned by the flush) or plain ids (bulk writes)
+    stale = {getattr(s, 'id', s) for s in info.pop('skill_index_students', ())} - deleted
+    if stale:
+        index_students(session, stale)
+    if stale or deleted:
+        info['skill_ranking_stale'] = True  # see utils/skill_ranking.py
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    for key in ('skill_index_students', 'skill_index_deleted'):
+        session.info.pop(key, None)
@@ -0,0 +1,194 @@
+"""
+Ranking approved students by how well their skills fit a company or drive.
+
+Each student is a sparse vector over the canonical skills (utils/skills.py),
+weighted by inverse document frequency across the approved students, so a
+rare skill like Kubernetes counts for more than SQL, which everyone lists.
+Rows are L2-normalised; the query (a company's required_skills, the skills
+named in a drive's job_description, or skills typed into tech match) is
+weighted the same way, and the cosine similarity of every student is one
+sparse matrix-vector product. The best K come off a heap.
+
+The matrix is stored CSR-style as NumPy arrays (row pointers, skill
+columns, weights), built with one query over student_skills and cached
+per app. Commits that change postings or which students are approved drop
+it (the bulk status update calls mark_ranking_stale()); SKILL_RANKING_TTL
+bounds staleness across worker processes.
+"""
+import heapq
+import threading
+import time
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import Student, StudentSkill
+from utils.skills import skill_ids, find_skills_in_text
+
+
+class SkillMatrix:
+    def __init__(self, pairs):
+        """pairs: (student_id, skill_id) postings of the approved students, ordered by student."""
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        self.student_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+        self.skills, self.columns = np.unique(pairs[:, 1], return_inverse=True)
+        self.columns = self.columns.ravel()
+        self.skill_columns = {int(skill_id): col for col, skill_id in enumerate(self.skills)}
+        self.rows = rows.ravel()
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(self.rows, minlength=len(self.student_ids)))])
+        self.built_at = time.monotonic()
+
+        # Smoothed IDF over the approved students that list any skill
+        document_frequency = np.bincount(self.columns, minlength=len(self.skills))
+        self.idf = np.log((1 + len(self.student_ids)) / (1 + document_frequency)) + 1
+        weights = self.idf[self.columns]
+        norms = np.sqrt(np.bincount(self.rows, weights=weights ** 2, minlength=len(self.student_ids)))
+        self.weights = weights / norms[self.rows]
+
+    @classmethod
+    def load(cls, session):
+        return cls(session.query(StudentSkill.student_id, StudentSkill.skill_id)
+                   .join(Student, Student.id == StudentSkill.student_id)
+                   .filter(Student.status == 'Approved')
+                   .order_by(StudentSkill.student_id).all())
+
+    def query_vector(self, ids):
+        """IDF-weighted, normalised query over the matrix columns (skills nobody has are dropped)."""
+        query = np.zeros(len(self.skill_columns))
+        for skill_id in ids:
+            col = self.skill_columns.get(skill_id)
+            if col is not None:
+                query[col] = self.idf[col]
+        norm = np.linalg.norm(query)
+        return query / norm if norm else query
+
+    def similarities(self, query):
+        """Cosine similarity of every student to the query: one sparse matrix-vector product."""
+        return np.bincount(self.rows, weights=self.weights * query[self.columns], minlength=len(self.student_ids))
+
+    def similarities_for(self, query, student_ids):
+        """similarities() for the given students, in that order (0 for students without skills)."""
+        student_ids = np.asarray(student_ids, dtype=np.int64)
+        result = np.zeros(len(student_ids))
+        if len(self.student_ids):
+            rows = np.searchsorted(self.student_ids, student_ids)
+            present = self.student_ids[np.minimum(rows, len(self.student_ids) - 1)] == student_ids
+            result[present] = self.similarities(query)[rows[present]]
+        return result
+
+    def top(self, ids, k):
+        """[(similarity, student_id)] of the K most similar students, best first."""
+        scores = self.similarities(self.query_vector(ids))
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            # Cut to K with a partial sort before the heap orders them
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+        return heapq.nlargest(k, ((float(scores[i]), int(self.student_ids[i])) for i in candidates),
+                              key=lambda pair: (pair[0], -pair[1]))
+
+    def dense_rows(self, student_ids):
+        """(len(student_ids), skills) weight matrix for a batch of students; unknown students are zero rows."""
+        student_ids = np.asarray(student_ids, dtype=np.int64)
+        dense = np.zeros((len(student_ids), len(self.skills)))
+        rows = np.searchsorted(self.student_ids, student_ids)
+        for i, row in enumerate(rows):
+            if row < len(self.student_ids) and self.student_ids[row] == student_ids[i]:
+                entries = slice(self.indptr[row], self.indptr[row + 1])
+                dense[i, self.columns[entries]] = self.weights[entries]
+        return dense
+
+    def student_skills(self, student_id):
+        row = np.searchsorted(self.student_ids, student_id)
+        return set(self.skills[self.columns[self.indptr[row]:self.indptr[row + 1]]].tolist())
+
+
+class RankingCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.matrix = None
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, session):
+        matrix = self.matrix
+        if matrix is not None and time.monotonic() - matrix.built_at < self.ttl:
+            return matrix
+        generation = self.generation
+        matrix = SkillMatrix.load(session)
+        with self.lock:
+            # An invalidation while loading means the matrix may already be stale
+            if generation == self.generation:
+                self.matrix = matrix
+        return matrix
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.matrix = None
+
+
+def init_skill_ranking(app):
+    app.extensions['skill_ranking'] = RankingCache(app.config.get('SKILL_RANKING_TTL', 300))
+
+
+def get_matrix():
+    from extensions import db
+    return current_app.extensions['skill_ranking'].get(db.session())
+
+
+def query_skills(skills=None, company=None, drive=None):
+    """Skill ids to rank against: typed skills, a company's required_skills, or a drive's description."""
+    if drive is not None:
+        # Fall back to the company's required skills when the description names none
+        return find_skills_in_text(drive.job_description) or skill_ids(drive.company.required_skills)
+    if company is not None:
+        return skill_ids(company.required_skills)
+    return skill_ids(list(skills or []))
+
+
+def rank_students(ids, k=50):
+    """
+    The K approved students most similar to the given skill ids, best first:
+    [{'student', 'similarity', 'score', 'matches'}], where matches are the
+    query skills the student has (as canonical names) and score their count.
+    """
+    from utils.skills import skill_names
+    if not ids:
+        return []
+    matrix = get_matrix()
+    top = matrix.top(ids, k)
+    students = {s.id: s for s in Student.query.filter(Student.id.in_([sid for _, sid in top]))}
+    results = []
+    for similarity, sid in top:
+        has = matrix.student_skills(sid)
+        matches = skill_names(skill_id for skill_id in dict.fromkeys(ids) if skill_id in has)
+        results.append({'student': students[sid], 'similarity': similarity, 'score': len(matches),
+                        'matches': matches})
+    return results
+
+
+def mark_ranking_stale(session=None):
+    """For bulk writes that bypass the ORM (e.g. approving students): rebuild after commit."""
+    from extensions import db
+    session = session or db.session()
+    session.info['skill_ranking_stale'] = True
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_changes(session, flush_context, instances):
+    # New postings are flagged by utils/skill_index.py; here, who counts as approved
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Student) and (obj in session.deleted or inspect(obj).attrs.status.history.has_changes()):
+            session.info['skill_ranking_stale'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _drop_matrix(session):
+    if session.info.pop('skill_ranking_stale', False) and has_app_context():
+        current_app.extensions['skill_ranking'].invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('skill_ranking_stale', None)
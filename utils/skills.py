@@ -0,0 +1,327 @@
+"""
+Skill registry: canonical skills (the skills table) and the spellings that
+resolve to them (skill_aliases).
+
+Every spelling is reduced to a key by skill_key() - lower-cased, with
+spaces, dots, dashes and underscores dropped - so "React.js", "reactjs"
+and "React JS" share the key 'reactjs', and one alias row maps it to the
+canonical skill (React). Each skill's own key is an alias too, so
+resolving a spelling is a single lookup. Spellings nobody has seen before
+are registered as new skills, named as first typed.
+
+canonicalize() rewrites a comma list to canonical names and runs on
+write: a session event covers Student.skills and Company.required_skills
+(registration, profile and admin edits, company create/edit), and the bulk
+import canonicalizes each chunk itself. Matching then compares skill ids
+(skill_ids()) instead of strings. backfill_skills() converts existing rows
+in batches; run backfill_skills.py once after upgrading.
+
+Lookups go through a per-process cache of committed aliases. New skills
+are inserted straight away in a savepoint, so two requests registering the
+same spelling don't fail on the alias key: the loser uses the winner's
+skill. They are kept on the session and join the cache when it commits.
+"""
+import re
+import threading
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import Student, Company, Skill, SkillAlias
+
+KEY_MAX_LENGTH = SkillAlias.__table__.c.key.type.length
+
+# Canonical name -> common alternative spellings. Spellings that differ only
+# in case, spacing or punctuation ("Node JS", "node.js") need no entry.
+SEED_SKILLS = {
+    'Python': ['python3', 'py'],
+    'Java': ['core java', 'java se'],
+    'JavaScript': ['js', 'ecmascript', 'es6'],
+    'TypeScript': ['ts'],
+    'C': ['c language', 'c programming'],
+    'C++': ['cpp', 'c plus plus'],
+    'C#': ['csharp', 'c sharp'],
+    'HTML': ['html5'],
+    'CSS': ['css3'],
+    'React': ['reactjs', 'react js'],
+    'Angular': ['angularjs'],
+    'Vue.js': ['vue', 'vuejs'],
+    'Node.js': ['node', 'nodejs'],
+    'Express.js': ['express', 'expressjs'],
+    'Django': [],
+    'Flask': [],
+    'Spring Boot': ['spring', 'springboot'],
+    'PHP': [],
+    'SQL': [],
+    'MySQL': [],
+    'PostgreSQL': ['postgres', 'psql'],
+    'MongoDB': ['mongo'],
+    'Git': ['github', 'git/github'],
+    'Docker': [],
+    'Kubernetes': ['k8s'],
+    'AWS': ['amazon web services'],
+    'Linux': [],
+    'Machine Learning': ['ml'],
+    'Artificial Intelligence': ['ai'],
+    'Data Structures': ['dsa', 'data structures and algorithms'],
+    'Android': ['android development'],
+    'AutoCAD': ['auto cad'],
+    'MS Office': ['microsoft office', 'ms-office'],
+    'Excel': ['ms excel', 'microsoft excel'],
+}
+
+
+def skill_key(text):
+    """Lookup key of a spelling: 'React.js ' -> 'reactjs' (+ and # kept for C++/C#)."""
+    return re.sub(r'[\s._-]+', '', (text or '').lower())[:KEY_MAX_LENGTH]
+
+
+def split_skills(text):
+    return [part.strip() for part in (text or '').split(',') if part.strip()]
+
+
+class SkillRegistry:
+    """Per-process cache of committed aliases: key -> skill id, and id -> name."""
+
+    def __init__(self):
+        self.aliases = None
+        self.names = {}
+        self.lock = threading.Lock()
+
+    def find(self, session, keys):
+        """{key: skill id} for the keys that are registered (misses are looked up once in the database)."""
+        with self.lock:
+            if self.aliases is None:
+                self.aliases = dict(session.query(SkillAlias.key, SkillAlias.skill_id))
+                self.names = dict(session.query(Skill.id, Skill.name))
+            found = {key: self.aliases[key] for key in keys if key in self.aliases}
+        missing = [key for key in keys if key not in found]
+        if missing:
+            # Registered by another process since the cache was loaded
+            rows = session.query(SkillAlias.key, Skill.id, Skill.name).join(Skill) \
+                .filter(SkillAlias.key.in_(missing)).all()
+            self.add(rows)
+            found.update((key, skill_id) for key, skill_id, _ in rows)
+        return found
+
+    def add(self, rows):
+        with self.lock:
+            if self.aliases is None:
+                return
+            for key, skill_id, name in rows:
+                self.aliases[key] = skill_id
+                self.names[skill_id] = name
+
+    def clear(self):
+        with self.lock:
+            self.aliases = None
+            self.names = {}
+
+
+def init_skill_registry(app):
+    app.extensions['skill_registry'] = SkillRegistry()
+
+
+def get_registry():
+    return current_app.extensions['skill_registry']
+
+
+def _register(session, key, name):
+    """
+    Insert a skill and its alias for an unseen key, in a savepoint on the
+    session's connection (this runs during flushes too, so not through the
+    ORM). If another transaction registered the key first, theirs is used.
+    Returns (skill id, name).
+    """
+    conn = session.connection()
+    if conn.dialect.name == 'sqlite' and not conn.connection.driver_connection.in_transaction:
+        # pysqlite only opens its transaction before DML; a SAVEPOINT outside
+        # one would start (and on release, commit) a transaction of its own
+        conn.exec_driver_sql('BEGIN')
+    try:
+        with conn.begin_nested():
+            skill_id = conn.execute(insert(Skill).values(name=name, created_at=datetime.utcnow())) \
+                .inserted_primary_key[0]
+            conn.execute(insert(SkillAlias).values(key=key, skill_id=skill_id))
+    except IntegrityError:
+        return tuple(conn.execute(select(Skill.id, Skill.name).join(SkillAlias)
+                                  .where(SkillAlias.key == key)).one())
+    return skill_id, name
+
+
+def _resolve(session, names, create):
+    """
+    The distinct skill ids named, in order. Unknown names are registered
+    when create is set and skipped otherwise.
+    """
+    typed = {}
+    for name in names:
+        key = skill_key(name)
+        if key:
+            typed.setdefault(key, ' '.join(name.split()))
+    pending = session.info.setdefault('skill_registry_new', {})  # key -> (id, name), not yet committed
+    found = get_registry().find(session, [key for key in typed if key not in pending])
+
+    ids = []
+    for key, name in typed.items():
+        skill_id = found.get(key) or pending.get(key, (None,))[0]
+        if skill_id is None:
+            if not create:
+                continue
+            pending[key] = _register(session, key, name[:Skill.__table__.c.name.type.length])
+            skill_id = pending[key][0]
+        if skill_id not in ids:
+            ids.append(skill_id)
+    return ids
+
+
+def canonicalize(text, session=None, create=True):
+    """'reactjs, Python3 ,sql' -> 'React, Python, SQL' (None when no skills are listed)."""
+    from extensions import db
+    session = session or db.session()
+    ids = _resolve(session, split_skills(text), create)
+    names = dict(get_registry().names)
+    names.update(session.info.get('skill_registry_new', {}).values())
+    return ', '.join(names.get(skill_id, '') for skill_id in ids) or None
+
+
+def skill_ids(text_or_names, session=None, create=False):
+    """Skill ids of a comma list (or list of names); unknown skills are skipped unless create is set."""
+    from extensions import db
+    session = session or db.session()
+    names = split_skills(text_or_names) if isinstance(text_or_names, str) or text_or_names is None \
+        else text_or_names
+    return _resolve(session, names, create)
+
+
+def find_skills_in_text(text, session=None, max_words=3):
+    """
+    Registered skills mentioned in free text (e.g. a job description), as
+    ids in order of appearance. Longest phrase wins: "Spring Boot" is one
+    skill, not Spring plus an unknown "Boot".
+    """
+    from extensions import db
+    session = session or db.session()
+    words = re.findall(r'[\w+#.-]+', text or '')
+    phrases = {}
+    for start in range(len(words)):
+        for n in range(1, max_words + 1):
+            if start + n <= len(words):
+                phrases[(start, n)] = skill_key(''.join(words[start:start + n]))
+    found = get_registry().find(session, list({key for key in phrases.values() if key}))
+
+    ids, start = [], 0
+    while start < len(words):
+        for n in range(max_words, 0, -1):
+            skill_id = found.get(phrases.get((start, n)))
+            if skill_id is not None:
+                if skill_id not in ids:
+                    ids.append(skill_id)
+                start += n
+                break
+        else:
+            start += 1
+    return ids
+
+
+def skill_names(ids):
+    from extensions import db
+    registry = get_registry()
+    registry.find(db.session(), [])  # loads the cache on first use
+    return [registry.names.get(skill_id, '') for skill_id in ids]
+
+
+def seed_skills(session):
+    """Register SEED_SKILLS; an alias already pointing elsewhere is moved to the seeded skill."""
+    created = 0
+    for name, spellings in SEED_SKILLS.items():
+        key = skill_key(name)
+        alias = session.get(SkillAlias, key)
+        if alias is None:
+            skill = Skill(name=name, aliases=[SkillAlias(key=key)])
+            session.add(skill)
+            created += 1
+        else:
+            skill = alias.skill
+            skill.name = name
+        for spelling in spellings:
+            spelling_key = skill_key(spelling)
+            existing = session.get(SkillAlias, spelling_key)
+            if existing is None:
+                skill.aliases.append(SkillAlias(key=spelling_key))
+            elif existing.skill is not skill:
+                existing.skill = skill
+        session.flush()
+    session.info['skill_registry_reset'] = True
+    return created
+
+
+def backfill_skills(session, batch_size=500, on_progress=None):
+    """
+    Canonicalize Student.skills and Company.required_skills written before
+    the registry existed, batch by batch (one commit each), and reindex the
+    students. Bulk updates, so the per-row session events are not involved.
+    """
+    from utils.skill_index import index_students
+    counts = {'students': 0, 'companies': 0, 'changed': 0}
+    for model, column, label in ((Student, Student.skills, 'students'), (Company, Company.required_skills, 'companies')):
+        last_id = 0
+        while True:
+            rows = session.query(model.id, column).filter(model.id > last_id).order_by(model.id) \
+                .limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            changes = []
+            for row_id, text in rows:
+                canonical = canonicalize(text, session)
+                if canonical != text:
+                    changes.append({'id': row_id, column.key: canonical})
+            session.flush()  # skills registered by this batch
+            if changes:
+                session.execute(update(model), changes)
+            if model is Student:
+                index_students(session, [row_id for row_id, _ in rows])
+            session.commit()
+            counts[label] += len(rows)
+            counts['changed'] += len(changes)
+            if on_progress:
+                on_progress(counts)
+    return counts
+
+
+# -- Normalise on write -----------------------------------------------------------
+
+CANONICAL_COLUMNS = ((Student, 'skills'), (Company, 'required_skills'))
+
+
+@event.listens_for(Session, 'before_flush')
+def _canonicalize_on_write(session, flush_context, instances):
+    if not has_app_context():
+        return
+    for obj in list(session.new) + list(session.dirty):
+        for model, attr in CANONICAL_COLUMNS:
+            if isinstance(obj, model) and inspect(obj).attrs[attr].history.has_changes():
+                value = getattr(obj, attr)
+                canonical = canonicalize(value, session)
+                if canonical != value:
+                    setattr(obj, attr, canonical)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_new_skills(session):
+    pending = session.info.pop('skill_registry_new', None)
+    reset = session.info.pop('skill_registry_reset', False)
+    if not has_app_context():
+        return
+    if reset:
+        get_registry().clear()
+    elif pending:
+        get_registry().add((key, skill_id, name) for key, (skill_id, name) in pending.items())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_new_skills(session):
+    session.info.pop('skill_registry_new', None)
+    session.info.pop('skill_registry_reset', None)
@@ -0,0 +1,563 @@
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, update, delete
+from extensions import db
+from models import Student, Backlog
+from utils.password_hashing import hash_passwords
+from utils.eligibility_matrix import mark_students_stale, ELIGIBILITY_FIELDS
+from utils.skill_index import mark_skills_stale
+from utils.recommendations import mark_recommendations_stale
+from utils.skills import canonicalize
+
+# Text columns copied as-is from the sheet onto the Student row
+TEXT_COLUMNS = {
+    'name': 'name',
+    'mobile': 'mobile',
+    'department': 'department',
+    'skills': 'skills',
+    'projects': 'projects_internship',
+}
+
+NUMERIC_COLUMNS = ['semester', 'tenth_marks', 'twelfth_marks', 'cgpa']
+INTEGER_COLUMNS = {'semester'}
+
+# Integer cells must fit a 32-bit INTEGER column (PostgreSQL's range)
+INTEGER_LIMIT = 2 ** 31
+
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+
+# Columns of the error sheet produced by validate_import()
+ISSUE_COLUMNS = ['Row', 'Roll No', 'Email', 'Severity', 'Issue']
+
+
+def _fingerprints(rows):
+    """
+    Content hash of each row's imported columns (after normalisation, so
+    "8.50" and "8.5" or stray whitespace don't count as changes).
+    """
+    parts = [rows['roll_no'].astype(str), rows['email'].astype(str), rows['backlogs'].astype(str)]
+    parts += [rows[col].astype(str) for col in TEXT_COLUMNS]
+    parts += [pd.Series(rows[col], dtype='float64').astype(str) for col in NUMERIC_COLUMNS]
+    joined = parts[0].str.cat(parts[1:], sep='\x1f', na_rep='')
+    return joined.map(lambda s: hashlib.sha1(s.encode('utf-8')).hexdigest())
+
+
+def _text(df, col):
+    """Column as stripped strings, with blanks/NaN turned into None."""
+    if col not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    s = df[col].astype('string').str.strip()
+    s = s.mask(s == '')
+    return s.astype(object).where(s.notna(), None)
+
+
+def _number(text, integer=False):
+    """
+    Coerce a text column to numbers. Returns (values, invalid_mask); values
+    that are not finite, or out of range for an integer column, are invalid.
+    """
+    values = pd.to_numeric(text, errors='coerce').astype('float64')
+    usable = pd.Series(np.isfinite(values), index=text.index)
+    if integer:
+        usable &= values.abs() < INTEGER_LIMIT
+    invalid = text.notna() & ~usable
+    return values.astype(object).where(usable, None), invalid
+
+
+def _integer(value):
+    """int() of a cell value, raising OverflowError when it doesn't fit an INTEGER column."""
+    number = int(value)
+    if not -INTEGER_LIMIT < number < INTEGER_LIMIT:
+        raise OverflowError(f'{number} is out of range')
+    return number
+
+
+def _parse_backlogs(raw):
+    """
+    Backlogs cell can be a count ("2") or JSON details
+    ('[{"subject": "Maths", "semester": 3}]').
+    Returns (count, details) where details is None unless JSON was given.
+    Raises ValueError, TypeError or OverflowError for a count or semester
+    that isn't a usable integer.
+    """
+    if raw is None:
+        return 0, None
+    if raw.startswith('['):
+        entries = None
+        if raw.endswith(']'):
+            try:
+                entries = json.loads(raw)
+            except ValueError:
+                pass
+        if isinstance(entries, list):
+            details = [
+                {'subject_name': str(e['subject']), 'semester': _integer(e['semester'])}
+                for e in entries
+                if isinstance(e, dict) and 'subject' in e and 'semester' in e
+            ]
+            if details:
+                return len(details), details
+        return 0, None
+    return _integer(float(raw)), None
+
+
+def _prepare_rows(df, first_row):
+    """Vectorized normalisation and validation of a sheet/chunk."""
+    df = df.reset_index(drop=True)
+    if 'cgpa' not in df.columns and 'aggregate_cpi' in df.columns:
+        df = df.rename(columns={'aggregate_cpi': 'cgpa'})
+
+    rows = pd.DataFrame(index=df.index)
+    rows['row_num'] = df.index + first_row
+    # Blank lines (e.g. trailing empty rows in a sheet) are ignored but
+    # still count towards the row numbers reported in errors.
+    blank = df.isna().all(axis=1)
+    if blank.any():
+        df, rows = df[~blank], rows[~blank]
+    rows['roll_no'] = _text(df, 'roll_no')
+    email = _text(df, 'email')
+    rows['email'] = email.where(email.isna(), email.str.lower())
+    for col in TEXT_COLUMNS:
+        rows[col] = _text(df, col)
+    rows['backlogs'] = _text(df, 'backlogs')
+
+    error = pd.Series([None] * len(df), index=df.index, dtype=object)
+    for col in reversed(NUMERIC_COLUMNS):
+        raw = _text(df, col)
+        rows[col], invalid = _number(raw, integer=col in INTEGER_COLUMNS)
+        error = error.mask(invalid, "Invalid value '" + raw.astype(str) + "' for " + col + ".")
+
+    # Backlogs are parsed here, row by row, so a bad cell is a row error in
+    # the import and in validate_import() alike
+    counts, details, bad_backlogs = [], [], []
+    for raw in rows['backlogs']:
+        try:
+            count, detail = _parse_backlogs(raw)
+        except (ValueError, TypeError, OverflowError):
+            count, detail = 0, None
+            bad_backlogs.append(True)
+        else:
+            bad_backlogs.append(False)
+        counts.append(count)
+        details.append(detail)
+    rows['backlog_count'] = counts
+    rows['backlog_details'] = pd.Series(details, index=rows.index, dtype=object)
+    bad_backlogs = pd.Series(bad_backlogs, index=rows.index, dtype=bool)
+    error = error.mask(bad_backlogs, "Invalid value '" + rows['backlogs'].astype(str) + "' for backlogs.")
+
+    bad_email = rows['email'].isna() | ~rows['email'].str.match(EMAIL_PATTERN, na=False)
+    error = error.mask(bad_email, "Invalid email '" + rows['email'].fillna('').astype(str) + "'.")
+
+    rows['error'] = error
+    rows['missing_roll'] = rows['roll_no'].isna()
+    rows['fingerprint'] = _fingerprints(rows)
+    return rows
+
+
+class StudentImporter:
+    """
+    Set-based student import.
+
+    Existing roll_no/email mappings are loaded once, the sheet is validated
+    column-wise with pandas, and inserts/updates are written as batched
+    executemany statements instead of one ORM flush per row.
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+        self.rows_read = 0
+        self.progress = []  # one entry per committed chunk
+        self.seen_rolls = set()  # roll numbers already handled earlier in this file
+
+        # roll_no -> id, roll_no -> email, email -> roll_no, roll_no -> fingerprint of last import
+        self.roll_ids = {}
+        self.roll_emails = {}
+        self.email_owners = {}
+        self.fingerprints = {}
+        for sid, roll_no, email, fingerprint in db.session.query(
+                Student.id, Student.roll_no, Student.email, Student.import_fingerprint):
+            self.roll_ids[roll_no] = sid
+            self.roll_emails[roll_no] = email
+            self.email_owners[email] = roll_no
+            if fingerprint:
+                self.fingerprints[roll_no] = fingerprint
+
+    def summary(self):
+        return {'inserted': self.inserted, 'updated': self.updated, 'unchanged': self.unchanged,
+                'errors': self.errors,
+                'rows': self.rows_read, 'chunks': len(self.progress)}
+
+    def import_frame(self, df, first_row=2):
+        """Validate, classify and write one DataFrame (or chunk) of students."""
+        rows = _prepare_rows(df, first_row)
+        # Canonical skill names (utils/skills.py), resolved once per distinct spelling
+        canonical = {text: canonicalize(text) for text in rows['skills'].dropna().unique()}
+        rows['skills'] = [canonical.get(text) for text in rows['skills']]
+        inserts = {}   # roll_no -> insert record
+        updates = {}   # student id -> changed columns
+        backlog_sets = {}  # roll_no -> Backlog details replacing existing ones (or [] to clear)
+
+        for r in rows.to_dict('records'):
+            row_num, roll_no, email = r['row_num'], r['roll_no'], r['email']
+            if r['missing_roll']:
+                self.errors.append(f"Row {row_num}: Roll number missing.")
+                continue
+            if r['error']:
+                self.errors.append(f"Row {row_num} (Roll {roll_no}): {r['error']}")
+                continue
+
+            # Same content as the last import of this roll_no: nothing to write. Only the
+            # first row of a roll is compared; a roll repeated in the file updates as before.
+            first_in_file = roll_no not in self.seen_rolls
+            self.seen_rolls.add(roll_no)
+            if first_in_file and r['fingerprint'] == self.fingerprints.get(roll_no):
+                self.unchanged += 1
+                continue
+
+            owner = self.email_owners.get(email)
+            known = roll_no in self.roll_ids or roll_no in inserts
+
+            if not known:
+                if owner:
+                    self.errors.append(f"Row {row_num} (Roll {roll_no}): Email '{email}' already registered to Roll {owner}.")
+                    continue
+                backlogs, details = r['backlog_count'], r['backlog_details']
+                inserts[roll_no] = {
+                    'row_num': row_num,
+                    'roll_no': roll_no,
+                    'name': r['name'] or '',
+                    'email': email,
+                    'mobile': r['mobile'] or '',
+                    'department': r['department'] or 'IT',
+                    'semester': int(r['semester'] or 1),  # range-checked in _prepare_rows
+                    'tenth_marks': float(r['tenth_marks'] or 0),
+                    'twelfth_marks': float(r['twelfth_marks'] or 0),
+                    'cgpa': 0.0 if backlogs > 0 else float(r['cgpa'] or 0),
+                    'backlogs': backlogs,
+                    'skills': r['skills'],
+                    'projects_internship': r['projects'],
+                    'is_password_changed': False,
+                    'is_email_verified': False,
+                    'import_fingerprint': r['fingerprint'],
+                }
+                if details:
+                    backlog_sets[roll_no] = details
+                self.roll_emails[roll_no] = email
+                self.email_owners[email] = roll_no
+                self.fingerprints[roll_no] = r['fingerprint']
+                self.inserted += 1
+                continue
+
+            if owner and owner != roll_no:
+                self.errors.append(f"Row {row_num} (Roll {roll_no}): Cannot update email to '{email}'. Already used by Roll {owner}.")
+                continue
+
+            changes = {'email': email, 'import_fingerprint': r['fingerprint']}
+            for col, attr in TEXT_COLUMNS.items():
+                if r[col] is not None:
+                    changes[attr] = r[col]
+            if r['semester'] is not None:
+                changes['semester'] = int(r['semester'])
+            for col in ('tenth_marks', 'twelfth_marks'):
+                if r[col] is not None:
+                    changes[col] = float(r[col])
+
+            # Mutual exclusivity: a positive CGPA clears backlogs, otherwise
+            # a non-zero backlogs cell clears CGPA.
+            backlogs, details = r['backlog_count'], r['backlog_details']
+            if r['cgpa'] is not None and r['cgpa'] > 0:
+                changes['cgpa'] = float(r['cgpa'])
+                changes['backlogs'] = 0
+                backlog_sets[roll_no] = []
+            elif backlogs:
+                changes['cgpa'] = None
+                changes['backlogs'] = backlogs
+                if details:
+                    backlog_sets[roll_no] = details
+
+            old_email = self.roll_emails.get(roll_no)
+            if old_email != email:
+                self.email_owners.pop(old_email, None)
+                self.email_owners[email] = roll_no
+                self.roll_emails[roll_no] = email
+
+            if roll_no in inserts:
+                inserts[roll_no].update(changes)
+            else:
+                updates.setdefault(self.roll_ids[roll_no], {'row_num': row_num, 'roll_no': roll_no}).update(changes)
+            self.fingerprints[roll_no] = r['fingerprint']
+            self.updated += 1
+
+        failed = self._write_inserts(list(inserts.values())) | self._write_updates(list(updates.items()))
+        # A rejected row keeps its old backlogs too
+        self._write_backlogs({roll_no: details for roll_no, details in backlog_sets.items() if roll_no not in failed})
+
+    def _batches(self, items):
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def _fail_batch(self, records, exc, label, counter):
+        for rec in records:
+            self.errors.append(f"Row {rec['row_num']} (Roll {rec['roll_no']}): {label} - {exc}")
+        setattr(self, counter, getattr(self, counter) - len(records))
+
+    def _execute_batch(self, statement, records, params, label, counter):
+        """
+        Run one executemany in a savepoint. If the database rejects it, the
+        rows are retried one by one so only the failing ones are reported.
+        Returns the records that were written.
+        """
+        try:
+            with db.session.begin_nested():
+                db.session.execute(statement, params)
+            return records
+        except Exception:
+            pass
+        written = []
+        for rec, row_params in zip(records, params):
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(statement, [row_params])
+            except Exception as e:
+                self._fail_batch([rec], e, label, counter)
+            else:
+                written.append(rec)
+        return written
+
+    def _write_inserts(self, records):
+        """Insert the new students; returns the roll numbers that failed."""
+        failed = set()
+        for batch in self._batches(records):
+            # Default password: roll_no@password, hashed across the worker pool
+            hashes = hash_passwords([f"{rec['roll_no']}@password" for rec in batch])
+            params = [
+                dict({k: v for k, v in rec.items() if k != 'row_num'}, password_hash=password_hash)
+                for rec, password_hash in zip(batch, hashes)
+            ]
+            written = self._execute_batch(insert(Student), batch, params, 'DB Error', 'inserted')
+            written_rolls = {rec['roll_no'] for rec in written}
+            for rec in batch:
+                if rec['roll_no'] not in written_rolls:
+                    failed.add(rec['roll_no'])
+                    self.roll_emails.pop(rec['roll_no'], None)
+                    self.email_owners.pop(rec['email'], None)
+                    self.fingerprints.pop(rec['roll_no'], None)
+            if not written:
+                continue
+
+            rolls = [rec['roll_no'] for rec in written]
+            inserted_ids = []
+            for sid, roll_no in db.session.query(Student.id, Student.roll_no).filter(Student.roll_no.in_(rolls)):
+                self.roll_ids[roll_no] = sid
+                inserted_ids.append(sid)
+            mark_students_stale(inserted_ids)
+            mark_skills_stale(inserted_ids)
+            mark_recommendations_stale('student', inserted_ids)
+        return failed
+
+    def _write_updates(self, items):
+        """Update the existing students; returns the roll numbers that failed."""
+        failed = set()
+        for batch in self._batches(items):
+            params = [
+                dict({k: v for k, v in changes.items() if k not in ('row_num', 'roll_no')}, id=sid)
+                for sid, changes in batch
+            ]
+            written = self._execute_batch(update(Student), [changes for _, changes in batch], params,
+                                          'Update Error', 'updated')
+            written_rolls = {changes['roll_no'] for changes in written}
+            for _, changes in batch:
+                if changes['roll_no'] not in written_rolls:
+                    failed.add(changes['roll_no'])
+                    self.fingerprints.pop(changes['roll_no'], None)
+            batch = [(sid, changes) for sid, changes in batch if changes['roll_no'] not in failed]
+            mark_students_stale(sid for sid, changes in batch if changes.keys() & set(ELIGIBILITY_FIELDS))
+            mark_skills_stale(sid for sid, changes in batch if 'skills' in changes)
+            mark_recommendations_stale('student', (sid for sid, changes in batch
+                                                   if 'skills' in changes or changes.keys() & set(ELIGIBILITY_FIELDS)))
+        return failed
+
+    def _write_backlogs(self, backlog_sets):
+        student_ids = [self.roll_ids[r] for r in backlog_sets if r in self.roll_ids]
+        for ids in self._batches(student_ids):
+            db.session.execute(delete(Backlog).where(Backlog.student_id.in_(ids)))
+
+        rows = [
+            dict(entry, student_id=self.roll_ids[roll_no])
+            for roll_no, details in backlog_sets.items() if roll_no in self.roll_ids
+            for entry in details
+        ]
+        for batch in self._batches(rows):
+            db.session.execute(insert(Backlog), batch)
+
+
+def read_import_chunks(path, chunk_size):
+    """
+    Stream an uploaded sheet as (first_row, DataFrame) chunks of at most
+    chunk_size rows, all cells as text. CSV uses pandas' chunked reader and
+    .xlsx uses openpyxl's read-only row iterator, so memory stays bounded by
+    the chunk size rather than the file size.
+    """
+    lower = path.lower()
+    if lower.endswith('.csv'):
+        first_row = 2
+        for chunk in pd.read_csv(path, dtype=str, chunksize=chunk_size):
+            yield first_row, chunk
+            first_row += len(chunk)
+
+    elif lower.endswith('.xlsx'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = ['' if c is None else str(c).strip() for c in header]
+            first_row, batch = 2, []
+            for values in rows:
+                batch.append([None if v is None else str(v) for v in values[:len(columns)]])
+                if len(batch) == chunk_size:
+                    yield first_row, pd.DataFrame(batch, columns=columns, dtype=object)
+                    first_row += len(batch)
+                    batch = []
+            if batch:
+                yield first_row, pd.DataFrame(batch, columns=columns, dtype=object)
+        finally:
+            workbook.close()
+
+    else:
+        # Legacy .xls has no streaming reader; load it in one go.
+        yield 2, pd.read_excel(path, dtype=str)
+
+
+def count_import_rows(path):
+    """Cheap data-row count used for progress percentages (None if unknown)."""
+    lower = path.lower()
+    if lower.endswith('.csv'):
+        lines = 0
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                lines += block.count(b'\n')
+        return max(lines - 1, 0)
+    if lower.endswith('.xlsx'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True)
+        try:
+            max_row = workbook.active.max_row
+        finally:
+            workbook.close()
+        return max_row - 1 if max_row else None
+    return None
+
+
+def run_import(path, importer, chunk_size, on_progress=None):
+    """
+    Import a file chunk by chunk, committing after each one. Progress for
+    every committed chunk is appended to importer.progress and passed to
+    on_progress(entry) if given.
+    """
+    for first_row, chunk in read_import_chunks(path, chunk_size):
+        if 'roll_no' not in chunk.columns:
+            importer.errors.append("Missing required column 'roll_no'.")
+            break
+        importer.import_frame(chunk, first_row=first_row)
+        db.session.commit()
+
+        importer.rows_read += len(chunk)
+        entry = {
+            'chunk': len(importer.progress) + 1,
+            'rows': importer.rows_read,
+            'inserted': importer.inserted,
+            'updated': importer.updated,
+            'errors': len(importer.errors),
+        }
+        importer.progress.append(entry)
+        if on_progress:
+            on_progress(entry)
+    return importer.summary()
+
+
+def _issues(rows, mask, severity, message):
+    """Issue-sheet records for the rows selected by mask."""
+    hit = rows[mask]
+    if isinstance(message, pd.Series):
+        message = message[mask]
+    return pd.DataFrame({
+        'Row': hit['row_num'],
+        'Roll No': hit['roll_no'],
+        'Email': hit['email'],
+        'Severity': severity,
+        'Issue': message,
+    })
+
+
+def validate_import(path, chunk_size=5000):
+    """
+    Dry run of an import: applies every row check the importer would (the
+    same _prepare_rows() coercion and range checks), without writing
+    anything. All checks are column operations over the
+    whole file, so every problem is reported at once rather than the
+    importer stopping on them row by row.
+
+    Returns (summary, issues) where issues is a DataFrame with
+    ISSUE_COLUMNS, sorted by row.
+    """
+    keep = ['row_num', 'roll_no', 'email', 'cgpa', 'backlog_count', 'error', 'missing_roll']
+    chunks = []
+    for first_row, chunk in read_import_chunks(path, chunk_size):
+        if 'roll_no' not in chunk.columns:
+            issues = pd.DataFrame([{'Row': 1, 'Roll No': None, 'Email': None, 'Severity': 'Error',
+                                    'Issue': "Missing required column 'roll_no'."}], columns=ISSUE_COLUMNS)
+            return {'rows': 0, 'valid': 0, 'errors': 1, 'warnings': 0}, issues
+        chunks.append(_prepare_rows(chunk, first_row)[keep])
+    rows = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=keep)
+
+    found = [
+        _issues(rows, rows['missing_roll'], 'Error', 'Roll number missing.'),
+        _issues(rows, rows['error'].notna() & ~rows['missing_roll'], 'Error', rows['error']),
+    ]
+    checked = rows['email'].notna() & ~rows['missing_roll']
+
+    # The first roll_no to use an email in the file owns it; any other roll
+    # with the same email is rejected (repeating a roll_no is an update).
+    first_roll = rows[checked].groupby('email')['roll_no'].transform('first')
+    in_file = checked & rows['roll_no'].ne(first_roll.reindex(rows.index))
+    found.append(_issues(rows, in_file, 'Error',
+                         "Email '" + rows['email'].astype(str) + "' repeated in file for Roll "
+                         + first_roll.reindex(rows.index).astype(str) + "."))
+
+    # Emails already registered to a different roll number
+    emails = rows.loc[checked, 'email'].unique().tolist()
+    owners = {}
+    for start in range(0, len(emails), 500):
+        owners.update(db.session.query(Student.email, Student.roll_no)
+                      .filter(Student.email.in_(emails[start:start + 500])))
+    owner = rows['email'].map(owners)
+    in_db = checked & owner.notna() & owner.ne(rows['roll_no'])
+    found.append(_issues(rows, in_db, 'Error',
+                         "Email '" + rows['email'].astype(str) + "' already registered to Roll "
+                         + owner.astype(str) + "."))
+
+    # CGPA and backlogs are mutually exclusive; the importer keeps one of them.
+    has_backlogs = rows['backlog_count'] > 0
+    has_cgpa = pd.to_numeric(rows['cgpa'], errors='coerce').fillna(0) > 0
+    found.append(_issues(rows, has_cgpa & has_backlogs & rows['error'].isna() & ~rows['missing_roll'], 'Warning',
+                         'Both CGPA and backlogs given; new students keep backlogs '
+                         '(CGPA 0), existing students keep CGPA (backlogs cleared).'))
+
+    issues = pd.concat(found, ignore_index=True).sort_values('Row', kind='stable').reset_index(drop=True)
+    errors = issues.loc[issues['Severity'] == 'Error', 'Row'].nunique()
+    summary = {
+        'rows': len(rows),
+        'valid': len(rows) - errors,
+        'errors': int(errors),
+        'warnings': int((issues['Severity'] == 'Warning').sum()),
+    }
+    return summary, issues
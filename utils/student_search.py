@@ -0,0 +1,107 @@
+"""
+Full-text search over students' name, roll number and email for the admin
+student list.
+
+The database keeps the index itself, so every write path is covered
+(ORM edits, registration, bulk import, raw UPDATEs):
+  - SQLite: an FTS5 table over the students table (external content, so
+    the text is not stored twice), synced by triggers
+  - PostgreSQL: a GIN index on the students' tsvector expression
+Both are created with the students table; init_db.py adds them to
+existing databases and fills a new SQLite one (ensure_student_search()).
+
+Matching is by word prefix: every word typed must start a word of the
+name, roll number or email ("ali kum" finds "Alice Kumar", "alice@"
+finds alice@college.edu), and results are ranked by relevance (bm25 /
+ts_rank). Other databases fall back to the old substring filter.
+"""
+import re
+from sqlalchemy import DDL, event, func, literal_column, text, or_, table, column
+from models import Student
+
+FTS_TABLE = 'student_search'
+fts = table(FTS_TABLE, column('rowid'), column('rank'))
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, roll_no, email, content='students', content_rowid='id', prefix='2 3')",
+    f"""CREATE TRIGGER IF NOT EXISTS students_search_ai AFTER INSERT ON students BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, roll_no, email) VALUES (new.id, new.name, new.roll_no, new.email);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS students_search_ad AFTER DELETE ON students BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, roll_no, email)
+        VALUES ('delete', old.id, old.name, old.roll_no, old.email);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS students_search_au AFTER UPDATE OF name, roll_no, email ON students BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, roll_no, email)
+        VALUES ('delete', old.id, old.name, old.roll_no, old.email);
+        INSERT INTO {FTS_TABLE}(rowid, name, roll_no, email) VALUES (new.id, new.name, new.roll_no, new.email);
+    END""",
+]
+
+# The same expression is indexed and queried, so the planner can use the index
+POSTGRES_DOCUMENT = ("to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(roll_no, '') || ' ' "
+                     "|| coalesce(email, ''))")
+POSTGRES_DDL = [f"CREATE INDEX IF NOT EXISTS ix_students_search ON students USING gin (({POSTGRES_DOCUMENT}))"]
+
+for _statement in SQLITE_DDL:
+    event.listen(Student.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in POSTGRES_DDL:
+    event.listen(Student.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+# Triggers go with the students table; the FTS table has to be dropped explicitly
+event.listen(Student.__table__, 'before_drop',
+             DDL(f'DROP TABLE IF EXISTS {FTS_TABLE}').execute_if(dialect='sqlite'))
+
+
+def _words(search):
+    return re.findall(r'\w+', search.lower())
+
+
+def search_students(query, search):
+    """
+    Narrow a Student query to matches for the search text, best first.
+    Returns the query unchanged for blank searches.
+    """
+    words = _words(search)
+    if not words:
+        return query
+    dialect = query.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # Each word quoted (no FTS syntax from user input) and prefix-matched; terms are ANDed
+        match = ' '.join(f'"{word}"*' for word in words)
+        return query.join(fts, fts.c.rowid == Student.id) \
+            .filter(literal_column(FTS_TABLE).op('MATCH')(match)).order_by(fts.c.rank)
+    if dialect == 'postgresql':
+        document = literal_column(POSTGRES_DOCUMENT)
+        ts_query = func.to_tsquery('simple', ' & '.join(f'{word}:*' for word in words))
+        return query.filter(document.op('@@')(ts_query)).order_by(func.ts_rank(document, ts_query).desc())
+    pattern = f'%{search}%'
+    return query.filter(or_(Student.name.ilike(pattern), Student.roll_no.ilike(pattern), Student.email.ilike(pattern)))
+
+
+def search_rank(search):
+    """The relevance search_students() orders by, as an ascending sort key (None when not searching)."""
+    words = _words(search)
+    if not words:
+        return None
+    from extensions import db
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return fts.c.rank
+    if dialect == 'postgresql':
+        ts_query = func.to_tsquery('simple', ' & '.join(f'{word}:*' for word in words))
+        return -func.ts_rank(literal_column(POSTGRES_DOCUMENT), ts_query)
+    return None
+
+
+def ensure_student_search(engine, fill=True):
+    """
+    Create the search index on an existing database and (SQLite, with fill)
+    fill it from the students table. The triggers keep it current after that.
+    """
+    statements = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRES_DDL}.get(engine.dialect.name, [])
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+        if fill and engine.dialect.name == 'sqlite':
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))